@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+按汉明距离索引感知哈希的 BK 树
+
+感知哈希 (dHash 等) 相近的两个文件内容相似。逐个比较 n 个哈希需要 n 次，
+BK 树利用三角不等式只检查距离可能在半径以内的分支。64 位哈希、半径较小时效果最好，
+例如在 10 万张图片中查找与少量参考图片相近的图片。
+
+    tree = BKTree()
+    tree.add(0b1011, "a.jpg")
+    tree.search(0b1001, 1)   # [(1, 0b1011, "a.jpg")]
+"""
+
+
+def hamming(a, b):
+    """两个整数哈希之间不同的位数"""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    def __init__(self, distance=hamming):
+        self.distance = distance
+        # 节点: [key, [items], {距离: 子节点}]
+        self.root = None
+        self.size = 0
+
+    def add(self, key, item=None):
+        """插入一个哈希；相同的哈希共用一个节点"""
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = self.distance(key, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """返回距离不超过 radius 的 [(距离, 哈希, item)]，按距离排序"""
+        results = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node_key, items, children = stack.pop()
+            d = self.distance(key, node_key)
+            if d <= radius:
+                results.extend((d, node_key, item) for item in items)
+            # 三角不等式：只有 |子节点距离 - d| <= radius 的分支可能有结果
+            for child_d, child in children.items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        results.sort(key=lambda r: r[0])
+        return results
+
+    def __len__(self):
+        return self.size
+
+
+def group_pairs(pairs):
+    """把相似的 (a, b) 对连成组（并查集），返回 [[item, ...]]，每组按排序"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    groups = {}
+    for item in parent:
+        groups.setdefault(find(item), []).append(item)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+可断点续传的批量复制（代替 copyfiles.sh / copy2path.sh 的逐个 cp）
+
+    python3 bulk_copy.py /mnt/nas/backup/* /mnt/u12tdisk/backup/
+
+与 cp -a 一样把每个源文件 / 目录复制到目标目录下，保留权限、时间戳、软链接和硬链接
+（dedupe_link.py 建立的硬链接只复制一份数据，其余在目标盘上重新链接）。
+
+* 按源文件所在设备分组并行：每块机械硬盘 1 个线程顺序读，固态硬盘 4 个（--hdd-readers / --ssd-readers），
+  不同的盘同时复制；数据用 copy_file_range / sendfile 在内核里搬运 (fastcopy.py)。
+* 每个文件每复制 CHECKPOINT_BYTES 字节 fsync 一次，并把已经落盘的字节偏移写入进度清单
+  （默认 <目标目录>/.bulk_copy.manifest.jsonl，JSONL，journal.py 格式）。
+  中断后再次运行同样的命令：已完成的文件跳过，复制到一半的文件从记录的偏移继续，不必从头复制 8 TB。
+* 读写遇到 EIO 等 I/O 错误时重新打开源文件，从上一个成功的位置重试，间隔 1、2、4 … 秒（--retries），
+  仍然失败的文件记入清单并跳过，最后列出。
+* Ctrl-C 时正在复制的文件在 STEP_BYTES 以内停下，fsync 后记录偏移，不必等大文件复制完。
+* --verify：边复制边计算源数据的摘要，写完后只重新读取目标文件校验 (copy_verify.py)，
+  摘要写入 <目标目录>/.copy_digests.ndjson 和摘要缓存，之后的去重扫描不必再读这些文件。
+"""
+import os
+import sys
+import time
+import errno
+import shutil
+import argparse
+import threading
+
+from fastcopy import copy_range, copy_range_hashed
+from fswalk import walk_dirs
+from journal import Journal, read_journal
+from hash_scheduler import HashScheduler, add_scheduler_arguments
+from hashers import new_hasher, update_from_file, add_algorithm_argument
+from hash_cache import add_cache_arguments
+from copy_verify import add_verify_arguments, recorder_from_args
+
+MANIFEST_NAME = ".bulk_copy.manifest.jsonl"
+# 每复制这么多字节 fsync 并记录一次偏移
+CHECKPOINT_BYTES = 1024 * 1024 * 1024
+# 每次调用 copy_range 复制的长度，也是出错重试时最多重复复制的长度
+STEP_BYTES = 64 * 1024 * 1024
+DEFAULT_RETRIES = 5
+MAX_BACKOFF = 60
+# 这些错误通常是暂时的（NAS 掉线、坏道重读），值得重试
+RETRY_ERRNOS = {errno.EIO, errno.EAGAIN, errno.ETIMEDOUT, errno.ECONNRESET, errno.EHOSTDOWN,
+                errno.ENETRESET, errno.ESTALE}
+PROGRESS_INTERVAL = 5
+
+
+class CopyTask:
+    __slots__ = ("src", "dst", "rel", "st", "size", "mtime_ns", "dev")
+
+    def __init__(self, src, dst, rel, st):
+        self.src = src
+        self.dst = dst
+        self.rel = rel
+        self.st = st
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.dev = st.st_dev
+
+
+def load_manifest(path):
+    """{相对路径: 最后一条记录}"""
+    state = {}
+    if os.path.exists(path):
+        for entry in read_journal(path):
+            if "rel" in entry:
+                state[entry["rel"]] = entry
+    return state
+
+
+class BulkCopier:
+    def __init__(self, target, manifest_path=None, retries=DEFAULT_RETRIES, scheduler=None, recorder=None):
+        self.target = os.path.abspath(target)
+        self.manifest_path = manifest_path or os.path.join(self.target, MANIFEST_NAME)
+        self.retries = retries
+        self.scheduler = scheduler or HashScheduler(progress_every=0)
+        # copy_verify.DigestRecorder，None 表示不校验
+        self.recorder = recorder
+        self.tasks = []
+        self.dirs = []        # [(源目录, 目标目录)]，复制完后恢复目录的时间戳
+        self.symlinks = []    # [(源软链接, 目标路径)]
+        # 有多个硬链接的源文件: {(st_dev, st_ino): 第一个 CopyTask}，其余链接 [(CopyTask, 第一个 CopyTask)]
+        self.inodes = {}
+        self.hardlinks = []
+        self.copied_bytes = 0
+        self.skipped = 0
+        self.linked = 0
+        self.failed = []      # [(源文件, 错误)]
+        self.lock = threading.Lock()
+        # Ctrl-C 时设置，正在复制的文件在下一个 STEP_BYTES 处停下
+        self.stop = threading.Event()
+
+    # ---- 计划 ----
+
+    def add_source(self, source):
+        source = os.path.abspath(source)
+        name = os.path.basename(source.rstrip(os.sep))
+        if os.path.islink(source):
+            self.symlinks.append((source, os.path.join(self.target, name)))
+        elif os.path.isdir(source):
+            for dirpath, dirs, others in walk_dirs(source, on_error=lambda e: print(f"无法读取目录: {e}")):
+                rel_dir = os.path.join(name, os.path.relpath(dirpath, source))
+                self.dirs.append((dirpath, os.path.normpath(os.path.join(self.target, rel_dir))))
+                for entry in dirs + others:
+                    rel = os.path.normpath(os.path.join(rel_dir, entry.name))
+                    self._add_entry(entry.path, rel, entry)
+        elif os.path.isfile(source):
+            self._add_entry(source, name, None)
+        else:
+            print(f"跳过: {source} 不存在或不是普通文件")
+
+    def _add_entry(self, path, rel, entry):
+        dst = os.path.join(self.target, rel)
+        try:
+            if entry is not None and entry.is_symlink():
+                self.symlinks.append((path, dst))
+                return
+            if entry is not None and entry.is_dir():
+                return   # walk_dirs 会进入这个目录
+            st = entry.stat() if entry is not None else os.stat(path)
+        except OSError as e:
+            print(f"跳过: {path} - {e}")
+            return
+        if entry is None or entry.is_file():
+            task = CopyTask(path, dst, rel, st)
+            if st.st_nlink > 1:
+                first = self.inodes.setdefault((st.st_dev, st.st_ino), task)
+                if first is not task:
+                    self.hardlinks.append((task, first))
+                    return
+            self.tasks.append(task)
+
+    # ---- 执行 ----
+
+    def _with_retry(self, what, fn):
+        """执行 fn()，遇到可重试的 I/O 错误时退避后重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                return fn()
+            except OSError as e:
+                if e.errno not in RETRY_ERRNOS or attempt == self.retries:
+                    raise
+                delay = min(2 ** attempt, MAX_BACKOFF)
+                print(f"\nI/O 错误 ({what}): {e}，{delay} 秒后重试 ({attempt + 1}/{self.retries})")
+                if self.stop.wait(delay):
+                    raise
+
+    def _resume_offset(self, task, state):
+        """根据清单决定从哪里开始：None 表示已经完成"""
+        entry = state.get(task.rel)
+        same_source = entry is not None and entry.get("size") == task.size and entry.get("mtime_ns") == task.mtime_ns
+        try:
+            dst_st = os.stat(task.dst)
+        except FileNotFoundError:
+            return 0
+        if same_source and entry["action"] == "done" and dst_st.st_size == task.size:
+            return None
+        if entry is None and dst_st.st_size == task.size and dst_st.st_mtime_ns == task.mtime_ns:
+            # 清单之外已经完整复制过的文件（大小和修改时间都相同，cp -a 或上次运行的结果）
+            return None
+        if same_source and entry["action"] == "progress" and dst_st.st_size >= entry["offset"]:
+            return entry["offset"]
+        return 0
+
+    def _prefix_hasher(self, task, offset):
+        """校验模式下从中间继续复制时，先用源文件 [0, offset) 的数据初始化摘要"""
+        hasher = new_hasher(self.recorder.algo)
+        if offset:
+            with open(task.src, "rb", buffering=0) as f:
+                update_from_file(hasher, f, offset)
+        return hasher
+
+    def copy_one(self, task, manifest, offset):
+        """复制一个文件；中断 (self.stop) 时 fsync 并记录已复制的偏移后返回 False"""
+        os.makedirs(os.path.dirname(task.dst), exist_ok=True)
+        hasher = None
+        if self.recorder is not None:
+            hasher = self._with_retry(task.src, lambda: self._prefix_hasher(task, offset))
+        src_fd = None
+
+        def step(start, end):
+            # NAS 重新连接后旧的文件描述符不能再用 (ESTALE 等)，出错时关闭，重试时重新打开源文件
+            nonlocal hasher, src_fd
+            if src_fd is None:
+                src_fd = os.open(task.src, os.O_RDONLY)
+            # 出错重试时从 start 重新复制，摘要也要回到 start 时的状态
+            snapshot = hasher.copy() if hasher is not None else None
+            try:
+                if hasher is None:
+                    return copy_range(src_fd, dst_fd, start, end)
+                return copy_range_hashed(src_fd, dst_fd, start, end, hasher)
+            except OSError:
+                hasher = snapshot
+                try:
+                    os.close(src_fd)
+                except OSError:
+                    pass
+                src_fd = None
+                raise
+
+        def checkpoint():
+            os.fsync(dst_fd)
+            manifest.record("progress", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns, offset=offset)
+
+        dst_fd = os.open(task.dst, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            # 偏移之后可能有上次没来得及 fsync 的数据，截掉重新复制
+            os.ftruncate(dst_fd, offset)
+            last_checkpoint = offset
+            while offset < task.size:
+                if self.stop.is_set():
+                    if offset > last_checkpoint:
+                        checkpoint()
+                    return False
+                end = min(offset + STEP_BYTES, task.size)
+                reached = self._with_retry(task.src, lambda: step(offset, end))
+                if reached <= offset:
+                    raise OSError(errno.EIO, "源文件比预期短（复制过程中被修改？）", task.src)
+                with self.lock:
+                    self.copied_bytes += reached - offset
+                offset = reached
+                if offset - last_checkpoint >= CHECKPOINT_BYTES and offset < task.size:
+                    checkpoint()
+                    last_checkpoint = offset
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+            if src_fd is not None:
+                os.close(src_fd)
+        shutil.copystat(task.src, task.dst)
+        if hasher is None:
+            manifest.record("done", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns)
+            return True
+        digest = hasher.hexdigest()
+        if not self.recorder.verify(task.src, task.dst, digest, task.st):
+            raise OSError(errno.EIO, "校验失败：目标文件与复制时的摘要不一致", task.dst)
+        manifest.record("done", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns,
+                        algo=self.recorder.algo, hash=digest)
+        return True
+
+    def run(self):
+        os.makedirs(self.target, exist_ok=True)
+        state = load_manifest(self.manifest_path)
+
+        todo = {}
+        for task in self.tasks:
+            offset = self._resume_offset(task, state)
+            if offset is None:
+                self.skipped += 1
+            else:
+                todo[task.src] = (task, offset)
+        total_bytes = sum(task.size - offset for task, offset in todo.values())
+        print(f"共 {len(self.tasks)} 个文件，已完成 {self.skipped} 个，"
+              f"需要复制 {len(todo)} 个 ({total_bytes / 1024 ** 3:.2f} GB)，另有 {len(self.hardlinks)} 个硬链接")
+
+        done_event = threading.Event()
+        started = time.monotonic()
+
+        def report():
+            while not done_event.wait(PROGRESS_INTERVAL):
+                elapsed = time.monotonic() - started
+                with self.lock:
+                    copied = self.copied_bytes
+                sys.stdout.write(f"\r已复制 {copied / 1024 ** 3:.2f}/{total_bytes / 1024 ** 3:.2f} GB  "
+                                 f"{copied / 1024 ** 2 / elapsed:.1f} MB/s")
+                sys.stdout.flush()
+
+        with Journal(self.manifest_path) as manifest:
+            def copy_path(src):
+                task, offset = todo[src]
+                try:
+                    return self.copy_one(task, manifest, offset)
+                except OSError as e:
+                    if self.stop.is_set():
+                        # 中断时不记为失败，清单里保留最后的进度，下次从那里继续
+                        return False
+                    manifest.record("failed", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns, error=str(e))
+                    with self.lock:
+                        self.failed.append((task.src, str(e)))
+                    print(f"\n复制失败: {task.src} - {e}")
+                    return False
+
+            reporter = threading.Thread(target=report, daemon=True)
+            reporter.start()
+            try:
+                stats = {task.src: _DevOnly(task.dev) for task, _ in todo.values()}
+                self.scheduler.hash_many(list(todo), copy_path, stats=stats, stop=self.stop)
+            finally:
+                done_event.set()
+                reporter.join()
+
+            failed_sources = {src for src, _ in self.failed}
+            for task, first in self.hardlinks:
+                self._link_one(task, first, manifest, failed_sources)
+
+        self._finish_links_and_dirs()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        print(f"\n复制完成: {self.copied_bytes / 1024 ** 3:.2f} GB，"
+              f"平均 {self.copied_bytes / 1024 ** 2 / elapsed:.1f} MB/s，跳过已完成 {self.skipped} 个，"
+              f"新建硬链接 {self.linked} 个")
+        if self.failed:
+            print(f"{len(self.failed)} 个文件复制失败（再次运行同样的命令可以重试）:")
+            for path, err in self.failed:
+                print(f"  - {path}: {err}")
+        if self.recorder is not None:
+            print(self.recorder.summary())
+        return not self.failed
+
+    def _link_one(self, task, first, manifest, failed_sources):
+        """在目标盘上把 task 硬链接到 first 已复制好的目标文件"""
+        if first.src in failed_sources:
+            self.failed.append((task.src, f"硬链接的源文件 {first.src} 复制失败"))
+            return
+        try:
+            if os.path.lexists(task.dst):
+                if os.path.samefile(task.dst, first.dst):
+                    self.skipped += 1
+                    return
+                os.unlink(task.dst)
+            os.makedirs(os.path.dirname(task.dst), exist_ok=True)
+            os.link(first.dst, task.dst)
+        except OSError as e:
+            manifest.record("failed", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns, error=str(e))
+            self.failed.append((task.src, str(e)))
+            print(f"\n无法创建硬链接 {task.dst}: {e}")
+            return
+        manifest.record("link", rel=task.rel, size=task.size, mtime_ns=task.mtime_ns, target=first.rel)
+        self.linked += 1
+
+    def _finish_links_and_dirs(self):
+        for src, dst in self.symlinks:
+            if os.path.lexists(dst):
+                continue
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                os.symlink(os.readlink(src), dst)
+            except OSError as e:
+                print(f"无法创建软链接 {dst}: {e}")
+        # 子目录先于上级目录，复制文件时修改的目录时间戳最后统一恢复
+        for src, dst in reversed(self.dirs):
+            try:
+                os.makedirs(dst, exist_ok=True)
+                shutil.copystat(src, dst)
+            except OSError as e:
+                print(f"无法设置目录属性 {dst}: {e}")
+
+
+class _DevOnly:
+    """给 HashScheduler.group_by_device 用的最小 stat 结果，避免重复 stat"""
+    __slots__ = ("st_dev",)
+
+    def __init__(self, dev):
+        self.st_dev = dev
+
+
+def main():
+    parser = argparse.ArgumentParser(description="可断点续传的批量复制：按设备并行、I/O 错误自动重试")
+    parser.add_argument("sources", nargs="+", help="要复制的文件或目录")
+    parser.add_argument("target", help="目标目录")
+    parser.add_argument("--manifest", default=None, help=f"进度清单路径 (默认: <目标目录>/{MANIFEST_NAME})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"I/O 错误时的重试次数 (默认: {DEFAULT_RETRIES})")
+    add_scheduler_arguments(parser)
+    add_verify_arguments(parser)
+    add_algorithm_argument(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    scheduler = HashScheduler(args.hdd_readers, args.ssd_readers, progress_every=0)
+    recorder = recorder_from_args(args, os.path.abspath(args.target))
+    copier = BulkCopier(args.target, args.manifest, args.retries, scheduler, recorder)
+    for source in args.sources:
+        copier.add_source(source)
+    try:
+        ok = copier.run()
+    except KeyboardInterrupt:
+        print("\n已中断。再次运行同样的命令会从中断的位置继续。")
+        sys.exit(130)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
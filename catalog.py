@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+所有磁盘共用的文件目录 (SQLite catalog)
+
+记录每个文件的路径、大小、修改时间、inode、扩展名，以及可选的摘要，
+并对文件名、(扩展名, 大小)、摘要建立索引。各扫描脚本加上 --from-catalog 后
+不再遍历 /mnt/u10tdisk、/mnt/u12tdisk，"跨盘同名视频"、"小于 100MB 的视频"
+之类的问题直接变成一次索引查询。
+
+更新是增量的：目录的 mtime 没变说明其中的文件名没有增删，不需要重新列目录，
+只需要检查它的子目录。只修改文件内容而没有增删文件的情况用 --full 重新 stat 全部文件。
+不记录软链接。
+
+    python3 catalog.py update /mnt/u10tdisk /mnt/u12tdisk
+    python3 catalog.py update --full /mnt/u10tdisk
+    python3 catalog.py update --digests /mnt/u10tdisk   # 从摘要缓存中补全摘要，不读取文件
+    python3 catalog.py update --dirty                   # 只处理 watch_changes.py 记录的变化
+    python3 catalog.py stats
+
+默认位置: ~/.cache/shtool/catalog.sqlite3
+可以通过环境变量 SHTOOL_CATALOG 或各脚本的 --catalog 参数修改。
+"""
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from fswalk import DEFAULT_CRAWL_THREADS, add_crawl_argument
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".cache", "shtool", "catalog.sqlite3")
+DEFAULT_ROOTS = ['/mnt/u10tdisk', '/mnt/u12tdisk']
+
+CatalogEntry = namedtuple("CatalogEntry", "path name ext size mtime_ns dev ino digest algo")
+
+# HashCache.get 只用到这几个字段
+_StatKey = namedtuple("_StatKey", "st_dev st_ino st_size st_mtime_ns")
+
+_ENTRY_COLUMNS = "path, name, ext, size, mtime_ns, dev, ino, digest, algo"
+
+
+def _subtree_range(path):
+    """path 下所有路径的范围 [path + '/', path + '0')，'0' 是 '/' 的下一个字符"""
+    return path + "/", path + "0"
+
+
+def _under_roots(roots, column="path"):
+    """生成 "在这些目录下" 的 SQL 条件和参数，roots 为 None 时不限制"""
+    if roots is None:
+        return "1", []
+    clauses, params = [], []
+    for root in roots:
+        clauses.append(f"({column} >= ? AND {column} < ?)")
+        params.extend(_subtree_range(os.path.abspath(root).rstrip("/")))
+    return "(" + " OR ".join(clauses or ["0"]) + ")", params
+
+
+def _ext_filter(extensions):
+    if extensions is None:
+        return "1", []
+    extensions = sorted({ext.lower() for ext in extensions})
+    return f"ext IN ({','.join('?' * len(extensions))})", extensions
+
+
+class Catalog:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get("SHTOOL_CATALOG") or DEFAULT_CATALOG_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                digest TEXT,
+                algo TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+            CREATE INDEX IF NOT EXISTS files_name ON files (name);
+            CREATE INDEX IF NOT EXISTS files_ext_size ON files (ext, size);
+            CREATE INDEX IF NOT EXISTS files_size ON files (size);
+            CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+            CREATE TABLE IF NOT EXISTS roots (
+                path TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dirty (
+                path TEXT PRIMARY KEY,
+                recursive INTEGER NOT NULL,
+                marked_at REAL NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    # ---------- 增量更新 ----------
+
+    @staticmethod
+    def _probe(dir_path, known_mtime, full):
+        """在线程池中执行：stat 目录，mtime 变化时重新列目录
+
+        返回 (mtime_ns, listing)，目录未变时 listing 为 None，
+        否则为 ([(name, stat_result)], [子目录路径])。
+        """
+        mtime_ns = os.stat(dir_path).st_mtime_ns
+        if not full and known_mtime == mtime_ns:
+            return mtime_ns, None
+        files, subdirs = [], []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append((entry.name, entry.stat(follow_symlinks=False)))
+                except OSError:
+                    continue
+        return mtime_ns, (files, subdirs)
+
+    def _remove_subtree(self, path):
+        low, high = _subtree_range(path.rstrip("/"))
+        self.conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+    def _store_listing(self, dir_path, parent, mtime_ns, files):
+        old_names = {row[0] for row in self.conn.execute("SELECT name FROM files WHERE dir = ?", (dir_path,))}
+        new_names = {name for name, _ in files}
+        self.conn.executemany("DELETE FROM files WHERE path = ?",
+                              [(os.path.join(dir_path, name),) for name in old_names - new_names])
+        # 大小、修改时间或 inode 变化时旧摘要作废
+        self.conn.executemany(
+            "INSERT INTO files (path, dir, name, ext, size, mtime_ns, dev, ino) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET "
+            "digest = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns AND ino = excluded.ino "
+            "THEN digest END, "
+            "algo = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns AND ino = excluded.ino "
+            "THEN algo END, "
+            "size = excluded.size, mtime_ns = excluded.mtime_ns, dev = excluded.dev, ino = excluded.ino",
+            [(os.path.join(dir_path, name), dir_path, name, os.path.splitext(name)[1].lower(),
+              st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino) for name, st in files],
+        )
+        self.conn.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                          (dir_path, parent, mtime_ns))
+
+    def _crawl(self, start, full=False, threads=DEFAULT_CRAWL_THREADS, descend_known=True):
+        """从 start 开始增量更新，返回 (重新列出的目录数, 未变的目录数)
+
+        同一层的目录在线程池中并行 stat / scandir，数据库只在当前线程写入。
+        descend_known 为 False 时只重新列出 start 本身，已收录的子目录不再检查，
+        只有新出现的子目录会被完整收录（用于处理 watch_changes.py 记录的变化）。
+        """
+        start = os.path.abspath(start)
+        low, high = _subtree_range(start.rstrip("/"))
+        parent_dir = os.path.dirname(start)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, parent, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (start, low, high)).fetchall()
+            # start 本身已经收录在上级目录下时保留这层关系，上级目录更新时才会继续进入
+            known_parent = self.conn.execute("SELECT 1 FROM dirs WHERE path = ?", (parent_dir,)).fetchone()
+        known_mtime = {path: mtime_ns for path, _, mtime_ns in rows}
+        known_children = defaultdict(list)
+        for path, parent, _ in rows:
+            if parent is not None and path != start:
+                known_children[parent].append(path)
+
+        listed = unchanged = 0
+        level = [(start, parent_dir if known_parent else None)]
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+            while level:
+                # 只处理 start 本身时，即使 mtime 没变也要重新列出（文件内容的修改不会改变目录 mtime）
+                futures = [pool.submit(self._probe, path, known_mtime.get(path),
+                                       full or (not descend_known and path == start))
+                           for path, _ in level]
+                next_level = []
+                with self.lock:
+                    for (path, parent), future in zip(level, futures):
+                        try:
+                            mtime_ns, listing = future.result()
+                        except FileNotFoundError:
+                            self._remove_subtree(path)
+                            continue
+                        except OSError as e:
+                            # 暂时无法访问（权限、拔盘）时保留旧记录
+                            print(f"Warning: Cannot access {path}: {e}")
+                            continue
+                        if listing is None:
+                            unchanged += 1
+                            subdirs = known_children.get(path, [])
+                        else:
+                            listed += 1
+                            files, subdirs = listing
+                            for gone in set(known_children.get(path, [])) - set(subdirs):
+                                self._remove_subtree(gone)
+                            self._store_listing(path, parent, mtime_ns, files)
+                        if not descend_known:
+                            subdirs = [sub for sub in subdirs if sub not in known_mtime]
+                        next_level.extend((sub, path) for sub in sorted(subdirs))
+                    self.conn.commit()
+                level = next_level
+        return listed, unchanged
+
+    def update(self, root, full=False, threads=DEFAULT_CRAWL_THREADS):
+        """增量更新一个根目录，返回 (重新列出的目录数, 未变的目录数)"""
+        root = os.path.abspath(root)
+        result = self._crawl(root, full, threads)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO roots (path, updated_at) VALUES (?, ?)", (root, time.time()))
+            self.conn.commit()
+        return result
+
+    # ---------- 变化记录 (watch_changes.py) ----------
+
+    def mark_dirty(self, paths, recursive=False):
+        """记录发生变化的目录；recursive 为 True 表示丢失了事件，需要按 mtime 重新检查整个子树"""
+        now = time.time()
+        with self.lock:
+            if recursive:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO dirty (path, recursive, marked_at) VALUES (?, 1, ?)",
+                    [(path, now) for path in paths])
+            else:
+                # 已经标记为整个子树的不要降级
+                self.conn.executemany(
+                    "INSERT INTO dirty (path, recursive, marked_at) VALUES (?, 0, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET marked_at = excluded.marked_at",
+                    [(path, now) for path in paths])
+            self.conn.commit()
+
+    def dirty_paths(self):
+        """[(目录, 是否整个子树)]，按路径排序"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path, recursive FROM dirty ORDER BY path").fetchall()
+        return [(path, bool(recursive)) for path, recursive in rows]
+
+    def update_dirty(self, threads=DEFAULT_CRAWL_THREADS):
+        """只处理记录下来的变化目录，返回处理的目录数
+
+        处理期间新记录的变化会保留到下一次。
+        """
+        started = time.time()
+        dirty = self.dirty_paths()
+        for path, recursive in dirty:
+            self._crawl(path, threads=threads, descend_known=recursive)
+        with self.lock:
+            self.conn.execute("DELETE FROM dirty WHERE marked_at <= ?", (started,))
+            self.conn.commit()
+        return len(dirty)
+
+    def fill_digests(self, cache, algo, roots=None):
+        """从摘要缓存 (hash_cache.HashCache) 补全摘要，只查缓存，不读取文件，返回补全的数量"""
+        where, params = _under_roots(roots)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT path, dev, ino, size, mtime_ns FROM files WHERE {where} AND digest IS NULL",
+                params).fetchall()
+        filled = []
+        for path, dev, ino, size, mtime_ns in rows:
+            digest = cache.get(_StatKey(dev, ino, size, mtime_ns), algo)
+            if digest:
+                filled.append((digest, algo, path, size, mtime_ns))
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE files SET digest = ?, algo = ? WHERE path = ? AND size = ? AND mtime_ns = ?", filled)
+            self.conn.commit()
+        return len(filled)
+
+    # ---------- 查询 ----------
+
+    def covers(self, path):
+        """返回包含 path 的已收录根目录中最近更新的一个及其更新时间，没有时返回 None"""
+        path = os.path.abspath(path)
+        with self.lock:
+            rows = self.conn.execute("SELECT path, updated_at FROM roots ORDER BY updated_at DESC").fetchall()
+        for root, updated_at in rows:
+            if path == root or path.startswith(root.rstrip("/") + "/"):
+                return root, updated_at
+        return None
+
+    def _query(self, sql, params):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [CatalogEntry(*row) for row in rows]
+
+    def files(self, roots=None, extensions=None, min_size=None, max_size=None):
+        """查询文件，max_size 为不含上限"""
+        where, params = _under_roots(roots)
+        ext_where, ext_params = _ext_filter(extensions)
+        sql = f"SELECT {_ENTRY_COLUMNS} FROM files WHERE {where} AND {ext_where}"
+        params = params + ext_params
+        if min_size is not None:
+            sql += " AND size >= ?"
+            params.append(min_size)
+        if max_size is not None:
+            sql += " AND size < ?"
+            params.append(max_size)
+        return self._query(sql + " ORDER BY path", params)
+
+    def same_name(self, roots=None, extensions=None):
+        """文件名出现不止一次的文件，按 (文件名, 路径) 排序"""
+        where, params = _under_roots(roots)
+        ext_where, ext_params = _ext_filter(extensions)
+        cond = f"{where} AND {ext_where}"
+        return self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM files WHERE {cond} AND name IN "
+            f"(SELECT name FROM files WHERE {cond} GROUP BY name HAVING COUNT(*) > 1) ORDER BY name, path",
+            (params + ext_params) * 2)
+
+    def same_size(self, roots=None, extensions=None, min_size=1):
+        """大小出现不止一次的文件（可能内容重复的候选），按 (大小, 路径) 排序"""
+        where, params = _under_roots(roots)
+        ext_where, ext_params = _ext_filter(extensions)
+        cond = f"{where} AND {ext_where} AND size >= ?"
+        cond_params = params + ext_params + [min_size]
+        return self._query(
+            f"SELECT {_ENTRY_COLUMNS} FROM files WHERE {cond} AND size IN "
+            f"(SELECT size FROM files WHERE {cond} GROUP BY size HAVING COUNT(*) > 1) ORDER BY size, path",
+            cond_params * 2)
+
+    def extensions(self, roots=None):
+        where, params = _under_roots(roots)
+        with self.lock:
+            rows = self.conn.execute(f"SELECT DISTINCT ext FROM files WHERE {where} AND ext != ''",
+                                     params).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def summary(self):
+        with self.lock:
+            files, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+            digests = self.conn.execute("SELECT COUNT(*) FROM files WHERE digest IS NOT NULL").fetchone()[0]
+            roots = self.conn.execute("SELECT path, updated_at FROM roots ORDER BY path").fetchall()
+        lines = [f"目录数据库: {self.db_path}",
+                 f"文件 {files} 个，共 {size / 1024 ** 4:.2f} TB，其中 {digests} 个有摘要"]
+        for root, updated_at in roots:
+            lines.append(f"  {root} (更新于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_at))})")
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_catalog_for(paths, db_path=None):
+    """为 --from-catalog 打开目录数据库，paths 不全在已收录的根目录下时打印提示并返回 None"""
+    catalog = Catalog(db_path)
+    for path in paths:
+        covered = catalog.covers(path)
+        if covered is None:
+            print(f"Error: {path} 不在目录数据库 {catalog.db_path} 中，"
+                  f"请先运行 python3 catalog.py update {path}")
+            catalog.close()
+            return None
+        root, updated_at = covered
+        print(f"使用目录数据库: {root} (更新于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated_at))})")
+    return catalog
+
+
+def add_catalog_arguments(parser):
+    """给 argparse 解析器添加统一的 --from-catalog 参数"""
+    parser.add_argument("--from-catalog", action="store_true",
+                        help="从目录数据库查询文件，不遍历磁盘（先运行 python3 catalog.py update）")
+    parser.add_argument("--catalog", default=None, help=f"目录数据库路径 (默认: {DEFAULT_CATALOG_PATH})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="维护所有磁盘共用的文件目录数据库")
+    sub = parser.add_subparsers(dest="action", required=True)
+    update = sub.add_parser("update", help="增量更新目录数据库")
+    update.add_argument("roots", nargs="*", default=DEFAULT_ROOTS, help="要收录的根目录 (默认: %(default)s)")
+    update.add_argument("--full", action="store_true", help="重新列出并 stat 所有目录，发现原地修改的文件")
+    update.add_argument("--dirty", action="store_true",
+                        help="只处理 watch_changes.py 记录的变化目录，不检查其他目录")
+    update.add_argument("--digests", action="store_true", help="从摘要缓存中补全摘要（不读取文件）")
+    update.add_argument("--algo", default="md5", help="--digests 使用的摘要算法 (默认: md5)")
+    update.add_argument("--cache", default=None, help="摘要缓存数据库路径")
+    add_crawl_argument(update)
+    sub.add_parser("stats", help="显示目录数据库概况")
+    parser.add_argument("--catalog", default=None, help=f"目录数据库路径 (默认: {DEFAULT_CATALOG_PATH})")
+    args = parser.parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        if args.action == "update" and args.dirty:
+            start = time.monotonic()
+            count = catalog.update_dirty(args.crawl_threads)
+            print(f"处理了 {count} 个变化目录 ({time.monotonic() - start:.1f} 秒)")
+        elif args.action == "update":
+            for root in args.roots:
+                if not os.path.isdir(root):
+                    print(f"警告: 路径不存在 {root}")
+                    continue
+                start = time.monotonic()
+                listed, unchanged = catalog.update(root, args.full, args.crawl_threads)
+                print(f"{root}: 重新列出 {listed} 个目录，{unchanged} 个目录未变 "
+                      f"({time.monotonic() - start:.1f} 秒)")
+        if args.action == "update" and args.digests:
+            from hash_cache import HashCache
+            with HashCache(args.cache) as cache:
+                roots = None if args.dirty else args.roots
+                print(f"从摘要缓存补全 {catalog.fill_digests(cache, args.algo, roots)} 个摘要")
+        print(catalog.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+长时间扫描的检查点
+
+定期把扫描状态写入 JSON 文件（先写临时文件再 os.replace，断电也不会留下半个文件），
+扫描被 Ctrl-C、拔掉硬盘或重启打断后，可以用 --resume 从上次的检查点继续。
+"""
+import os
+import json
+import time
+import threading
+
+DEFAULT_INTERVAL = 60
+
+
+class Checkpoint:
+    def __init__(self, path, interval=DEFAULT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last_save = time.monotonic()
+
+    def load(self):
+        """读取检查点，不存在或已损坏时返回 None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"警告: 无法读取检查点 {self.path}: {e}")
+            return None
+
+    def save(self, state_fn):
+        """state_fn() 返回要保存的状态，在锁内调用以免其他线程同时修改"""
+        with self.lock:
+            state = state_fn()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.last_save = time.monotonic()
+
+    def maybe_save(self, state_fn):
+        """距离上次保存超过 interval 秒时保存"""
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save(state_fn)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def add_checkpoint_arguments(parser, default_path=None, path_option=True):
+    """给 argparse 解析器添加统一的检查点参数
+
+    path_option 为 False 时不提供 --checkpoint（例如索引文件本身就是检查点）。
+    """
+    parser.add_argument("--resume", action="store_true", help="从上次中断的检查点继续扫描")
+    if path_option:
+        parser.add_argument("--checkpoint", default=default_path,
+                            help="检查点文件路径" + (f" (默认: {default_path})" if default_path else ""))
+    parser.add_argument("--checkpoint-interval", type=int, default=DEFAULT_INTERVAL,
+                        help=f"保存检查点的间隔秒数 (默认: {DEFAULT_INTERVAL})")
@@ -2,6 +2,12 @@
 
 #遍历子目录
 
+# --estimate: 只预估每个设备上的耗时，不修改任何文件
+if [ "$1" = "--estimate" ]; then
+    shift
+    exec python3 "$(dirname "$0")/estimate_cost.py" clean-and-move "$@"
+fi
+
 # 检查是否提供了两个参数
 if [ $# -ne 2 ]; then
     echo "Usage: $0 <source_directory> <target_directory>"
@@ -9,29 +9,5 @@ fi
 echo 'original path(file): ' $1
 echo 'target path(file):' $2
 
-# target_path=/Users/gavin/Desktop/temo/target/
-for file in  $1/*
-do
-  if test -f $file
-  then
-      echo 开始开被文件 $file ， 开始时间$(date "+%Y-%m-%d %H:%M:%S")
-      cp $file $2
-  else
-      echo 开始开被目录 $file， 开始时间$(date "+%Y-%m-%d %H:%M:%S")
-      cp -a $file $2
-  fi
-done
-
-
-# target_path=/Users/gavin/Desktop/temo/target/
-# for file in ./*
-# do
-#   if test -f $file
-#   then
-#       echo 开始开被文件 $file ， 开始时间$(date "+%Y-%m-%d %H:%M:%S")
-#       cp $file $target_path
-#   else
-#       echo 开始开被目录 $file， 开始时间$(date "+%Y-%m-%d %H:%M:%S")
-#       cp -a $file $target_path
-#   fi
-# done
+# 逐个 cp 改为 bulk_copy.py：按设备并行，I/O 错误自动重试，中断后再次运行从中断的位置继续
+exec python3 "$(dirname "$0")/bulk_copy.py" "$1"/* "$2"
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+复制时计算摘要并校验（bulk_copy.py、prune_directory.py 的 --verify）
+
+复制过程中用经过的源数据计算摘要 (fastcopy.copy_file_hashed)，写完并 fsync 后
+丢弃目标文件的页缓存再读取一遍，与源数据的摘要比对。源文件只读一次，
+不必像以前那样复制完再用 md5_files.py 把两边各读一遍。
+
+校验通过的摘要：
+* 追加到摘要清单（默认 <目标目录>/.copy_digests.ndjson），格式与 video_md5_index.ndjson 的记录相同，
+  多一个 source 字段，可以用 video_index.iter_index 读取；
+* 以目标文件（以及仍然存在的源文件）的 stat 写入摘要缓存 (hash_cache.py)，
+  之后 md5_files.py、clean_dupes.py 等扫描这些文件时直接命中缓存，不再读取文件内容。
+"""
+import os
+
+from hashers import DEFAULT_ALGORITHM, new_hasher, update_from_file
+from hash_cache import open_cache
+from video_index import IndexWriter
+
+DIGESTS_NAME = ".copy_digests.ndjson"
+# 摘要清单每隔多少秒刷盘一次
+FLUSH_INTERVAL = 10
+
+
+def drop_page_cache(fd):
+    """让内核丢弃文件的页缓存，之后的读取真正来自磁盘；文件必须已经 fsync"""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def file_digest_uncached(path, algo=DEFAULT_ALGORITHM):
+    """绕过页缓存重新读取整个文件计算摘要"""
+    hasher = new_hasher(algo)
+    with open(path, "rb", buffering=0) as f:
+        drop_page_cache(f.fileno())
+        update_from_file(hasher, f)
+    return hasher.hexdigest()
+
+
+class DigestRecorder:
+    """校验复制结果，并把校验通过的摘要写入摘要清单和摘要缓存，可以在多个线程中使用"""
+
+    def __init__(self, manifest_path, algo=DEFAULT_ALGORITHM, cache=None):
+        self.manifest_path = manifest_path
+        self.algo = algo
+        self.cache = cache
+        os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+        append = os.path.exists(manifest_path)
+        self.writer = IndexWriter(manifest_path, append=append, flush_interval=FLUSH_INTERVAL)
+        self.verified = 0
+        self.mismatched = 0
+
+    def verify(self, source, destination, digest, src_st=None):
+        """重新读取 destination 与复制时的摘要比对，一致时记录摘要并返回 True
+
+        src_st 为复制前取得的源文件 stat 结果，源文件之后还保留时一并写入缓存。
+        """
+        actual = file_digest_uncached(destination, self.algo)
+        if actual != digest:
+            self.mismatched += 1
+            print(f"校验失败: {destination} ({self.algo} {actual} != {digest})")
+            return False
+        self.verified += 1
+        dst_st = os.stat(destination)
+        self.writer.write({
+            "filename": os.path.basename(destination),
+            "path": os.path.abspath(destination),
+            "algo": self.algo,
+            "hash": digest,
+            "size": dst_st.st_size,
+            "mtime_ns": dst_st.st_mtime_ns,
+            "source": os.path.abspath(source),
+        })
+        if self.cache is not None:
+            self.cache.put(dst_st, self.algo, digest, destination)
+            if src_st is not None:
+                self.cache.put(src_st, self.algo, digest, source)
+        return True
+
+    def summary(self):
+        return f"校验通过 {self.verified} 个，校验失败 {self.mismatched} 个，摘要已写入 {self.manifest_path}"
+
+    def close(self):
+        self.writer.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def add_verify_arguments(parser):
+    """给 argparse 解析器添加统一的校验参数（摘要算法和缓存参数由各脚本另外添加）"""
+    parser.add_argument("--verify", action="store_true",
+                        help="复制时计算摘要，写完后重新读取目标文件校验，摘要写入清单和摘要缓存")
+    parser.add_argument("--digests", default=None,
+                        help=f"摘要清单路径 (默认: <目标目录>/{DIGESTS_NAME})")
+
+
+def recorder_from_args(args, target_dir):
+    """未指定 --verify 时返回 None"""
+    if not args.verify:
+        return None
+    cache = open_cache(args.cache, not args.no_cache)
+    return DigestRecorder(args.digests or os.path.join(target_dir, DIGESTS_NAME), args.algo, cache)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+用硬链接或 reflink 代替删除重复文件
+
+同一文件系统内的重复副本替换为指向保留文件的硬链接，或者在 btrfs/xfs 上用
+FICLONE ioctl 创建 reflink（写时复制，两个文件仍然互相独立）。
+不复制数据，空间立即释放，而且所有路径都继续有效，Plex 的媒体库结构不会被破坏。
+
+替换前会逐字节比较两个文件，先在同一目录下创建临时链接，再用 os.replace 原子替换。
+"""
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# linux/fs.h: #define FICLONE _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+LINK_MODES = ("auto", "reflink", "hardlink")
+COMPARE_BUFFER_SIZE = 1024 * 1024
+
+
+def files_identical(path_a, path_b, buf_size=COMPARE_BUFFER_SIZE):
+    """逐字节比较两个文件"""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    buf_a = bytearray(buf_size)
+    buf_b = bytearray(buf_size)
+    with open(path_a, "rb", buffering=0) as fa, open(path_b, "rb", buffering=0) as fb:
+        while True:
+            n_a = fa.readinto(buf_a)
+            n_b = fb.readinto(buf_b)
+            if n_a != n_b:
+                return False
+            if not n_a:
+                return True
+            if memoryview(buf_a)[:n_a] != memoryview(buf_b)[:n_b]:
+                return False
+
+
+def reflink(src, dst):
+    """在 dst 创建 src 的 reflink（dst 不能已存在），文件系统不支持时抛出 OSError"""
+    if fcntl is None:
+        raise OSError("当前系统不支持 FICLONE")
+    with open(src, "rb") as fsrc:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, fsrc.fileno())
+        except OSError:
+            os.close(fd)
+            os.unlink(dst)
+            raise
+        os.close(fd)
+
+
+def link_duplicate(keep_path, dup_path, mode="auto"):
+    """把 dup_path 替换为 keep_path 的硬链接或 reflink
+
+    返回 (方式, 说明)，方式为 "hardlink" / "reflink"，跳过时为 None。
+    """
+    keep_st = os.stat(keep_path)
+    dup_st = os.stat(dup_path)
+
+    if keep_st.st_dev != dup_st.st_dev:
+        return None, "不在同一文件系统，无法链接"
+    if keep_st.st_ino == dup_st.st_ino:
+        return None, "已经是硬链接"
+    if not files_identical(keep_path, dup_path):
+        return None, "内容不一致，跳过"
+
+    dup_dir, dup_name = os.path.split(dup_path)
+    tmp_path = os.path.join(dup_dir, f".{dup_name}.dedupe-tmp")
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    method = None
+    if mode in ("auto", "reflink"):
+        try:
+            reflink(keep_path, tmp_path)
+            # reflink 是独立的文件，保留原副本的权限和时间
+            shutil.copystat(dup_path, tmp_path)
+            method = "reflink"
+        except OSError:
+            if mode == "reflink":
+                raise
+    if method is None:
+        os.link(keep_path, tmp_path)
+        method = "hardlink"
+
+    try:
+        os.replace(tmp_path, dup_path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+    return method, ""
+
+
+def add_link_argument(parser):
+    """给 argparse 解析器添加统一的 --link 参数"""
+    parser.add_argument("--link", nargs="?", const="auto", choices=LINK_MODES, default=None,
+                        help="不删除重复文件，而是替换为指向保留文件的 reflink/硬链接 "
+                             "(auto: 优先 reflink，不支持时用硬链接)")
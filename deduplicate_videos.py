@@ -1,38 +1,102 @@
 #!/usr/bin/env python3
 import os
-import json
 import argparse
-from collections import defaultdict
+from collections import Counter, defaultdict
+
+from video_index import NDJSON_INDEX_NAME, find_index, iter_index
+from dedupe_link import link_duplicate, add_link_argument
+
+def entry_digest(item):
+    """返回 (算法, 摘要)；旧版索引只有 md5 字段，没有 algo"""
+    algo = item.get("algo", "md5")
+    digest = item["hash"] if "hash" in item else item.get("md5")
+    return algo, digest
 
 def load_index(index_file):
-    """加载索引文件"""
+    """加载索引文件，只保留存在重复的记录
+
+    第一遍只统计每个摘要出现的次数，第二遍再读取重复的记录，
+    索引再大也不需要把全部记录放进内存。
+    """
     if not os.path.exists(index_file):
         print(f"Error: 索引文件 {index_file} 不存在。请先运行扫描脚本生成索引。")
         return None
     
-    with open(index_file, 'r', encoding='utf-8') as f:
-        index_list = json.load(f)
-    
-    # 按MD5分组
+    counts = Counter()
+    algos = set()
+    for item in iter_index(index_file):
+        algo, digest = entry_digest(item)
+        # md5_files.py --staged 对内容唯一的文件不计算摘要
+        if digest is None:
+            continue
+        algos.add(algo)
+        counts[digest] += 1
+
+    if len(algos) > 1:
+        print(f"Error: 索引文件 {index_file} 中混有不同的摘要算法 ({', '.join(sorted(algos))})，无法比较。请重新扫描。")
+        return None
+
+    # 按摘要分组
     video_index = defaultdict(list)
-    for item in index_list:
-        md5 = item["md5"]
-        video_index[md5].append(item)
+    for item in iter_index(index_file):
+        _, digest = entry_digest(item)
+        if digest is not None and counts[digest] > 1:
+            video_index[digest].append(item)
     
     return video_index
 
-def delete_duplicates(video_index, root_dir):
-    """删除重复文件，只保留第一个"""
+def stale_reason(item):
+    """文件在扫描之后被删除或修改时返回原因，否则返回 None
+
+    新索引的记录带有 size 和 mtime_ns，只需要一次 lstat；旧索引没有这两个字段，只检查文件是否存在。
+    """
+    try:
+        st = os.lstat(item["path"])
+    except OSError as e:
+        return f"无法访问 ({e.strerror})"
+    if "size" in item and st.st_size != item["size"]:
+        return "大小与索引不同"
+    if "mtime_ns" in item and st.st_mtime_ns != item["mtime_ns"]:
+        return "修改时间与索引不同"
+    return None
+
+def delete_duplicates(video_index, root_dir, link_mode=None):
+    """删除重复文件，只保留第一个；link_mode 不为 None 时替换为指向第一个文件的链接
+
+    扫描之后被修改或删除的文件不处理，索引过期时不会误删内容已经不同的文件。
+    """
     deleted = 0
-    for md5, items in video_index.items():
+    linked = 0
+    for digest, items in video_index.items():
+        current = []
+        for item in items:
+            reason = stale_reason(item)
+            if reason is None:
+                current.append(item)
+            else:
+                print(f"  跳过: {item['path']} - {reason}，请重新扫描")
+        items = current
         if len(items) > 1:
             # 保留第一个，删除其余
             first_path = items[0]["path"]
-            print(f"\nMD5: {md5[:8]}... (重复 {len(items)} 个文件)")
+            algo = items[0].get("algo", "md5")
+            print(f"\n{algo.upper()}: {digest[:8]}... (重复 {len(items)} 个文件)")
             print(f"  保留: {first_path}")
             
             for item in items[1:]:
                 path = item["path"]
+                if link_mode:
+                    try:
+                        method, reason = link_duplicate(first_path, path, link_mode)
+                    except OSError as e:
+                        print(f"  链接失败: {path} - {e}")
+                        continue
+                    if method is None:
+                        print(f"  跳过: {path} - {reason}")
+                    else:
+                        linked += 1
+                        print(f"  已替换为{'reflink' if method == 'reflink' else '硬链接'}: {path}")
+                    continue
                 try:
                     os.remove(path)
                     deleted += 1
@@ -40,11 +104,16 @@ def delete_duplicates(video_index, root_dir):
                 except OSError as e:
                     print(f"  删除失败: {path} - {e}")
     
-    print(f"\n删除完成: 总共删除 {deleted} 个重复文件。")
+    if link_mode:
+        print(f"\n链接完成: 总共替换 {linked} 个重复文件。")
+    else:
+        print(f"\n删除完成: 总共删除 {deleted} 个重复文件。")
 
 def main_delete():
     parser = argparse.ArgumentParser(description="根据索引删除指定目录下的重复视频文件，只保留第一个")
     parser.add_argument("directory", help="指定目录路径（索引文件在该目录下）")
+    parser.add_argument("--index", default=None, help="索引文件路径（默认在目录下查找 video_md5_index.ndjson 或 video_md5_index.json）")
+    add_link_argument(parser)
     parser.add_argument("--no-confirm", action="store_true", help="跳过确认，直接删除（谨慎使用！）")
     args = parser.parse_args()
     
@@ -53,9 +122,9 @@ def main_delete():
         print(f"Error: 目录 {root_dir} 不存在。")
         return
     
-    index_file = os.path.join(root_dir, "video_md5_index.json")
+    index_file = args.index or find_index(root_dir) or os.path.join(root_dir, NDJSON_INDEX_NAME)
     video_index = load_index(index_file)
-    if not video_index:
+    if video_index is None:
         return
     
     # 统计重复组
@@ -70,12 +139,13 @@ def main_delete():
     
     # 确认删除
     if not args.no_confirm:
-        confirm = input(f"\n确认删除 {total_dups} 个重复视频文件？(y/N): ").strip().lower()
+        action = "替换为链接" if args.link else "删除"
+        confirm = input(f"\n确认{action} {total_dups} 个重复视频文件？(y/N): ").strip().lower()
         if confirm != 'y':
             print("操作已取消。")
             return
     
-    delete_duplicates(video_index, root_dir)
+    delete_duplicates(video_index, root_dir, args.link)
 
 if __name__ == "__main__":
     main_delete()
\ No newline at end of file
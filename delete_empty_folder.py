@@ -22,10 +22,12 @@
 import os
 import argparse
 
+from fswalk import walk_dirs
+
 def find_empty_dirs(root_dir):
     """递归查找空目录"""
     empty_dirs = []
-    for root, dirs, files in os.walk(root_dir, topdown=False):  # topdown=False 以从叶子开始
+    for root, dirs, files in walk_dirs(root_dir, topdown=False):  # topdown=False 以从叶子开始
         if not dirs and not files:  # 如果没有子目录和文件，则为空
             empty_dirs.append(root)
     return empty_dirs
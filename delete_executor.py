@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+所有清理脚本共用的批量删除执行器
+
+待删除的文件按 st_dev 分组，每个设备由几个线程同时 unlink，不同设备之间互不等待。
+--max-ops 限制全部线程合计每秒的删除次数，大批量删除时不会把磁盘占满，
+Plex 等正在读取同一块盘的程序仍然流畅。
+
+每个删除（包括失败的）追加一行到 JSONL 日志 (journal.py)，便于事后审计；
+默认位置 ~/.cache/shtool/delete_journal.jsonl，可以通过环境变量 SHTOOL_DELETE_JOURNAL
+或各脚本的 --journal 参数修改。
+
+运行时只显示合计进度，加 --verbose 才逐个打印路径。
+
+    executor = DeleteExecutor(max_ops=50, tool="clean_dupes")
+    result = executor.run(paths)
+    print(result.deleted_count, result.freed_bytes, result.errors)
+"""
+import os
+import sys
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+from journal import Journal
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".cache", "shtool", "delete_journal.jsonl")
+DEFAULT_WORKERS_PER_DEVICE = 4
+# 进度刷新间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+
+class RateLimiter:
+    """令牌间隔限速：所有线程合计每秒最多 rate 次，rate 为 0 或 None 表示不限速"""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DeleteResult:
+    def __init__(self):
+        self.deleted = []   # [(path, size)]
+        self.errors = []    # [(path, 错误信息)]
+
+    @property
+    def deleted_count(self):
+        return len(self.deleted)
+
+    @property
+    def freed_bytes(self):
+        return sum(size for _, size in self.deleted)
+
+
+class DeleteExecutor:
+    def __init__(self, max_ops=None, workers_per_device=DEFAULT_WORKERS_PER_DEVICE,
+                 journal_path=None, verbose=False, tool=None):
+        self.max_ops = max_ops
+        self.workers_per_device = max(1, workers_per_device)
+        self.journal_path = journal_path or os.environ.get("SHTOOL_DELETE_JOURNAL") or DEFAULT_JOURNAL_PATH
+        self.verbose = verbose
+        # 写入日志的来源脚本名称
+        self.tool = tool
+
+    def _group_by_device(self, paths, result, journal):
+        """{st_dev: deque([(path, size), ...])}；无法 stat 的文件直接记为失败"""
+        groups = defaultdict(list)
+        for path in dict.fromkeys(paths):
+            try:
+                st = os.lstat(path)
+            except OSError as e:
+                self._failed(path, e, result, journal)
+                continue
+            groups[st.st_dev].append((path, st.st_size))
+        return {dev: deque(sorted(items)) for dev, items in groups.items()}
+
+    def _failed(self, path, error, result, journal):
+        result.errors.append((path, str(error)))
+        journal.record("delete_failed", tool=self.tool, path=path, error=str(error))
+        if self.verbose:
+            print(f"删除失败: {path} - {error}")
+
+    def run(self, paths):
+        """删除 paths 中的文件，返回 DeleteResult"""
+        result = DeleteResult()
+        paths = list(paths)
+        if not paths:
+            return result
+
+        with Journal(self.journal_path) as journal:
+            groups = self._group_by_device(paths, result, journal)
+            self._run_groups(groups, len(paths), result, journal)
+        return result
+
+    def _run_groups(self, groups, total, result, journal):
+        limiter = RateLimiter(self.max_ops)
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def drain(queue):
+            while not stop.is_set():
+                try:
+                    path, size = queue.popleft()
+                except IndexError:
+                    return
+                limiter.wait()
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    with lock:
+                        self._failed(path, e, result, journal)
+                    continue
+                journal.record("delete", tool=self.tool, path=path, size=size)
+                with lock:
+                    result.deleted.append((path, size))
+                if self.verbose:
+                    print(f"已删除: {path}")
+
+        workers = []
+        for queue in groups.values():
+            workers.extend([queue] * min(self.workers_per_device, len(queue)))
+        if not workers:
+            return
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+            futures = [pool.submit(drain, queue) for queue in workers]
+            try:
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                    if not self.verbose:
+                        self._show_progress(result, total, started)
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Ctrl-C 等中断时让各线程删完当前文件后退出
+                stop.set()
+                raise
+            finally:
+                if not self.verbose:
+                    sys.stdout.write("\n")
+
+    @staticmethod
+    def _show_progress(result, total, started):
+        done = result.deleted_count + len(result.errors)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        sys.stdout.write(f"\r删除进度: {done}/{total}  失败 {len(result.errors)}  "
+                         f"释放 {result.freed_bytes / (1024 ** 3):.2f} GB  {result.deleted_count / elapsed:.0f} 个/秒")
+        sys.stdout.flush()
+
+
+def add_delete_arguments(parser):
+    """给 argparse 解析器添加统一的删除执行参数"""
+    parser.add_argument("--max-ops", type=float, default=0,
+                        help="每秒最多删除的文件数，0 表示不限速 (默认: 0)")
+    parser.add_argument("--delete-workers", type=int, default=DEFAULT_WORKERS_PER_DEVICE,
+                        help=f"每个设备同时删除的线程数 (默认: {DEFAULT_WORKERS_PER_DEVICE})")
+    parser.add_argument("--journal", default=None, help=f"删除日志路径 (默认: {DEFAULT_JOURNAL_PATH})")
+    parser.add_argument("--verbose", "-v", action="store_true", help="逐个打印删除的文件")
+
+
+def executor_from_args(args, tool=None):
+    return DeleteExecutor(args.max_ops, args.delete_workers, args.journal, args.verbose, tool)
@@ -2,49 +2,100 @@ import os
 import sys
 import argparse
 
-def delete_images_only(target_dir, keywords):
-    # 1. 检查路径
-    if not os.path.exists(target_dir):
-        print(f"❌ 错误: 路径 '{target_dir}' 不存在！")
-        return
+from fswalk import iter_files, add_crawl_argument, DEFAULT_CRAWL_THREADS
+from hash_cache import open_cache, add_cache_arguments
+from bktree import BKTree, hamming
+from image_hash import (hash_images, stat_images, pillow_available, HASH_METHODS, DEFAULT_METHOD,
+                        DEFAULT_MAX_DISTANCE)
 
-    # 2. 定义图片后缀名白名单 (不区分大小写)
-    IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.heic'}
-    
+# 图片后缀名白名单 (不区分大小写)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.heic'}
+
+def find_by_keywords(target_dir, keywords, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """文件名包含任一关键词的图片"""
     lower_keywords = [k.lower() for k in keywords]
     matched_files = []
+    for entry in iter_files(target_dir, IMAGE_EXTENSIONS, threads=crawl_threads):
+        # 同时满足：1. 是图片格式 2. 包含关键词
+        if any(key in entry.name.lower() for key in lower_keywords):
+            matched_files.append(entry.path)
+    return matched_files
 
-    print(f"🔍 正在扫描图片文件: {os.path.abspath(target_dir)}")
-    
-    # 3. 扫描阶段
-    for root, dirs, files in os.walk(target_dir):
-        for file in files:
-            # 获取文件后缀
-            ext = os.path.splitext(file)[1].lower()
-            
-            # 同时满足：1. 是图片格式 2. 包含关键词
-            if ext in IMAGE_EXTENSIONS:
-                if any(key in file.lower() for key in lower_keywords):
-                    matched_files.append(os.path.join(root, file))
+def _show_progress(done, total):
+    sys.stdout.write(f'\r计算哈希: {done}/{total}')
+    sys.stdout.flush()
+    if done == total:
+        sys.stdout.write('\n')
 
-    if not matched_files:
-        print("✅ 未发现符合条件的匹配图片。")
-        return
+def find_similar(target_dir, references, max_distance=DEFAULT_MAX_DISTANCE, method=DEFAULT_METHOD,
+                 cache=None, jobs=None, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """与参考图片（广告图）感知哈希相近的图片，返回 [(path, 距离, 参考图片)]
 
-    # 4. 打印待删除列表供确认
+    references 可以是图片文件或存放参考图片的目录。目标目录中的图片建成 BK 树，
+    每张参考图片只查询一次半径 max_distance 以内的节点，不需要两两比较。
+    """
+    ref_paths = []
+    for ref in references:
+        if os.path.isdir(ref):
+            ref_paths.extend(entry.path for entry in iter_files(ref, IMAGE_EXTENSIONS, threads=crawl_threads))
+        else:
+            ref_paths.append(ref)
+    ref_hashes = hash_images(stat_images(ref_paths), method, cache, jobs)
+    for path in ref_paths:
+        if path not in ref_hashes:
+            print(f"⚠️  无法读取参考图片: {path}")
+        elif ref_hashes[path] == 0:
+            # 纯色图片的 dHash 为 0，会匹配所有纯色图片
+            print(f"⚠️  跳过纯色参考图片: {path}")
+            del ref_hashes[path]
+    if not ref_hashes:
+        print("❌ 没有可用的参考图片。")
+        return []
+
+    # 参考图片本身不能被删除
+    ref_real = {os.path.realpath(path) for path in ref_paths}
+    images = []
+    for entry in iter_files(target_dir, IMAGE_EXTENSIONS, threads=crawl_threads, stat=True):
+        if os.path.realpath(entry.path) in ref_real:
+            continue
+        try:
+            images.append((entry.path, entry.stat()))
+        except OSError as e:
+            # 遍历时预取的 stat 失败（文件已被删除、I/O 错误）时跳过这张图片
+            print(f"⚠️  无法访问 {entry.path}: {e}")
+    print(f"🖼️  共 {len(images)} 张图片，{len(ref_hashes)} 张参考图片")
+    hashes = hash_images(images, method, cache, jobs, progress=_show_progress)
+
+    tree = BKTree(hamming)
+    for path, value in hashes.items():
+        tree.add(value, path)
+
+    best = {}
+    for ref, ref_hash in ref_hashes.items():
+        for distance, _, path in tree.search(ref_hash, max_distance):
+            if path not in best or distance < best[path][0]:
+                best[path] = (distance, ref)
+    return sorted((path, distance, ref) for path, (distance, ref) in best.items())
+
+def delete_matched(matched_files, dry_run=False):
+    # 打印待删除列表供确认
     print("\n" + "="*60)
     print(f"🖼️  待删除【图片】列表 (总计: {len(matched_files)} 个):")
     for path in matched_files:
         print(f"  [图片] {path}")
     print("="*60 + "\n")
 
-    # 5. 交互确认
+    if dry_run:
+        print("🚫 仅列出，未删除任何文件。")
+        return
+
+    # 交互确认
     confirm = input("⚠️  警告：以上文件将被永久删除！确定继续吗？(y/n): ").strip().lower()
     if confirm != 'y':
         print("🚫 操作已取消。")
         return
 
-    # 6. 执行删除并显示进度条
+    # 执行删除并显示进度条
     print("\n🚀 正在清理图片...")
     total = len(matched_files)
     
@@ -63,13 +114,70 @@ def delete_images_only(target_dir, keywords):
 
     print("\n\n✨ 清理完成！非图片文件已安全跳过。")
 
+def delete_images_only(target_dir, keywords, dry_run=False, crawl_threads=DEFAULT_CRAWL_THREADS):
+    # 1. 检查路径
+    if not os.path.exists(target_dir):
+        print(f"❌ 错误: 路径 '{target_dir}' 不存在！")
+        return
+
+    print(f"🔍 正在扫描图片文件: {os.path.abspath(target_dir)}")
+    
+    # 2. 扫描阶段
+    matched_files = find_by_keywords(target_dir, keywords, crawl_threads)
+
+    if not matched_files:
+        print("✅ 未发现符合条件的匹配图片。")
+        return
+
+    delete_matched(matched_files, dry_run)
+
+def delete_similar_images(target_dir, references, max_distance, method, cache=None, jobs=None,
+                          dry_run=False, crawl_threads=DEFAULT_CRAWL_THREADS):
+    if not os.path.exists(target_dir):
+        print(f"❌ 错误: 路径 '{target_dir}' 不存在！")
+        return
+
+    print(f"🔍 正在扫描图片文件: {os.path.abspath(target_dir)}")
+    matches = find_similar(target_dir, references, max_distance, method, cache, jobs, crawl_threads)
+    if not matches:
+        print("✅ 未发现与参考图片相似的图片。")
+        return
+
+    print(f"\n与参考图片相似的图片 ({method}, 距离 <= {max_distance}):")
+    for path, distance, ref in matches:
+        print(f"  [{distance:2d}] {path}  ≈ {os.path.basename(ref)}")
+    delete_matched([path for path, _, _ in matches], dry_run)
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="批量删除包含指定关键词的图片文件")
+    parser = argparse.ArgumentParser(description="批量删除包含指定关键词的图片文件，或与参考广告图相似的图片")
     parser.add_argument("path", help="目标文件夹路径")
+    parser.add_argument("--similar-to", nargs="+", metavar="REF",
+                        help="参考图片或存放参考图片的目录：按感知哈希删除与它们相似的图片（需要 Pillow），不再按关键词匹配")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f"与参考图片的最大汉明距离，共 64 位 (默认: {DEFAULT_MAX_DISTANCE})")
+    parser.add_argument("--hash", choices=HASH_METHODS, default=DEFAULT_METHOD,
+                        help=f"感知哈希算法 (默认: {DEFAULT_METHOD})")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="计算哈希的进程数 (默认: CPU 核数)")
+    parser.add_argument("--dry-run", action="store_true", help="只列出匹配的图片，不删除")
+    add_cache_arguments(parser)
+    add_crawl_argument(parser)
     
     args = parser.parse_args()
     
+    if args.similar_to:
+        if not pillow_available():
+            parser.error("--similar-to 需要安装 Pillow: pip install Pillow")
+        cache = open_cache(args.cache, enabled=not args.no_cache)
+        try:
+            delete_similar_images(args.path, args.similar_to, args.max_distance, args.hash, cache, args.jobs,
+                                  args.dry_run, args.crawl_threads)
+        finally:
+            if cache is not None:
+                print(cache.summary())
+                cache.close()
+        sys.exit(0)
+
     # 关键词列表
     delete_keywords = ['Xav', 'agav', '扫码', '4096', '論壇', '私房猛药']
 
-    delete_images_only(args.path, delete_keywords)
\ No newline at end of file
+    delete_images_only(args.path, delete_keywords, args.dry_run, args.crawl_threads)
@@ -3,20 +3,27 @@ import os
 import argparse
 import sys
 
+from fswalk import iter_files, add_crawl_argument
+from catalog import open_catalog_for, add_catalog_arguments
+from delete_executor import add_delete_arguments, executor_from_args
+
+DEFAULT_SIZE_MB = 100
+
 def get_args():
     parser = argparse.ArgumentParser(description="Recursively delete video files smaller than a specified size.")
     parser.add_argument("directory", help="The directory to scan.")
-    parser.add_argument("--size", "-s", type=float, default=100, help="File size threshold in MB (default: 100). Files smaller than this will be deleted.")
+    parser.add_argument("--size", "-s", type=float, default=DEFAULT_SIZE_MB, help=f"File size threshold in MB (default: {DEFAULT_SIZE_MB}). Files smaller than this will be deleted.")
     parser.add_argument("--dry-run", action="store_true", help="Scan and list files without deleting them.")
     parser.add_argument("--no-confirm", action="store_true", help="Skip confirmation prompt before deleting.")
+    add_crawl_argument(parser)
+    add_catalog_arguments(parser)
+    add_delete_arguments(parser)
     return parser.parse_args()
 
-def is_video_file(filename):
-    video_extensions = {
-        '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', 
-        '.mpg', '.mpeg', '.3gp', '.ts', '.rmvb', '.vob'
-    }
-    return os.path.splitext(filename)[1].lower() in video_extensions
+VIDEO_EXTENSIONS = {
+    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', 
+    '.mpg', '.mpeg', '.3gp', '.ts', '.rmvb', '.vob'
+}
 
 def main():
     args = get_args()
@@ -32,16 +39,31 @@ def main():
 
     print(f"Scanning '{target_dir}' for video files smaller than {size_threshold_mb} MB...")
 
-    for root, _, files in os.walk(target_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
+    if args.from_catalog:
+        catalog = open_catalog_for([target_dir], args.catalog)
+        if catalog is None:
+            sys.exit(1)
+        with catalog:
+            candidates = catalog.files([target_dir], VIDEO_EXTENSIONS, max_size=size_threshold_bytes)
+        # The catalog may be stale: re-check the size of each candidate before offering to delete it
+        for entry in candidates:
             try:
-                if is_video_file(file):
-                    file_size = os.path.getsize(file_path)
-                    if file_size < size_threshold_bytes:
-                        files_to_delete.append((file_path, file_size))
+                file_size = os.stat(entry.path).st_size
+                if file_size < size_threshold_bytes:
+                    files_to_delete.append((entry.path, file_size))
+            except FileNotFoundError:
+                continue
             except OSError as e:
-                print(f"Error accessing file {file_path}: {e}")
+                print(f"Error accessing file {entry.path}: {e}")
+    else:
+        # Directory entries carry the file type, so only videos are stat'ed (once) for their size
+        for entry in iter_files(target_dir, VIDEO_EXTENSIONS, threads=args.crawl_threads, stat=True):
+            try:
+                file_size = entry.stat().st_size
+                if file_size < size_threshold_bytes:
+                    files_to_delete.append((entry.path, file_size))
+            except OSError as e:
+                print(f"Error accessing file {entry.path}: {e}")
 
     if not files_to_delete:
         print("No matching files found.")
@@ -63,16 +85,13 @@ def main():
             return
 
     print("\nDeleting files...")
-    deleted_count = 0
-    for path, _ in files_to_delete:
-        try:
-            os.remove(path)
-            print(f"Deleted: {path}")
-            deleted_count += 1
-        except OSError as e:
-            print(f"Failed to delete {path}: {e}")
-
-    print(f"\nOperation complete. Deleted {deleted_count} files.")
+    # Unlinks run in parallel per device, throttled by --max-ops and journaled
+    result = executor_from_args(args, "delete_small_videos").run(path for path, _ in files_to_delete)
+    for path, err in result.errors:
+        print(f"Failed to delete {path}: {err}")
+
+    print(f"\nOperation complete. Deleted {result.deleted_count} files "
+          f"({result.freed_bytes / (1024 * 1024):.2f} MB).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+文件所在设备（挂载点）相关的辅助函数
+"""
+import os
+
+
+def mount_root(path):
+    """返回 path 所在文件系统的挂载点：沿上级目录查找，直到 st_dev 改变为止"""
+    path = os.path.abspath(path)
+    dev = os.stat(path).st_dev
+    while True:
+        parent = os.path.dirname(path)
+        if parent == path:
+            return path
+        try:
+            if os.stat(parent).st_dev != dev:
+                return path
+        except OSError:
+            return path
+        path = parent
+
+
+def existing_ancestor(path):
+    """path 本身或离它最近的已存在的上级目录（不创建任何目录）"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def same_device(path_a, path_b):
+    """两个路径是否在同一文件系统上（path_b 不存在时使用它的上级目录）"""
+    return os.stat(existing_ancestor(path_a)).st_dev == os.stat(existing_ancestor(path_b)).st_dev
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+清理 / 移动操作的耗时预估 (--estimate)
+
+只读取元数据生成与正式运行相同的计划，统计每个设备上要读写的字节数、删除和重命名的次数。
+prune_directory.py 不比较重名文件的内容，内容相同的文件也按复制计算。
+再在每个涉及的设备上做一次简短的实测（读写 SAMPLE_BYTES 字节、创建 / 重命名 / 删除 META_OPS 个空文件），
+按实测速度估算每个设备的耗时。各设备同时工作，总耗时取最慢的设备。
+
+    python3 estimate_cost.py prune <源目录> <目标目录>              # prune_directory.py
+    python3 estimate_cost.py clean-and-move <源目录> <目标目录>     # clean_and_move.sh
+    python3 estimate_cost.py move-and-filter <目标目录> <源目录>    # move_and_filter.sh（参数顺序与脚本相同）
+    python3 estimate_cost.py clean-dupes [--file duplicate_videos.json]
+    python3 estimate_cost.py clean-by-name [--file duplicate_names.json]
+
+prune_directory.py、clean_dupes.py、clean_by_name.py 和两个 shell 脚本也可以直接加 --estimate。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from devices import mount_root, existing_ancestor
+from hash_scheduler import is_rotational
+from fswalk import walk_dirs, scan_dir
+from video_fingerprint import FINGERPRINT_KIND, split_by_distance
+
+SAMPLE_BYTES = 64 * 1024 * 1024
+META_OPS = 200
+MIB = 1024 * 1024
+
+# 无法实测（只读、空间不足等）时使用的保守数值
+FALLBACK_HDD = {"read_bps": 120 * MIB, "write_bps": 100 * MIB, "renames_per_s": 1000, "unlinks_per_s": 1000}
+FALLBACK_SSD = {"read_bps": 400 * MIB, "write_bps": 300 * MIB, "renames_per_s": 10000, "unlinks_per_s": 10000}
+
+
+class DeviceWork:
+    """一个设备上需要完成的工作量"""
+
+    def __init__(self, dev, directory):
+        self.dev = dev
+        # 用来实测的目录（需要可写）和文件（用来测读取速度，不写入）
+        self.directory = directory
+        self.sample_file = None
+        self.sample_size = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.unlinks = 0
+        self.renames = 0
+
+    def offer_sample(self, path, size):
+        """记住设备上最大的文件，读取速度用真实数据测量"""
+        if size > self.sample_size:
+            self.sample_file, self.sample_size = path, size
+
+
+class Workload:
+    def __init__(self):
+        self.devices = {}
+
+    def device(self, path, st=None):
+        st = st or os.stat(path)
+        work = self.devices.get(st.st_dev)
+        if work is None:
+            directory = path if os.path.isdir(path) else os.path.dirname(path)
+            work = self.devices[st.st_dev] = DeviceWork(st.st_dev, directory)
+        return work
+
+    def unlink(self, path, st=None):
+        self.device(path, st).unlinks += 1
+
+    def rename(self, path, st=None):
+        self.device(path, st).renames += 1
+
+    def copy(self, src, dst_dir, size, st=None):
+        """跨设备移动：源设备读取并删除，目标设备写入并创建文件"""
+        src_work = self.device(src, st)
+        src_work.read_bytes += size
+        src_work.unlinks += 1
+        src_work.offer_sample(src, size)
+        dst_work = self.device(dst_dir)
+        dst_work.write_bytes += size
+        dst_work.renames += 1
+
+
+def _timed(fn):
+    started = time.monotonic()
+    fn()
+    return max(time.monotonic() - started, 1e-6)
+
+
+def _drop_cache(fd):
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def _read_sample(path, limit):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        _drop_cache(fd)
+        done = 0
+        while done < limit:
+            chunk = os.read(fd, min(8 * MIB, limit - done))
+            if not chunk:
+                break
+            done += len(chunk)
+        return done
+    finally:
+        os.close(fd)
+
+
+def benchmark_device(work, sample_bytes=SAMPLE_BYTES, meta_ops=META_OPS):
+    """在设备上实测读写速度和元数据操作速度，返回 {指标: 数值}；测不了的指标用保守数值"""
+    try:
+        rotational = is_rotational(work.dev)
+    except (OSError, ValueError):
+        rotational = True
+    result = dict(FALLBACK_HDD if rotational else FALLBACK_SSD)
+    result["measured"] = False
+
+    try:
+        bench_dir = tempfile.mkdtemp(prefix=".shtool-bench-", dir=work.directory)
+    except OSError as e:
+        print(f"  无法在 {work.directory} 实测 ({e})，使用默认数值")
+        return result
+    try:
+        # 元数据：创建 / 重命名 / 删除空文件
+        names = [os.path.join(bench_dir, f"m{i}") for i in range(meta_ops)]
+
+        def create():
+            for name in names:
+                os.close(os.open(name, os.O_WRONLY | os.O_CREAT, 0o644))
+
+        def rename():
+            for name in names:
+                os.rename(name, name + "r")
+
+        def unlink():
+            for name in names:
+                os.unlink(name + "r")
+
+        create()
+        result["renames_per_s"] = meta_ops / _timed(rename)
+        result["unlinks_per_s"] = meta_ops / _timed(unlink)
+
+        # 顺序写入并 fsync
+        data_path = os.path.join(bench_dir, "data")
+        block = os.urandom(8 * MIB)
+
+        def write():
+            fd = os.open(data_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                for _ in range(max(1, sample_bytes // len(block))):
+                    os.write(fd, block)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        written = max(1, sample_bytes // len(block)) * len(block)
+        result["write_bps"] = written / _timed(write)
+
+        # 顺序读取：优先读设备上已有的大文件，否则读回刚写入的文件（先丢弃页缓存）
+        sample = work.sample_file if work.sample_size >= sample_bytes else data_path
+        read = [0]
+        elapsed = _timed(lambda: read.__setitem__(0, _read_sample(sample, sample_bytes)))
+        if read[0]:
+            result["read_bps"] = read[0] / elapsed
+        result["measured"] = True
+    except OSError as e:
+        print(f"  实测 {work.directory} 时出错 ({e})，部分指标使用默认数值")
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+    return result
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} 小时 {minutes} 分"
+    if minutes:
+        return f"{minutes} 分 {seconds} 秒"
+    return f"{seconds} 秒"
+
+
+def estimate(workload, benchmark=True):
+    """打印每个设备的工作量和预计耗时，返回预计总耗时（秒）"""
+    if not workload.devices:
+        print("没有需要执行的操作。")
+        return 0.0
+
+    slowest = 0.0
+    for work in workload.devices.values():
+        try:
+            label = mount_root(work.directory)
+        except OSError:
+            label = work.directory
+        print(f"\n设备 {label} ({os.major(work.dev)}:{os.minor(work.dev)}):")
+        if benchmark:
+            speed = benchmark_device(work)
+        else:
+            speed = dict(FALLBACK_HDD)
+            speed["measured"] = False
+        source = "实测" if speed["measured"] else "默认"
+        print(f"  {source}速度: 读 {format_bytes(speed['read_bps'])}/s, 写 {format_bytes(speed['write_bps'])}/s, "
+              f"重命名 {speed['renames_per_s']:.0f} 次/s, 删除 {speed['unlinks_per_s']:.0f} 次/s")
+        seconds = (work.read_bytes / speed["read_bps"] + work.write_bytes / speed["write_bps"]
+                   + work.renames / speed["renames_per_s"] + work.unlinks / speed["unlinks_per_s"])
+        print(f"  读取 {format_bytes(work.read_bytes)}，写入 {format_bytes(work.write_bytes)}，"
+              f"删除 {work.unlinks} 次，重命名/创建 {work.renames} 次")
+        print(f"  预计耗时: {format_duration(seconds)}")
+        slowest = max(slowest, seconds)
+
+    copied = sum(work.write_bytes for work in workload.devices.values())
+    print(f"\n需要复制 {format_bytes(copied)}，预计总耗时（各设备同时工作，取最慢的设备）: {format_duration(slowest)}")
+    return slowest
+
+
+def prune_workload(plan, source_root, target_root):
+    """prune_directory.py 的计划 -> 工作量"""
+    workload = Workload()
+    source_st = os.stat(source_root)
+    # 预估时目标目录可能还不存在
+    target_root = existing_ancestor(target_root)
+    for path in plan.deletes:
+        workload.unlink(str(path), source_st)
+    for move in plan.moves:
+        if move.same_device:
+            workload.rename(str(move.source), source_st)
+        else:
+            workload.copy(str(move.source), str(target_root), move.size, source_st)
+    for duplicate in plan.duplicates:
+        workload.unlink(str(duplicate.source), source_st)
+    for _ in plan.dir_removals:
+        workload.unlink(str(source_root), source_st)
+    return workload
+
+
+def _find_smaller_than_mib(size, mib):
+    """find -size -NM 的语义：大小按 MiB 向上取整后小于 N"""
+    return (size + MIB - 1) // MIB < mib
+
+
+def _tree_entries(top):
+    """top 下的全部文件 (path, stat) 和目录数量"""
+    files = []
+    dir_count = 0
+    for dirpath, dirs, others in walk_dirs(top):
+        dir_count += len(dirs)
+        for entry in others + [d for d in dirs if d.is_symlink()]:
+            try:
+                files.append((entry.path, entry.stat(follow_symlinks=False)))
+            except OSError:
+                continue
+    return files, dir_count
+
+
+def _move_dir(workload, directory, kept, target_dir):
+    """mv directory target_dir/：同一设备只是一次 rename，否则复制剩下的文件再删除"""
+    dir_st = os.stat(directory)
+    if dir_st.st_dev == os.stat(target_dir).st_dev:
+        workload.rename(directory, dir_st)
+        return
+    for path, st in kept:
+        workload.copy(path, target_dir, st.st_size, st)
+    workload.unlink(directory, dir_st)
+
+
+def clean_and_move_workload(source_dir, target_dir):
+    """clean_and_move.sh 的操作 -> 工作量"""
+    workload = Workload()
+    listing = scan_dir(source_dir)
+    for top in (listing[0] if listing else []):
+        if top.is_symlink():
+            continue
+        top_st = os.stat(top.path)
+        files, dir_count = _tree_entries(top.path)
+        kept = []
+        for path, st in files:
+            name = os.path.basename(path)
+            in_subdir = os.path.dirname(path) != top.path
+            if not (name.endswith(".mp4") or name.endswith(".kmp")):
+                workload.unlink(path, st)
+            elif name.endswith(".mp4") and _find_smaller_than_mib(st.st_size, 100):
+                workload.unlink(path, st)
+            elif in_subdir:
+                # 随后 rm -rf 删除所有子目录，子目录里保留下来的视频也会被删除
+                workload.unlink(path, st)
+            else:
+                kept.append((path, st))
+        for _ in range(dir_count):
+            workload.unlink(top.path, top_st)
+        _move_dir(workload, top.path, kept, target_dir)
+    return workload
+
+
+def move_and_filter_workload(target_dir, source_dir):
+    """move_and_filter.sh target source 的操作 -> 工作量"""
+    workload = Workload()
+    source_st = os.stat(source_dir)
+    files, dir_count = _tree_entries(source_dir)
+    kept = []
+    for path, st in files:
+        name = os.path.basename(path)
+        if os.path.dirname(path) != source_dir:
+            workload.unlink(path, st)
+        elif not name.endswith((".mp4", ".mkv", ".jpg")):
+            workload.unlink(path, st)
+        elif name.endswith((".mp4", ".mkv")) and _find_smaller_than_mib(st.st_size, 100):
+            workload.unlink(path, st)
+        else:
+            kept.append((path, st))
+    for _ in range(dir_count):
+        workload.unlink(source_dir, source_st)
+    _move_dir(workload, source_dir, kept, target_dir)
+    return workload
+
+
+def report_workload(pairs, link_mode=False):
+    """[(保留的文件, 要删除的文件)] -> 工作量；链接模式下删除换成同一目录内的 rename"""
+    workload = Workload()
+    for _, path in pairs:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        if link_mode:
+            workload.rename(path, st)
+        else:
+            workload.unlink(path, st)
+    return workload
+
+
+def clean_dupes_pairs(report_file):
+    with open(report_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for item in data:
+        files = sorted(item["files"])
+        keep = item.get("keep", files[0])
+        paths = [path for path in files if path != keep]
+        # 与 clean_dupes.py 相同：指纹距离超过阈值的视频不会被删除
+        if item.get("algo") == FINGERPRINT_KIND:
+            paths = split_by_distance(item, paths)[0]
+        for path in paths:
+            yield keep, path
+
+
+def clean_by_name_pairs(report_file):
+    with open(report_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for file_list in data.values():
+        file_list = sorted(file_list, key=lambda x: 0 if "/mnt/u10t/" in x["path"] else 1)
+        for item in file_list[1:]:
+            yield file_list[0]["path"], item["path"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预估清理 / 移动操作在每个设备上的耗时（不修改任何文件）")
+    parser.add_argument("--no-benchmark", action="store_true", help="不实测设备速度，使用默认数值")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("prune", help="prune_directory.py <source> <target>")
+    p.add_argument("source")
+    p.add_argument("target")
+    p = sub.add_parser("clean-and-move", help="clean_and_move.sh <source> <target>")
+    p.add_argument("source")
+    p.add_argument("target")
+    p = sub.add_parser("move-and-filter", help="move_and_filter.sh <target> <source>")
+    p.add_argument("target")
+    p.add_argument("source")
+    p = sub.add_parser("clean-dupes", help="scan&delete/clean_dupes.py")
+    p.add_argument("--file", default="duplicate_videos.json")
+    p.add_argument("--link", action="store_true", help="估算 --link 模式")
+    p = sub.add_parser("clean-by-name", help="scan&delete/clean_by_name.py")
+    p.add_argument("--file", default="duplicate_names.json")
+    args = parser.parse_args()
+
+    if args.command == "prune":
+        from pathlib import Path
+        import prune_directory
+
+        source, target = Path(args.source).resolve(), Path(args.target).resolve()
+        prune_directory.ensure_valid_directories(source, target, create=False)
+        plan, _ = prune_directory.build_plan(source, target, prune_directory.Stats(), on_duplicate="keep")
+        workload = prune_workload(plan, source, target)
+    elif args.command in ("clean-and-move", "move-and-filter"):
+        source = os.path.abspath(args.source)
+        target = os.path.abspath(args.target)
+        if not os.path.isdir(source):
+            print(f"Error: Source directory '{source}' does not exist")
+            sys.exit(1)
+        # 脚本会创建不存在的目标目录；预估时不修改任何文件，改用离它最近的已存在的上级目录
+        target = existing_ancestor(target)
+        if args.command == "clean-and-move":
+            workload = clean_and_move_workload(source, target)
+        else:
+            workload = move_and_filter_workload(target, source)
+    else:
+        if not os.path.exists(args.file):
+            print("错误: 找不到报告文件。")
+            sys.exit(1)
+        if args.command == "clean-dupes":
+            workload = report_workload(clean_dupes_pairs(args.file), args.link)
+        else:
+            workload = report_workload(clean_by_name_pairs(args.file))
+
+    estimate(workload, benchmark=not args.no_benchmark)
+
+
+if __name__ == "__main__":
+    main()
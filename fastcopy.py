@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+跨设备复制文件的快速路径
+
+数据尽量在内核里直接从源文件搬到目标文件，不经过 Python 的缓冲区：
+先用 os.copy_file_range（Linux 5.3+，同一文件系统上还可能直接 reflink），
+不支持时改用 os.sendfile，都不可用时才退回 read/write 大块复制。
+
+复制完成后不立即 fsync，而是由调用方攒一批文件后用 fsync_batch 一起刷盘，
+让内核把多个文件的写回合并起来；确认落盘之后才能删除源文件。
+
+需要校验时用 copy_file_hashed / copy_range_hashed：数据必须经过用户态才能计算摘要，
+所以改为 read/write 大块复制，边写边算源数据的摘要，之后只需重新读取目标文件比对 (copy_verify.py)。
+"""
+import os
+import errno
+import shutil
+from functools import partial
+
+from hashers import DEFAULT_ALGORITHM, new_hasher
+
+# 每次系统调用复制的字节数
+COPY_CHUNK = 64 * 1024 * 1024
+BUFFER_SIZE = 8 * 1024 * 1024
+
+# 这些错误表示当前方法不可用，换下一种方法重试
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def _copy_file_range(src_fd, dst_fd, offset, end):
+    while offset < end:
+        n = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK, end - offset), offset, offset)
+        if n == 0:
+            break
+        offset += n
+    return offset
+
+
+def _sendfile(src_fd, dst_fd, offset, end):
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < end:
+        n = os.sendfile(dst_fd, src_fd, offset, min(COPY_CHUNK, end - offset))
+        if n == 0:
+            break
+        offset += n
+    return offset
+
+
+def _read_write(src_fd, dst_fd, offset, end, hasher=None):
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    while offset < end:
+        n = os.preadv(src_fd, [view[:min(BUFFER_SIZE, end - offset)]], offset)
+        if n == 0:
+            break
+        if hasher is not None:
+            hasher.update(view[:n])
+        written = 0
+        while written < n:
+            written += os.pwrite(dst_fd, view[written:n], offset + written)
+        offset += n
+    return offset
+
+
+_METHODS = [m for m in (
+    _copy_file_range if hasattr(os, "copy_file_range") else None,
+    _sendfile if hasattr(os, "sendfile") else None,
+    _read_write,
+) if m is not None]
+
+
+def copy_range(src_fd, dst_fd, offset, end):
+    """把源文件 [offset, end) 复制到目标文件的相同位置，返回复制结束的位置
+
+    源文件在 end 之前结束时提前返回。
+    """
+    for method in _METHODS:
+        try:
+            offset = method(src_fd, dst_fd, offset, end)
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS or method is _read_write:
+                raise
+            # 后备方法从本次调用的起点重新复制，只是覆盖相同的内容
+            continue
+        if offset >= end or os.fstat(src_fd).st_size <= offset:
+            return offset
+        # 部分内核跨文件系统时 copy_file_range 直接返回 0，从当前位置换下一种方法继续
+    return offset
+
+
+def copy_range_hashed(src_fd, dst_fd, offset, end, hasher):
+    """与 copy_range 相同，同时用读到的源数据更新 hasher；hasher 必须已经包含 [0, offset) 的数据"""
+    return _read_write(src_fd, dst_fd, offset, end, hasher)
+
+
+def _copy(src, dst, exclusive, copier):
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        size = os.fstat(src_fd).st_size
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_EXCL if exclusive else os.O_TRUNC)
+        dst_fd = os.open(dst, flags, 0o644)
+        try:
+            copied = copier(src_fd, dst_fd, 0, size)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    if copied != size:
+        raise OSError(errno.EIO, f"复制不完整 ({copied}/{size} 字节)", src)
+    shutil.copystat(src, dst)
+    return copied
+
+
+def copy_file(src, dst, exclusive=False):
+    """复制文件内容和权限、时间戳；不 fsync，返回复制的字节数
+
+    dst 已存在时覆盖；exclusive 为 True 时改为抛出 FileExistsError（O_EXCL，原子地占用文件名）。
+    """
+    return _copy(src, dst, exclusive, copy_range)
+
+
+def copy_file_hashed(src, dst, exclusive=False, algo=DEFAULT_ALGORITHM):
+    """与 copy_file 相同，返回复制过程中算出的源数据摘要（十六进制）"""
+    hasher = new_hasher(algo)
+    _copy(src, dst, exclusive, partial(copy_range_hashed, hasher=hasher))
+    return hasher.hexdigest()
+
+
+def fsync_batch(paths):
+    """把一批已写完的文件及其所在目录刷到磁盘"""
+    dirs = set()
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        dirs.add(os.path.dirname(os.path.abspath(path)))
+    for directory in dirs:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
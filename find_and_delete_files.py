@@ -25,34 +25,29 @@
 import os
 import argparse
 
-def find_files(root_dir, extensions):
+from fswalk import iter_files, add_crawl_argument, DEFAULT_CRAWL_THREADS
+from delete_executor import DeleteExecutor, add_delete_arguments, executor_from_args
+
+# 下载目录里常见的垃圾文件
+JUNK_EXTENSIONS = ('.txt', '.url', '.html', '.htm', '.mhtml', '.apk', '.exe')
+
+def find_files(root_dir, extensions, crawl_threads=DEFAULT_CRAWL_THREADS):
     """递归查找指定扩展名的文件"""
-    matching_files = []
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.lower().endswith(tuple(extensions)):
-                full_path = os.path.join(root, file)
-                matching_files.append(full_path)
-    return matching_files
+    return [entry.path for entry in iter_files(root_dir, extensions, threads=crawl_threads)]
 
-def delete_files(files):
-    """删除文件列表，并打印删除结果"""
-    deleted = []
-    errors = []
-    for file_path in files:
-        try:
-            os.remove(file_path)
-            deleted.append(file_path)
-            print(f"已删除: {file_path}")
-        except OSError as e:
-            errors.append((file_path, str(e)))
-            print(f"删除失败: {file_path} - {e}")
-    return deleted, errors
+def delete_files(files, executor=None):
+    """按设备并行删除文件列表 (delete_executor.py)，返回 (已删除的路径, [(路径, 错误)])"""
+    if executor is None:
+        executor = DeleteExecutor(tool="find_and_delete_files")
+    result = executor.run(files)
+    return [path for path, _ in result.deleted], result.errors
 
 def main():
     parser = argparse.ArgumentParser(description="遍历、打印并删除指定文件夹下的txt、url、html、htm、mhtml、apk文件")
     parser.add_argument("directory", help="要扫描的目录路径")
     parser.add_argument("--no-confirm", action="store_true", help="跳过确认，直接删除（谨慎使用！）")
+    add_crawl_argument(parser)
+    add_delete_arguments(parser)
     args = parser.parse_args()
     
     root_dir = os.path.abspath(args.directory)
@@ -60,8 +55,7 @@ def main():
         print(f"Error: 目录 {root_dir} 不存在。")
         return
     
-    extensions = ('.txt', '.url', '.html', '.htm', '.mhtml', '.apk', '.exe')
-    files = find_files(root_dir, extensions)
+    files = find_files(root_dir, JUNK_EXTENSIONS, args.crawl_threads)
     
     if not files:
         print("未找到匹配的文件。")
@@ -79,7 +73,7 @@ def main():
             return
     
     print("\n开始删除...")
-    deleted, errors = delete_files(files)
+    deleted, errors = delete_files(files, executor_from_args(args, "find_and_delete_files"))
     
     print(f"\n删除完成: {len(deleted)} 个文件成功删除。")
     if errors:
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+基于 os.scandir 的共享目录遍历
+
+os.walk 之后再调用 os.path.getsize / os.stat，每个文件至少要多一次 stat，
+在 NAS 挂载上每次 stat 都是一次网络往返。这里直接返回 os.DirEntry：
+文件类型来自目录项本身 (d_type)，不需要 stat；entry.stat() 的结果会被缓存，
+同一个文件在一次运行中最多 stat 一次。
+
+    for entry in iter_files(["/mnt/u10tdisk/movies"], extensions={".mp4", ".mkv"}):
+        print(entry.path, entry.stat().st_size)
+
+exFAT 移动硬盘和网络挂载上列目录主要耗在等待延迟上，iter_files 默认用 crawl_dirs
+以多个线程同时 scandir 不同的目录；输出顺序与线程调度无关，按名称排序的先序遍历。
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CRAWL_THREADS = 8
+
+
+def normalize_extensions(extensions):
+    """把扩展名列表统一为小写的元组，None 表示不过滤"""
+    if extensions is None:
+        return None
+    return tuple(ext.lower() for ext in extensions)
+
+
+def has_extension(name, extensions):
+    # 与原来各脚本的 file.lower().endswith(tuple(extensions)) 保持一致
+    return extensions is None or name.lower().endswith(extensions)
+
+
+def _should_prune(entry, prune):
+    if prune is None:
+        return False
+    if callable(prune):
+        return prune(entry)
+    return entry.name in prune
+
+
+def scan_dir(path, on_error=None):
+    """列出目录，返回 (子目录项, 其他项)，与 os.walk 一样，指向目录的软链接算作子目录"""
+    dirs, others = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (dirs if is_dir else others).append(entry)
+    except OSError as e:
+        if on_error is not None:
+            on_error(e)
+        return None
+    return dirs, others
+
+
+def walk_dirs(root, topdown=True, prune=None, on_error=None, follow_symlinks=False):
+    """类似 os.walk，但产出 (dirpath, 子目录项列表, 其他项列表)，元素均为 os.DirEntry
+
+    topdown 为 True 时可以原地修改子目录项列表来跳过某些目录。
+    prune 可以是目录名集合，也可以是 callable(entry) -> bool，返回 True 的目录不进入。
+    用显式栈代替递归，目录再深也不会超出 Python 的递归深度限制。
+    """
+    # 栈帧: [dirpath, 子目录项列表, 其他项列表, 尚未进入的子目录迭代器]，列目录之前后三项为 None
+    stack = [[root, None, None, None]]
+    while stack:
+        frame = stack[-1]
+        path, dirs, others, pending = frame
+        if dirs is None:
+            listing = scan_dir(path, on_error)
+            if listing is None:
+                stack.pop()
+                continue
+            dirs, others = listing
+            dirs = [d for d in dirs if not _should_prune(d, prune)]
+            frame[1], frame[2] = dirs, others
+            if topdown:
+                yield path, dirs, others
+            # 在 yield 之后读取 dirs，调用方原地修改的结果才会生效
+            frame[3] = pending = iter([d for d in dirs if follow_symlinks or not d.is_symlink()])
+
+        child = next(pending, None)
+        if child is not None:
+            stack.append([child.path, None, None, None])
+            continue
+        stack.pop()
+        if not topdown:
+            yield path, dirs, others
+
+
+def _entry_name(entry):
+    return entry.name
+
+
+def crawl_dirs(roots, threads=DEFAULT_CRAWL_THREADS, prune=None, on_error=None, follow_symlinks=False,
+               prefetch=None):
+    """多线程版的 walk_dirs(topdown=True)，产出 (dirpath, 子目录项列表, 其他项列表)
+
+    调用方取到一个目录时，把它的子目录交给线程池，兄弟目录的 scandir 同时进行；
+    只提前列出当前路径上各层的兄弟目录，不会先于调用方把整棵树列进内存。
+    调用方仍然按名称排序的先序顺序拿到结果，多次运行输出相同。
+    子目录只能用 prune 跳过（列目录在后台提前进行，原地修改子目录列表不起作用）。
+    prefetch(entry) 返回 True 的文件在后台线程中先调用一次 entry.stat()，结果缓存在 DirEntry 中。
+    """
+    if isinstance(roots, (str, os.PathLike)):
+        roots = [roots]
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max(1, threads))
+
+    def list_dir(path):
+        if stop.is_set():
+            return None
+        listing = scan_dir(path, on_error)
+        if listing is None:
+            return None
+        dirs, others = listing
+        dirs = sorted((d for d in dirs if not _should_prune(d, prune)), key=_entry_name)
+        others.sort(key=_entry_name)
+        if prefetch is not None:
+            for entry in others:
+                if stop.is_set():
+                    break
+                try:
+                    if prefetch(entry):
+                        entry.stat()
+                except OSError:
+                    pass
+        return dirs, others
+
+    try:
+        stack = [(root, pool.submit(list_dir, root)) for root in reversed(roots)]
+        while stack:
+            path, future = stack.pop()
+            result = future.result()
+            if result is None:
+                continue
+            dirs, others = result
+            # 先提交子目录再交给调用方，调用方处理这个目录时子目录已经在后台列出
+            stack.extend((d.path, pool.submit(list_dir, d.path))
+                         for d in reversed(dirs) if follow_symlinks or not d.is_symlink())
+            yield path, dirs, others
+    finally:
+        # 提前结束（break、异常、Ctrl-C）时不再继续列后面的目录
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_files(roots, extensions=None, prune=None, on_error=None, threads=DEFAULT_CRAWL_THREADS, stat=False):
+    """遍历一个或多个根目录下的普通文件（包括指向文件的软链接），产出 os.DirEntry
+
+    extensions: 扩展名集合（如 {".mp4"}），不区分大小写；None 表示全部文件。
+    threads 大于 1 时用 crawl_dirs 并行列目录（输出按名称排序），为 1 时按 walk_dirs 顺序逐个列。
+    stat 为 True 表示调用方需要文件大小等信息，并行时会在后台线程中提前 stat。
+    """
+    if isinstance(roots, (str, os.PathLike)):
+        roots = [roots]
+    extensions = normalize_extensions(extensions)
+
+    def wanted(entry):
+        return has_extension(entry.name, extensions) and entry.is_file()
+
+    if threads > 1:
+        walker = crawl_dirs(roots, threads, prune, on_error, prefetch=wanted if stat else None)
+    else:
+        walker = (item for root in roots for item in walk_dirs(root, prune=prune, on_error=on_error))
+
+    for _, _, others in walker:
+        for entry in others:
+            try:
+                if wanted(entry):
+                    yield entry
+            except OSError:
+                continue
+
+
+def add_crawl_argument(parser):
+    """给 argparse 解析器添加统一的 --crawl-threads 参数"""
+    parser.add_argument("--crawl-threads", type=int, default=DEFAULT_CRAWL_THREADS,
+                        help=f"同时列目录的线程数，网络挂载和移动硬盘上可以调大，1 表示逐个目录遍历 "
+                             f"(默认: {DEFAULT_CRAWL_THREADS})")
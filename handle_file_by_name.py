@@ -1,18 +1,45 @@
 #!/usr/bin/env python3
 import os
-import shutil
+import errno
 from collections import defaultdict
 import argparse
 from datetime import datetime
 
-def find_videos(root_dir, extensions):
-    """递归查找视频文件"""
+from devices import mount_root
+from journal import Journal, read_journal
+from fswalk import iter_files, add_crawl_argument, DEFAULT_CRAWL_THREADS
+from catalog import open_catalog_for, add_catalog_arguments
+from staged_hash import staged_digests, sample_hash, sample_kind, SAMPLE_BYTES
+from hashers import DEFAULT_ALGORITHM, hash_file
+from hash_cache import open_cache, add_cache_arguments
+from dedupe_link import link_duplicate, add_link_argument
+
+# 每个文件系统挂载点下的隔离目录名，移动到这里只需要 rename，不会复制数据
+DUMP_DIR_NAME = ".dump"
+JOURNAL_NAME = "journal.jsonl"
+
+def find_videos(root_dir, extensions, stats=None, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """递归查找视频文件；stats 不为 None 时顺便记录 {path: stat_result}"""
+    videos = []
+    # 扫描目录本身就是挂载点时，不要把隔离目录里的文件再算进来
+    for entry in iter_files(root_dir, extensions, prune={DUMP_DIR_NAME}, threads=crawl_threads,
+                            stat=stats is not None):
+        if stats is not None:
+            try:
+                stats[entry.path] = entry.stat()
+            except OSError:
+                continue
+        videos.append(entry.path)
+    return videos
+
+def find_videos_in_catalog(catalog, root_dir, extensions):
+    """从目录数据库查询文件名重复的视频（不遍历磁盘），跳过隔离目录和已经不存在的文件"""
     videos = []
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.lower().endswith(tuple(extensions)):
-                full_path = os.path.join(root, file)
-                videos.append(full_path)
+    for entry in catalog.same_name([root_dir], extensions):
+        if f"{os.sep}{DUMP_DIR_NAME}{os.sep}" in entry.path:
+            continue
+        if os.path.isfile(entry.path):
+            videos.append(entry.path)
     return videos
 
 def group_by_filename(videos):
@@ -23,49 +50,152 @@ def group_by_filename(videos):
         groups[filename].append(path)
     return groups
 
-def create_dump_dir(parent_dir):
-    """在上级目录创建 dump 目录"""
-    dump_dir = os.path.join(parent_dir, "dump")
-    os.makedirs(dump_dir, exist_ok=True)
-    return dump_dir
+def group_by_content(paths, cache=None, stats=None, algo=DEFAULT_ALGORITHM):
+    """把同名文件按内容分组（大小 -> 采样哈希 -> 完整哈希），返回 [[path, ...]]，每组第一个文件保留
+
+    大小取自遍历时的 stats，大小唯一的文件不读取内容；同大小的文件各算一次采样哈希，
+    采样也相同的才算完整哈希，不做两两比较。读取失败的文件单独成组。
+    """
+    stats = stats or {}
+    size_map = defaultdict(list)
+    sizes = {}
+    for path in paths:
+        try:
+            st = stats.get(path) or os.stat(path)
+        except OSError:
+            continue
+        stats[path] = st
+        sizes[path] = st.st_size
+        size_map[st.st_size].append(path)
+
+    samples = {}
+
+    def partial_hash(path):
+        compute = lambda p: sample_hash(p, algo=algo)
+        if cache is not None:
+            samples[path] = cache.digest(path, sample_kind(algo), compute, stats.get(path))
+        else:
+            samples[path] = compute(path)
+        return samples[path]
+
+    def full_hash(path):
+        # 不超过两个采样长度的文件已经被采样完整读取
+        if sizes[path] <= 2 * SAMPLE_BYTES:
+            return samples.get(path) or partial_hash(path)
+        compute = lambda p: hash_file(p, algo)
+        if cache is not None:
+            return cache.digest(path, algo, compute, stats.get(path))
+        return compute(path)
+
+    digests = staged_digests(size_map, full_hash, partial_hash)
+    clusters = {}
+    for path in paths:
+        digest = digests.get(path)
+        # 大小不同、读取失败的文件各自成组；摘要只在同一大小内比较
+        key = (sizes[path], digest) if digest and path in sizes else path
+        clusters.setdefault(key, []).append(path)
+    return list(clusters.values())
+
+class DumpDirs:
+    """按设备选择隔离目录：每个文件移动到它所在挂载点下的 .dump 目录"""
+
+    def __init__(self):
+        self.by_dev = {}
 
-def move_duplicate(dump_dir, path, timestamp):
-    """移动文件到 dump 目录，并添加时间戳"""
+    def for_path(self, path, st=None):
+        dev = (st or os.stat(path)).st_dev
+        if dev not in self.by_dev:
+            dump_dir = os.path.join(mount_root(path), DUMP_DIR_NAME)
+            os.makedirs(dump_dir, exist_ok=True)
+            self.by_dev[dev] = dump_dir
+        return self.by_dev[dev]
+
+def move_duplicate(dump_dir, path, timestamp, journal=None):
+    """移动文件到 dump 目录，并添加时间戳（同一设备内 rename，不复制数据）"""
     filename = os.path.basename(path)
     name, ext = os.path.splitext(filename)
-    new_filename = f"{name}_{timestamp}{ext}"
-    new_path = os.path.join(dump_dir, new_filename)
+    new_path = os.path.join(dump_dir, f"{name}_{timestamp}{ext}")
+    counter = 1
+    while os.path.lexists(new_path):
+        new_path = os.path.join(dump_dir, f"{name}_{timestamp}_{counter}{ext}")
+        counter += 1
     
     try:
-        shutil.move(path, new_path)
+        os.rename(path, new_path)
+        if journal is not None:
+            journal.record("move", src=path, dst=new_path)
         print(f"已移动: {path} -> {new_path}")
         return True
     except OSError as e:
-        print(f"移动失败: {path} - {e}")
+        if e.errno == errno.EXDEV:
+            print(f"移动失败: {path} - 与隔离目录 {dump_dir} 不在同一设备")
+        else:
+            print(f"移动失败: {path} - {e}")
         return False
 
+def undo_moves(journal_file):
+    """按日志倒序把文件移回原位置"""
+    entries = [e for e in read_journal(journal_file) if e.get("action") == "move"]
+    restored = 0
+    for entry in reversed(entries):
+        src, dst = entry["src"], entry["dst"]
+        if not os.path.exists(dst):
+            continue
+        if os.path.lexists(src):
+            print(f"跳过: 原位置已存在文件 {src}")
+            continue
+        try:
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            os.rename(dst, src)
+            restored += 1
+            print(f"已恢复: {dst} -> {src}")
+        except OSError as e:
+            print(f"恢复失败: {dst} - {e}")
+    print(f"\n恢复完成: 总共恢复 {restored} 个文件。")
+    return restored
+
 def main():
-    parser = argparse.ArgumentParser(description="扫描指定目录，移动重复视频文件到上级 dump 目录")
+    parser = argparse.ArgumentParser(description="扫描指定目录，把重复视频文件移动到所在磁盘挂载点下的 .dump 目录")
     parser.add_argument("directory", help="要扫描的目录路径")
     parser.add_argument("--no-confirm", action="store_true", help="跳过确认，直接移动（谨慎使用！）")
+    parser.add_argument("--journal", default=None,
+                        help=f"移动日志 (JSONL) 路径 (默认: <扫描目录所在挂载点>/{DUMP_DIR_NAME}/{JOURNAL_NAME})")
+    parser.add_argument("--undo", action="store_true", help="按移动日志把文件全部移回原位置")
+    parser.add_argument("--ignore-content", action="store_true",
+                        help="不比较内容，同名文件全部当作重复（旧行为；默认只处理内容相同的同名文件）")
+    add_link_argument(parser)
+    add_cache_arguments(parser)
+    add_crawl_argument(parser)
+    add_catalog_arguments(parser)
     args = parser.parse_args()
     
     root_dir = os.path.abspath(args.directory)
     if not os.path.exists(root_dir):
         print(f"Error: 目录 {root_dir} 不存在。")
         return
+
+    journal_file = args.journal or os.path.join(mount_root(root_dir), DUMP_DIR_NAME, JOURNAL_NAME)
+    if args.undo:
+        if not os.path.exists(journal_file):
+            print(f"Error: 移动日志 {journal_file} 不存在。")
+            return
+        undo_moves(journal_file)
+        return
     
     # 常见视频扩展名
     extensions = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.ogv')
     
-    # 创建 dump 目录
-    parent_dir = os.path.dirname(root_dir)
-    dump_dir = create_dump_dir(parent_dir)
-    print(f"Dump 目录: {dump_dir}")
-    
     # 扫描视频
     print(f"扫描目录: {root_dir}")
-    videos = find_videos(root_dir, extensions)
+    stats = {}
+    if args.from_catalog:
+        catalog = open_catalog_for([root_dir], args.catalog)
+        if catalog is None:
+            return
+        with catalog:
+            videos = find_videos_in_catalog(catalog, root_dir, extensions)
+    else:
+        videos = find_videos(root_dir, extensions, stats, args.crawl_threads)
     if not videos:
         print("未找到视频文件。")
         return
@@ -75,25 +205,52 @@ def main():
     # 按文件名分组
     groups = group_by_filename(videos)
     
-    # 统计重复
-    duplicates = [(fname, paths) for fname, paths in groups.items() if len(paths) > 1]
-    total_dups = sum(len(paths) - 1 for _, paths in duplicates)
+    # 同名文件按内容再分组：内容相同的才是重复，内容不同的同名文件不处理
+    name_groups = [(fname, paths) for fname, paths in groups.items() if len(paths) > 1]
+    duplicates = []   # [(文件名, 保留的文件, [重复文件])]
+    different = []    # [(文件名, [内容各不相同的文件])]
+    if args.ignore_content:
+        duplicates = [(fname, paths[0], paths[1:]) for fname, paths in name_groups]
+    else:
+        print(f"比较 {len(name_groups)} 组同名文件的内容（大小 -> 采样哈希 -> 完整哈希）...")
+        cache = open_cache(args.cache, enabled=not args.no_cache)
+        try:
+            for fname, paths in name_groups:
+                clusters = group_by_content(paths, cache, stats)
+                for cluster in clusters:
+                    if len(cluster) > 1:
+                        duplicates.append((fname, cluster[0], cluster[1:]))
+                singles = [cluster[0] for cluster in clusters if len(cluster) == 1]
+                if singles and len(clusters) > 1:
+                    different.append((fname, singles))
+        finally:
+            if cache is not None:
+                cache.close()
+
+    for fname, paths in different:
+        print(f"\n文件名: {fname} 内容不同，不处理:")
+        for path in paths:
+            print(f"  - {path}")
+
+    total_dups = sum(len(dups) for _, _, dups in duplicates)
     
     if total_dups == 0:
-        print("未找到重复文件名。")
+        print("未找到重复文件。")
         return
     
-    print(f"找到 {len(duplicates)} 个重复文件名组，共 {total_dups} 个重复文件。")
+    print(f"\n找到 {len(duplicates)} 组重复文件，共 {total_dups} 个重复文件。")
     
     # 列出重复文件
-    for fname, paths in duplicates:
-        print(f"\n文件名: {fname} (重复 {len(paths)} 个)")
-        for path in paths:
+    for fname, keep, dups in duplicates:
+        print(f"\n文件名: {fname} (重复 {len(dups) + 1} 个)")
+        print(f"  [保留] {keep}")
+        for path in dups:
             print(f"  - {path}")
     
     # 确认
     if not args.no_confirm:
-        confirm = input(f"\n确认移动 {total_dups} 个重复视频文件到 dump 目录？(y/N): ").strip().lower()
+        action = "替换为链接" if args.link else f"移动到各磁盘的 {DUMP_DIR_NAME} 目录"
+        confirm = input(f"\n确认把 {total_dups} 个重复视频文件{action}？(y/N): ").strip().lower()
         if confirm != 'y':
             print("操作已取消。")
             return
@@ -101,13 +258,38 @@ def main():
     # 执行移动
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     moved_count = 0
-    for fname, paths in duplicates:
-        # 保留第一个，移动其余
-        for path in paths[1:]:
-            if move_duplicate(dump_dir, path, timestamp):
-                moved_count += 1
+    dump_dirs = DumpDirs()
+    linked_count = 0
+    with Journal(journal_file) as journal:
+        for fname, keep, dups in duplicates:
+            for path in dups:
+                if args.link:
+                    # 内容相同：原地替换为保留文件的 reflink/硬链接，不占用空间，路径仍然有效
+                    try:
+                        method, reason = link_duplicate(keep, path, args.link)
+                    except OSError as e:
+                        print(f"链接失败: {path} - {e}")
+                        continue
+                    if method is not None:
+                        journal.record("link", src=keep, dst=path, method=method)
+                        print(f"已{'reflink' if method == 'reflink' else '硬链接'}: {path} -> {keep}")
+                        linked_count += 1
+                        continue
+                    print(f"无法链接: {path} - {reason}，改为移动到隔离目录")
+                try:
+                    dump_dir = dump_dirs.for_path(path, stats.get(path))
+                except OSError as e:
+                    print(f"移动失败: {path} - 无法创建隔离目录: {e}")
+                    continue
+                if move_duplicate(dump_dir, path, timestamp, journal):
+                    moved_count += 1
     
+    if linked_count:
+        print(f"\n链接完成: 总共替换 {linked_count} 个文件。")
     print(f"\n移动完成: 总共移动 {moved_count} 个文件。")
+    if dump_dirs.by_dev:
+        print(f"隔离目录: {', '.join(sorted(dump_dirs.by_dev.values()))}")
+    print(f"移动日志: {journal_file} (使用 --undo 可以全部移回)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+所有去重脚本共用的文件摘要缓存 (SQLite)
+
+缓存键为 (st_dev, st_ino, size, mtime_ns, kind)，只要文件没有被修改，
+再次扫描时直接取出上次算好的摘要，不需要重新读取文件内容。
+kind 用来区分摘要类型（例如 "md5"），不同类型的摘要互不混用。
+
+默认缓存位置: ~/.cache/shtool/hash_cache.sqlite3
+可以通过环境变量 SHTOOL_HASH_CACHE 或各脚本的 --cache 参数修改。
+"""
+import os
+import sqlite3
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "shtool", "hash_cache.sqlite3")
+
+# 每写入多少条记录提交一次事务
+COMMIT_EVERY = 200
+
+
+class HashCache:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get("SHTOOL_HASH_CACHE") or DEFAULT_CACHE_PATH
+        cache_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digests (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                path TEXT,
+                PRIMARY KEY (dev, ino, size, mtime_ns, kind)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(st, kind):
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, kind)
+
+    def get(self, st, kind):
+        """根据 stat 结果查找摘要，未命中返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT digest FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND kind=?",
+                self._key(st, kind),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, st, kind, digest, path=None):
+        """保存摘要，st 必须是计算摘要之前取得的 stat 结果"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO digests (dev, ino, size, mtime_ns, kind, digest, path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._key(st, kind) + (digest, path),
+            )
+            self.pending += 1
+            if self.pending >= COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+
+    def digest(self, path, kind, compute, st=None):
+        """先查缓存，未命中时调用 compute(path) 计算并写回缓存"""
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return compute(path)
+
+        cached = self.get(st, kind)
+        if cached:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        result = compute(path)
+        if result:
+            self.put(st, kind, result, path)
+        return result
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def summary(self):
+        return f"缓存命中 {self.hits} 个，重新计算 {self.misses} 个 ({self.db_path})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_cache(db_path=None, enabled=True):
+    """按命令行参数打开缓存，禁用时返回 None"""
+    if not enabled:
+        return None
+    return HashCache(db_path)
+
+
+def add_cache_arguments(parser):
+    """给 argparse 解析器添加统一的缓存参数"""
+    parser.add_argument("--cache", default=None, help=f"摘要缓存数据库路径 (默认: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--no-cache", action="store_true", help="不使用摘要缓存，强制重新读取所有文件")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+按物理设备并行计算文件摘要
+
+待处理的文件按 st_dev 分组，每个设备只分配固定数量的读取线程
+（机械硬盘默认 1 个，避免磁头来回寻道；固态硬盘默认 4 个），
+不同设备之间同时读取。hashlib 在计算大块数据时会释放 GIL，
+所以用线程池即可让多块硬盘同时跑满。
+"""
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_HDD_READERS = 1
+DEFAULT_SSD_READERS = 4
+
+
+def is_rotational(dev):
+    """通过 /sys/dev/block 判断设备是否为机械硬盘，无法判断时按机械硬盘处理"""
+    major, minor = os.major(dev), os.minor(dev)
+    block_dir = f"/sys/dev/block/{major}:{minor}"
+    # 分区没有 queue 目录，需要查看所属磁盘
+    for candidate in (block_dir, os.path.join(block_dir, "..")):
+        flag = os.path.join(candidate, "queue", "rotational")
+        try:
+            with open(flag) as f:
+                return f.read().strip() != "0"
+        except OSError:
+            continue
+    return True
+
+
+class HashScheduler:
+    def __init__(self, hdd_readers=DEFAULT_HDD_READERS, ssd_readers=DEFAULT_SSD_READERS, progress_every=100):
+        self.hdd_readers = max(1, hdd_readers)
+        self.ssd_readers = max(1, ssd_readers)
+        self.progress_every = progress_every
+
+    def readers_for(self, dev):
+        return self.hdd_readers if is_rotational(dev) else self.ssd_readers
+
+    def group_by_device(self, paths, stats=None):
+        """{st_dev: deque([path, ...])}，同一设备内按路径排序以尽量顺序读取
+
+        stats 为遍历时已经取得的 {path: stat_result}，命中时不再 stat。
+        """
+        stats = stats or {}
+        groups = defaultdict(list)
+        for path in paths:
+            try:
+                st = stats.get(path) or os.stat(path)
+                dev = st.st_dev
+            except OSError:
+                dev = None
+            groups[dev].append(path)
+        return {dev: deque(sorted(items)) for dev, items in groups.items()}
+
+    def hash_many(self, paths, hash_fn, on_done=None, stats=None, stop=None):
+        """并行计算 hash_fn(path)，返回 {path: 摘要}
+
+        on_done(path, digest) 在每个文件完成后调用（可能来自任意线程）。
+        stop 为 threading.Event，中断时会被设置；hash_fn 处理大文件时可以检查它提前返回。
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+
+        groups = self.group_by_device(paths, stats)
+        results = {}
+        lock = threading.Lock()
+        if stop is None:
+            stop = threading.Event()
+        total = len(paths)
+
+        def drain(queue):
+            while not stop.is_set():
+                try:
+                    path = queue.popleft()
+                except IndexError:
+                    return
+                digest = hash_fn(path)
+                with lock:
+                    results[path] = digest
+                    done = len(results)
+                if on_done is not None:
+                    on_done(path, digest)
+                if self.progress_every and done % self.progress_every == 0:
+                    print(f"    进度: 已完成 {done}/{total} 个文件")
+
+        workers = []
+        for dev, queue in groups.items():
+            count = 1 if dev is None else self.readers_for(dev)
+            workers.extend([queue] * count)
+
+        with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+            futures = [pool.submit(drain, queue) for queue in workers]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # Ctrl-C 等中断时让各线程读完当前文件后退出，不再继续处理队列
+                stop.set()
+                raise
+
+        return results
+
+
+def add_scheduler_arguments(parser):
+    """给 argparse 解析器添加统一的并行读取参数"""
+    parser.add_argument("--hdd-readers", type=int, default=DEFAULT_HDD_READERS,
+                        help=f"每块机械硬盘同时读取的文件数 (默认: {DEFAULT_HDD_READERS})")
+    parser.add_argument("--ssd-readers", type=int, default=DEFAULT_SSD_READERS,
+                        help=f"每块固态硬盘同时读取的文件数 (默认: {DEFAULT_SSD_READERS})")
+
+
+def scheduler_from_args(args):
+    return HashScheduler(args.hdd_readers, args.ssd_readers)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+可选的文件摘要算法
+
+内置 md5 / sha1 / blake2b，安装了 xxhash 或 blake3 时还可以选择
+xxh64 / xxh128 / blake3。读取文件时复用同一个 bytearray 缓冲区 (readinto)，
+每次读取 1 MiB，不会为每个数据块创建新的 bytes 对象。
+"""
+import hashlib
+import threading
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+DEFAULT_ALGORITHM = "md5"
+BUFFER_SIZE = 1024 * 1024
+
+_FACTORIES = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "blake2b": hashlib.blake2b,
+}
+if xxhash is not None:
+    _FACTORIES["xxh64"] = xxhash.xxh64
+    _FACTORIES["xxh128"] = xxhash.xxh3_128
+if blake3 is not None:
+    _FACTORIES["blake3"] = blake3.blake3
+
+
+def available_algorithms():
+    return sorted(_FACTORIES)
+
+
+def new_hasher(algo=DEFAULT_ALGORITHM):
+    try:
+        return _FACTORIES[algo]()
+    except KeyError:
+        raise ValueError(f"不支持的摘要算法: {algo} (可用: {', '.join(available_algorithms())})") from None
+
+
+_local = threading.local()
+
+
+def _buffer(buf_size):
+    """每个线程复用一个读取缓冲区"""
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) != buf_size:
+        buf = _local.buf = bytearray(buf_size)
+    return buf
+
+
+def update_from_file(hasher, f, limit=None, buf_size=BUFFER_SIZE):
+    """从已打开的文件读取最多 limit 字节 (None 表示读到结尾) 并更新 hasher"""
+    view = memoryview(_buffer(buf_size))
+    remaining = limit
+    while remaining is None or remaining > 0:
+        want = buf_size if remaining is None else min(buf_size, remaining)
+        n = f.readinto(view[:want])
+        if not n:
+            break
+        hasher.update(view[:n])
+        if remaining is not None:
+            remaining -= n
+
+
+def hash_file(file_path, algo=DEFAULT_ALGORITHM, buf_size=BUFFER_SIZE):
+    """计算整个文件的摘要，读取失败返回 None"""
+    hasher = new_hasher(algo)
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            update_from_file(hasher, f, buf_size=buf_size)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def add_algorithm_argument(parser):
+    """给 argparse 解析器添加统一的 --algo 参数"""
+    parser.add_argument("--algo", choices=available_algorithms(), default=DEFAULT_ALGORITHM,
+                        help=f"摘要算法 (默认: {DEFAULT_ALGORITHM})")
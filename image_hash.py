@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+图片感知哈希：找出换了文件名、重新压缩或缩放过的同一张图片（例如各种广告图）
+
+dhash: 缩小为 9x8 灰度图，每行相邻像素比较明暗，得到 64 位。速度最快，默认使用。
+phash: 缩小为 32x32 灰度图做二维 DCT，取左上角 8x8 低频系数与中位数比较，得到 64 位。
+       对调色、加水印等改动更稳定，计算稍慢。
+
+哈希以 16 位十六进制存入摘要缓存 (hash_cache.py)，kind 为 "img-dhash" / "img-phash"，
+未修改的图片不会再次解码。未命中缓存的图片交给进程池并行解码，10 万张图片可以用满所有 CPU。
+
+需要安装 Pillow: pip install Pillow
+"""
+import os
+import math
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+HASH_METHODS = ("dhash", "phash")
+DEFAULT_METHOD = "dhash"
+
+# 64 位哈希；同一张图的不同压缩 / 尺寸通常只差 0-3 位，简单的图之间可能只差 7-8 位，
+# 结果用于删除，默认取得保守一些
+DEFAULT_MAX_DISTANCE = 5
+
+PHASH_SIZE = 32
+PHASH_LOW = 8
+# 每个工作进程一次领取的图片数，减少进程间通信的开销
+CHUNK_SIZE = 64
+# 未命中缓存的图片少于这个数量时不启动进程池
+POOL_THRESHOLD = 32
+
+# DCT-II 的余弦表，只需要前 PHASH_LOW 个频率: _COS[u][x] = cos((2x + 1) u π / 2N)
+_COS = [[math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+        for u in range(PHASH_LOW)]
+
+
+def pillow_available():
+    return Image is not None
+
+
+def hash_kind(method):
+    return f"img-{method}"
+
+
+def _load_gray(path, width, height):
+    """解码并缩小为 width x height 的灰度像素 (bytes)"""
+    with Image.open(path) as img:
+        # JPEG 在解码时直接按 1/2、1/4、1/8 缩小，大图也只解码很少的像素
+        img.draft("L", (width * 8, height * 8))
+        img = img.convert("L").resize((width, height), Image.BILINEAR)
+        return img.tobytes()
+
+
+def _dhash(path):
+    pixels = _load_gray(path, 9, 8)
+    value = 0
+    for y in range(8):
+        row = pixels[y * 9:(y + 1) * 9]
+        for x in range(8):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value
+
+
+def _phash(path):
+    pixels = _load_gray(path, PHASH_SIZE, PHASH_SIZE)
+    n = PHASH_SIZE
+    # 先对每一行做一维 DCT（只算低频），再对低频列做一维 DCT
+    rows = [[sum(c * p for c, p in zip(cos_u, pixels[y * n:(y + 1) * n])) for cos_u in _COS]
+            for y in range(n)]
+    coeffs = [sum(cos_v[y] * rows[y][u] for y in range(n)) for cos_v in _COS for u in range(PHASH_LOW)]
+    # 直流分量只反映整体亮度，不参与中位数
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]
+    value = 0
+    for c in coeffs:
+        value = (value << 1) | (c > median)
+    return value
+
+
+def image_hash(path, method=DEFAULT_METHOD):
+    """计算一张图片的 64 位感知哈希，返回 16 位十六进制；无法解码时返回 None"""
+    compute = _phash if method == "phash" else _dhash
+    try:
+        return f"{compute(path):016x}"
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        # Pillow 对损坏的文件可能抛出 SyntaxError / ValueError
+        return None
+
+
+def hash_images(files, method=DEFAULT_METHOD, cache=None, jobs=None, progress=None):
+    """[(path, stat_result 或 None)] -> {path: 64 位整数哈希}，无法解码的图片不出现在结果里
+
+    先查摘要缓存，未命中的图片用 jobs 个进程并行计算（None 表示 CPU 核数）；
+    progress(done, total) 用于显示进度。
+    """
+    if Image is None:
+        raise RuntimeError("需要安装 Pillow: pip install Pillow")
+    kind = hash_kind(method)
+    results = {}
+    todo = []
+    for path, st in files:
+        cached = cache.get(st, kind) if cache is not None and st is not None else None
+        if cached:
+            cache.hits += 1
+            results[path] = int(cached, 16)
+        else:
+            todo.append((path, st))
+
+    total = len(files)
+    done = total - len(todo)
+    if progress and done:
+        progress(done, total)
+
+    compute = partial(image_hash, method=method)
+    paths = [path for path, _ in todo]
+    pool = None
+    if len(todo) >= POOL_THRESHOLD and jobs != 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        digests = pool.map(compute, paths, chunksize=CHUNK_SIZE)
+    else:
+        digests = map(compute, paths)
+    try:
+        for (path, st), digest in zip(todo, digests):
+            done += 1
+            if cache is not None:
+                cache.misses += 1
+                if digest and st is not None:
+                    cache.put(st, kind, digest, path)
+            if digest:
+                results[path] = int(digest, 16)
+            if progress and (done % 500 == 0 or done == total):
+                progress(done, total)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return results
+
+
+def stat_images(paths):
+    """[path] -> [(path, stat_result)]，跳过无法访问的文件"""
+    files = []
+    for path in paths:
+        try:
+            files.append((path, os.stat(path)))
+        except OSError as e:
+            print(f"警告: 无法访问 {path}: {e}")
+    return files
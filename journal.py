@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+JSONL 操作日志
+
+每个移动/删除操作追加一行 JSON，立即刷新到磁盘，既方便事后审计，
+也可以按日志批量撤销（例如 handle_file_by_name.py --undo）。
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        journal_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(journal_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def record(self, action, **fields):
+        entry = {"time": datetime.now().isoformat(timespec='seconds'), "action": action}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.f.write(line)
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_journal(path):
+    """逐条读取日志，跳过中断时写了一半的行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -1,61 +1,256 @@
 #!/usr/bin/env python3
 import os
-import hashlib
 import json
 from collections import defaultdict
 import argparse
 
-def file_hash(file_path):
-    """计算文件的MD5哈希值"""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-    except (IOError, OSError):
+from hash_cache import open_cache, add_cache_arguments
+from staged_hash import staged_digests, sample_hash, sample_kind, hash_sequential
+from hash_scheduler import add_scheduler_arguments, scheduler_from_args
+from video_index import (IndexWriter, iter_index, find_index, export_json, remove_other_index, JSON_INDEX_NAME,
+                         NDJSON_INDEX_NAME)
+from checkpoint import add_checkpoint_arguments
+from fswalk import iter_files, add_crawl_argument, DEFAULT_CRAWL_THREADS
+from hashers import DEFAULT_ALGORITHM, hash_file, add_algorithm_argument
+
+def file_hash(file_path, algo=DEFAULT_ALGORITHM):
+    """计算文件的摘要（默认MD5）"""
+    h = hash_file(file_path, algo)
+    if h is None:
         print(f"Warning: Cannot read {file_path}")
-        return None
-    return hash_md5.hexdigest()
+    return h
 
-def scan_videos(root_dir, extensions):
-    """扫描视频文件，计算MD5，并分组"""
-    video_index = defaultdict(list)  # md5 -> list of {"filename": , "path": }
-    
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.lower().endswith(tuple(extensions)):
-                full_path = os.path.join(root, file)
-                h = file_hash(full_path)
-                if h:
-                    video_index[h].append({
-                        "filename": file,
-                        "path": full_path
-                    })
+def find_videos(root_dir, extensions, stats=None, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """递归查找视频文件；stats 不为 None 时顺便记录 {path: stat_result}，后续不再 stat"""
+    videos = []
+    for entry in iter_files(root_dir, extensions, threads=crawl_threads, stat=stats is not None):
+        if stats is not None:
+            try:
+                stats[entry.path] = entry.stat()
+            except OSError:
+                print(f"Warning: Cannot read {entry.path}")
+                continue
+        videos.append(entry.path)
+    return videos
+
+def hash_videos(videos, cache=None, staged=False, scheduler=None, algo=DEFAULT_ALGORITHM, on_result=None,
+                 known=None, stats=None):
+    """计算视频文件摘要，返回 {path: 摘要}
+
+    staged 为 True 时先按大小、再按首尾采样哈希排除不可能重复的文件，
+    这些文件的摘要为 None。scheduler 不为 None 时按设备并行读取。
+    每个文件的结果确定后调用 on_result(path, 摘要)（可能来自多个线程）。
+    known 为已经算好的 {path: 摘要}（例如中断前写入索引的记录），不再重新读取。
+    stats 为遍历时取得的 {path: stat_result}。
+    """
+    known = known or {}
+    stats = stats or {}
+
+    def compute_full(path):
+        if known.get(path):
+            return known[path]
+        return file_hash(path, algo)
+
+    def compute_sample(path):
+        return sample_hash(path, algo=algo)
+
+    def full_hash(path):
+        if cache is not None:
+            return cache.digest(path, algo, compute_full, stats.get(path))
+        return compute_full(path)
+
+    def partial_hash(path):
+        if cache is not None:
+            return cache.digest(path, sample_kind(algo), compute_sample, stats.get(path))
+        return compute_sample(path)
+
+    if scheduler is not None:
+        hash_many = lambda paths, fn, on_done=None: scheduler.hash_many(paths, fn, on_done, stats)
+    else:
+        hash_many = hash_sequential
+    if not staged:
+        return hash_many(videos, full_hash, on_done=on_result)
+
+    size_map = defaultdict(list)
+    for path in videos:
+        try:
+            size = stats[path].st_size if path in stats else os.path.getsize(path)
+            size_map[size].append(path)
+        except OSError:
+            print(f"Warning: Cannot read {path}")
+    digests = staged_digests(size_map, full_hash, partial_hash, hash_many, on_result)
+    print(f"按大小和首尾采样排除后，需要完整哈希 {sum(1 for h in digests.values() if h)}/{len(digests)} 个文件")
+    return digests
+
+def make_entry(path, digest, algo=DEFAULT_ALGORITHM, st=None):
+    """索引中的一条记录，记录摘要算法，避免不同算法的索引被混在一起比较
+
+    size 和 mtime_ns 供 --update 判断文件是否被修改。
+    """
+    entry = {
+        "filename": os.path.basename(path),
+        "path": path,
+        "algo": algo,
+        "hash": digest
+    }
+    try:
+        st = st or os.stat(path)
+        entry["size"] = st.st_size
+        entry["mtime_ns"] = st.st_mtime_ns
+    except OSError:
+        pass
+    return entry
+
+def scan_videos(root_dir, extensions, cache=None, staged=False, scheduler=None, algo=DEFAULT_ALGORITHM,
+                crawl_threads=DEFAULT_CRAWL_THREADS):
+    """扫描视频文件，计算摘要，并分组（cache 不为 None 时优先使用摘要缓存）"""
+    video_index = defaultdict(list)  # hash -> list of {"filename": , "path": }
+
+    stats = {}
+    videos = find_videos(root_dir, extensions, stats, crawl_threads)
+    digests = hash_videos(videos, cache, staged, scheduler, algo, stats=stats)
+    for full_path, h in digests.items():
+        if h or staged:
+            video_index[h].append({
+                "filename": os.path.basename(full_path),
+                "path": full_path
+            })
     
     return video_index
 
-def save_index(video_index, index_file):
-    """保存索引到JSON文件"""
+def load_done(index_file, algo=DEFAULT_ALGORITHM):
+    """读取中断前已经写入索引的记录 {path: 摘要}，算法不一致时返回 None"""
+    done = {}
+    for entry in iter_index(index_file):
+        if entry.get("algo", "md5") != algo:
+            print(f"Error: 已有索引使用 {entry.get('algo', 'md5')} 算法，与本次的 {algo} 不同，无法继续。")
+            return None
+        done[entry["path"]] = entry.get("hash")
+    return done
+
+def scan_to_ndjson(root_dir, extensions, index_file, cache=None, staged=False, scheduler=None, algo=DEFAULT_ALGORITHM,
+                   resume=False, flush_interval=60, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """扫描视频文件，每算完一个文件就追加写入 NDJSON 索引
+
+    索引文件本身就是检查点：resume 为 True 时保留已有记录，只处理剩下的文件。
+    """
+    done = {}
+    if resume and os.path.exists(index_file):
+        done = load_done(index_file, algo)
+        if done is None:
+            return
+        print(f"从已有索引继续: 已完成 {len(done)} 个文件")
+
+    stats = {}
+    videos = find_videos(root_dir, extensions, stats, crawl_threads)
+    with IndexWriter(index_file, append=bool(done), flush_interval=flush_interval) as writer:
+        def on_result(path, h):
+            if path in done:
+                return
+            if h or staged:
+                writer.write(make_entry(path, h, algo, stats.get(path)))
+
+        try:
+            hash_videos(videos, cache, staged, scheduler, algo, on_result, done, stats)
+        except KeyboardInterrupt:
+            print("\n扫描被中断，已完成的记录保存在索引中。使用 --resume 参数再次运行可以继续。")
+            raise
+
+    remove_other_index(index_file)
+    print(f"索引已保存到: {index_file}")
+    print(f"总视频文件数: {len(done) + writer.count}")
+
+def update_index(root_dir, extensions, old_index_file, index_file, cache=None, staged=False, scheduler=None,
+                 algo=DEFAULT_ALGORITHM, flush_interval=60, crawl_threads=DEFAULT_CRAWL_THREADS):
+    """增量更新索引：路径、大小和修改时间都没变的文件直接沿用旧摘要
+
+    新的索引先写入临时文件，完成后再替换，更新中断不会破坏旧索引。
+    返回 (新增, 修改, 删除, 未变) 的路径列表。
+    """
+    old = {}
+    for entry in iter_index(old_index_file):
+        if entry.get("algo", "md5") != algo:
+            print(f"Error: 已有索引使用 {entry.get('algo', 'md5')} 算法，与本次的 {algo} 不同。请去掉 --update 重新扫描。")
+            return None
+        old[entry["path"]] = entry
+
+    stats = {}
+    videos = find_videos(root_dir, extensions, stats, crawl_threads)
+    known = {}
+    added, modified, unchanged = [], [], []
+    for path in videos:
+        st = stats[path]
+        entry = old.get(path)
+        if entry is None:
+            added.append(path)
+        elif (entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+                and (entry.get("hash") or staged)):
+            unchanged.append(path)
+            if entry.get("hash"):
+                known[path] = entry["hash"]
+        else:
+            modified.append(path)
+    removed = sorted(set(old) - set(stats))
+
+    print(f"新增 {len(added)} 个，修改 {len(modified)} 个，删除 {len(removed)} 个，未变 {len(unchanged)} 个")
+
+    tmp_file = index_file + ".tmp"
+    with IndexWriter(tmp_file, flush_interval=flush_interval) as writer:
+        def on_result(path, h):
+            if h or staged:
+                writer.write(make_entry(path, h, algo, stats.get(path)))
+
+        # 未变的文件直接使用旧摘要；--staged 时仍然参与大小/采样比较，
+        # 以便发现与新文件重复的旧文件
+        hash_videos(videos, cache, staged, scheduler, algo, on_result, known, stats)
+    os.replace(tmp_file, index_file)
+    remove_other_index(index_file)
+
+    print(f"索引已保存到: {index_file}")
+    print(f"总视频文件数: {writer.count}")
+    return added, modified, removed, unchanged
+
+def print_changes(label, paths, limit=20):
+    if not paths:
+        return
+    print(f"{label} ({len(paths)}):")
+    for path in sorted(paths)[:limit]:
+        print(f"  {path}")
+    if len(paths) > limit:
+        print(f"  ... 另有 {len(paths) - limit} 个")
+
+def save_index(video_index, index_file, algo=DEFAULT_ALGORITHM):
+    """保存索引到JSON文件，每条记录都带上摘要算法，避免不同算法的索引被混在一起比较"""
     # 转换为列表格式，便于排序和保存
     index_list = []
-    for md5, items in video_index.items():
+    for digest, items in video_index.items():
         for item in items:
-            item_copy = item.copy()
-            item_copy["md5"] = md5
-            index_list.append(item_copy)
+            index_list.append(make_entry(item["path"], digest, algo))
     
     # 按路径排序
     index_list.sort(key=lambda x: x["path"])
     
     with open(index_file, 'w', encoding='utf-8') as f:
         json.dump(index_list, f, ensure_ascii=False, indent=2)
+    remove_other_index(index_file)
     
     print(f"索引已保存到: {index_file}")
     print(f"总视频文件数: {len(index_list)}")
 
 def main_scan():
-    parser = argparse.ArgumentParser(description="扫描指定目录下的视频文件，生成MD5索引文件")
+    parser = argparse.ArgumentParser(description="扫描指定目录下的视频文件，生成MD5（或其他摘要）索引文件")
     parser.add_argument("directory", help="要扫描的目录路径")
+    parser.add_argument("--staged", action="store_true",
+                        help="只为可能重复的文件计算完整摘要：先比较大小，再比较首尾采样哈希")
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson",
+                        help=f"索引格式: ndjson 边扫描边写入 {NDJSON_INDEX_NAME}；json 为旧版 {JSON_INDEX_NAME} (默认: ndjson)")
+    parser.add_argument("--update", action="store_true",
+                        help="增量更新已有索引：只为新增或修改过的文件计算摘要，并移除已删除文件的记录")
+    add_algorithm_argument(parser)
+    add_cache_arguments(parser)
+    add_scheduler_arguments(parser)
+    add_checkpoint_arguments(parser, path_option=False)
+    add_crawl_argument(parser)
     args = parser.parse_args()
     
     root_dir = os.path.abspath(args.directory)
@@ -67,10 +262,45 @@ def main_scan():
     extensions = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.ogv')
     
     print(f"扫描目录: {root_dir}")
-    video_index = scan_videos(root_dir, extensions)
-    index_file = os.path.join(root_dir, "video_md5_index.json")
-    
-    save_index(video_index, index_file)
+    cache = open_cache(args.cache, enabled=not args.no_cache)
+    scheduler = scheduler_from_args(args)
+    try:
+        old_index_file = find_index(root_dir)
+        if args.update and not old_index_file:
+            print("没有找到已有索引，执行完整扫描。")
+        if args.update and old_index_file:
+            if args.resume:
+                print("Error: --update 和 --resume 不能同时使用。")
+                return
+            index_file = os.path.join(root_dir, NDJSON_INDEX_NAME)
+            changes = update_index(root_dir, extensions, old_index_file, index_file, cache, args.staged,
+                                   scheduler, args.algo, args.checkpoint_interval, args.crawl_threads)
+            if changes is None:
+                return
+            added, modified, removed, _ = changes
+            print_changes("新增", added)
+            print_changes("修改", modified)
+            print_changes("删除", removed)
+            if args.format == "json":
+                json_file = os.path.join(root_dir, JSON_INDEX_NAME)
+                export_json(index_file, json_file)
+                os.remove(index_file)
+                print(f"索引已导出到: {json_file}")
+        elif args.format == "ndjson":
+            index_file = os.path.join(root_dir, NDJSON_INDEX_NAME)
+            scan_to_ndjson(root_dir, extensions, index_file, cache, args.staged, scheduler, args.algo,
+                           args.resume, args.checkpoint_interval, args.crawl_threads)
+        else:
+            if args.resume:
+                print("Error: --resume 需要 ndjson 格式的索引。")
+                return
+            video_index = scan_videos(root_dir, extensions, cache, args.staged, scheduler, args.algo,
+                                      args.crawl_threads)
+            save_index(video_index, os.path.join(root_dir, JSON_INDEX_NAME), args.algo)
+    finally:
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
 
 if __name__ == "__main__":
     main_scan()
\ No newline at end of file
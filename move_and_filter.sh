@@ -1,5 +1,11 @@
 #!/bin/bash
 
+# --estimate: only predict how long each device takes, without changing anything
+if [ "$1" = "--estimate" ]; then
+    shift
+    exec python3 "$(dirname "$0")/estimate_cost.py" move-and-filter "$@"
+fi
+
 # Check if exactly two arguments are provided
 if [ "$#" -ne 2 ]; then
     echo "Usage: $0 source_directory target_directory"
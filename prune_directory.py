@@ -12,21 +12,52 @@ The script traverses the given source directory and performs the following actio
   removed from the source after their contents are processed. Empty directories
   left behind after moving files are also cleaned up.
 
+The run has two phases. Planning walks the source using metadata only and
+builds the complete list of moves, deletes and directory removals; moves onto
+the target's filesystem become plain renames, the others cross-device copies.
+Execution then renames, and copies in parallel with copy_file_range/sendfile,
+fsync'ing copies in batches before unlinking their sources. With --verify the
+copies are hashed while they are written and each destination is re-read and
+compared before its source is unlinked; the digests go to a sidecar manifest
+and the shared hash cache (copy_verify.py).
+
 Usage:
     python prune_directory.py <source_directory> <target_directory>
+    python prune_directory.py <source_directory> <target_directory> --dry-run
+    python prune_directory.py <source_directory> <target_directory> --verify
 """
 
 from __future__ import annotations
 
 import argparse
+import errno
+import os
 import shutil
 import sys
-from dataclasses import dataclass
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from typing import Iterable
 
+from copy_verify import DIGESTS_NAME, DigestRecorder
+from devices import existing_ancestor
+from fastcopy import copy_file, copy_file_hashed, fsync_batch
+from hash_cache import add_cache_arguments, open_cache
+from hashers import DEFAULT_ALGORITHM, available_algorithms
+from staged_hash import same_content
+
 MIN_VIDEO_SIZE_BYTES = 200 * 1024 * 1024
 
+DEFAULT_COPY_WORKERS = 2
+# Cross-device copies are fsync'ed together once a batch reaches either limit
+FSYNC_BATCH_FILES = 64
+FSYNC_BATCH_BYTES = 1024 * 1024 * 1024
+
+# What to do with a kept file whose destination already holds identical content
+DUPLICATE_POLICIES = ("drop", "hardlink", "keep")
+
 VIDEO_EXTENSIONS = {
     ".3gp",
     ".avi",
@@ -67,6 +98,111 @@ class Stats:
     other_deleted: int = 0
     dirs_removed: int = 0
     collisions_resolved: int = 0
+    duplicates_dropped: int = 0
+    link_failures: int = 0
+    copy_failures: int = 0
+
+
+@dataclass
+class Move:
+    """A kept file and where it goes in the target tree."""
+
+    source: Path
+    destination: Path
+    size: int
+    # Same filesystem as the target: a rename, no data is copied
+    same_device: bool
+    # The name asked for when *destination* had to get a `_N` suffix
+    requested: Path | None = None
+
+
+@dataclass
+class Duplicate:
+    """A kept file whose content is already at *existing* in the target."""
+
+    source: Path
+    existing: Path
+    size: int
+    # With the hardlink policy: a new name in the target linked to *existing*
+    link_path: Path | None = None
+
+
+@dataclass
+class DirRemoval:
+    path: Path
+    # Directories that held a kept video are only removed once empty
+    has_kept_video: bool
+
+
+@dataclass
+class PrunePlan:
+    """Every action of a pruning run, decided before any file is touched."""
+
+    target_device: int
+    on_duplicate: str = "drop"
+    moves: list[Move] = field(default_factory=list)
+    duplicates: list[Duplicate] = field(default_factory=list)
+    deletes: list[Path] = field(default_factory=list)
+    # Children come before their parents
+    dir_removals: list[DirRemoval] = field(default_factory=list)
+    # Names already taken in the target, so two moves never pick the same name
+    names: NameIndex = field(default_factory=lambda: NameIndex(), repr=False)
+
+    @property
+    def renames(self) -> list[Move]:
+        return [move for move in self.moves if move.same_device]
+
+    @property
+    def copies(self) -> list[Move]:
+        return [move for move in self.moves if not move.same_device]
+
+    @property
+    def bytes_to_copy(self) -> int:
+        return sum(move.size for move in self.copies)
+
+
+class CopyBatch:
+    """Cross-device copies waiting for one fsync before their sources are unlinked.
+
+    Flushing many files together lets the kernel merge their writeback instead
+    of forcing each file to disk on its own. With a *recorder* every copy that
+    carries a digest is re-read after the fsync; a mismatching destination is
+    removed, its source kept and the move listed in *failed*.
+    """
+
+    def __init__(self, recorder: DigestRecorder | None = None) -> None:
+        self.recorder = recorder
+        self.moves: list[tuple[Move, str | None]] = []
+        self.size = 0
+        self.failed: list[Move] = []
+
+    def add(self, move: Move, digest: str | None = None) -> None:
+        self.moves.append((move, digest))
+        self.size += move.size
+        if len(self.moves) >= FSYNC_BATCH_FILES or self.size >= FSYNC_BATCH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.moves:
+            return
+        fsync_batch([str(move.destination) for move, _ in self.moves])
+        for move, digest in self.moves:
+            if digest is not None and self.recorder is not None:
+                if not self.recorder.verify(str(move.source), str(move.destination), digest):
+                    safe_unlink(move.destination)
+                    self.failed.append(move)
+                    continue
+            safe_unlink(move.source)
+        self.moves = []
+        self.size = 0
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.2f} TB"
 
 
 def parse_args(argv: Iterable[str]) -> argparse.Namespace:
@@ -80,10 +216,62 @@ def parse_args(argv: Iterable[str]) -> argparse.Namespace:
             "structure"
         ),
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the plan, including the bytes to copy, without changing anything",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help=(
+            "Build the plan from metadata only, benchmark each involved device "
+            "and print the predicted time per device, without changing anything"
+        ),
+    )
+    parser.add_argument(
+        "--copy-workers",
+        type=int,
+        default=DEFAULT_COPY_WORKERS,
+        help=f"Parallel cross-device copies (default: {DEFAULT_COPY_WORKERS})",
+    )
+    parser.add_argument(
+        "--on-duplicate",
+        choices=DUPLICATE_POLICIES,
+        default="drop",
+        help=(
+            "When the destination already holds identical content: drop the "
+            "incoming file, hardlink it under a new name, or keep a `_N` copy "
+            "(default: drop)"
+        ),
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help=(
+            "Hash cross-device copies while writing them and re-read each "
+            "destination to compare before its source is removed"
+        ),
+    )
+    parser.add_argument(
+        "--algo",
+        choices=available_algorithms(),
+        default=DEFAULT_ALGORITHM,
+        help=f"Digest algorithm for --verify (default: {DEFAULT_ALGORITHM})",
+    )
+    parser.add_argument(
+        "--digests",
+        type=Path,
+        default=None,
+        help=f"Where --verify appends the digests (default: <target>/{DIGESTS_NAME})",
+    )
+    add_cache_arguments(parser)
     return parser.parse_args(argv)
 
 
-def ensure_valid_directories(source: Path, target: Path) -> None:
+def ensure_valid_directories(source: Path, target: Path, create: bool = True) -> None:
+    """Validate the two roots; with *create* make the target if it is missing."""
+
     if not source.exists():
         raise SystemExit(f"Source directory '{source}' does not exist")
 
@@ -110,36 +298,241 @@ def ensure_valid_directories(source: Path, target: Path) -> None:
                 "Target directory must not be inside the source directory"
             )
 
-    target.mkdir(parents=True, exist_ok=True)
+    if create:
+        target.mkdir(parents=True, exist_ok=True)
 
 
-def resolve_collision(dest_path: Path) -> Path:
-    suffixes = "".join(dest_path.suffixes)
-    base_name = dest_path.name[: -len(suffixes)] if suffixes else dest_path.name
+def split_name(name: str) -> tuple[str, str]:
+    """Split *name* into the part that gets the `_N` counter and its suffixes."""
+
+    path = Path(name)
+    suffixes = "".join(path.suffixes)
+    base_name = name[: -len(suffixes)] if suffixes else name
     if not base_name:
-        base_name = dest_path.stem or dest_path.name
+        base_name = path.stem or name
+    return base_name, suffixes
 
-    parent = dest_path.parent
-    counter = 1
-    while True:
-        candidate = parent / f"{base_name}_{counter}{suffixes}"
-        if not candidate.exists():
-            return candidate
-        counter += 1
 
+class NameIndex:
+    """Names taken in each target directory, read with one scandir per directory.
+
+    Collision names are allocated from memory instead of one exists() stat per
+    `_1`, `_2`, ... attempt, and a per-name counter remembers where the last
+    search stopped, so hundreds of `cover.jpg` files stay linear. The index
+    only grows: allocated names are added at once, and names another process
+    created meanwhile are added when the atomic create in move_to_target fails.
+    """
 
-def move_to_target(file_path: Path, source_root: Path, target_root: Path, stats: Stats) -> None:
-    relative_path = file_path.relative_to(source_root)
-    destination = target_root / relative_path
-    destination.parent.mkdir(parents=True, exist_ok=True)
+    def __init__(self) -> None:
+        self._names: dict[Path, set[str]] = {}
+        self._counters: dict[tuple[Path, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _listing(self, directory: Path) -> set[str]:
+        names = self._names.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as it:
+                    names = {entry.name for entry in it}
+            except (FileNotFoundError, NotADirectoryError):
+                names = set()
+            self._names[directory] = names
+        return names
+
+    def claim(self, destination: Path) -> tuple[Path, bool]:
+        """Reserve *destination*, or its first free `name_N` variant.
+
+        Returns the reserved path and whether it had to be renamed.
+        """
+
+        parent = destination.parent
+        with self._lock:
+            names = self._listing(parent)
+            if destination.name not in names:
+                names.add(destination.name)
+                return destination, False
+
+            base_name, suffixes = split_name(destination.name)
+            key = (parent, base_name, suffixes)
+            counter = self._counters.get(key, 1)
+            while f"{base_name}_{counter}{suffixes}" in names:
+                counter += 1
+            self._counters[key] = counter + 1
+            name = f"{base_name}_{counter}{suffixes}"
+            names.add(name)
+            return parent / name, True
+
+    def is_taken(self, path: Path) -> bool:
+        with self._lock:
+            return path.name in self._listing(path.parent)
+
+    def mark_taken(self, path: Path) -> None:
+        with self._lock:
+            self._listing(path.parent).add(path.name)
+
+
+def resolve_collision(dest_path: Path, names: NameIndex | None = None) -> Path:
+    """Return a free `name_N` variant of *dest_path*, which is known to be taken."""
+
+    names = names or NameIndex()
+    names.mark_taken(dest_path)
+    return names.claim(dest_path)[0]
+
+
+def plan_move(
+    file_path: Path,
+    st: os.stat_result,
+    source_root: Path,
+    target_root: Path,
+    plan: PrunePlan,
+    stats: Stats,
+) -> bool:
+    """Plan moving a kept file. Returns False when it is an identical duplicate
+    that is dropped (or hardlinked) instead of moved."""
+
+    requested = target_root / file_path.relative_to(source_root)
+    # Compare size, then a sampled digest, then a full digest; an identical
+    # file is not copied again under a `_N` name
+    if (
+        plan.on_duplicate != "keep"
+        and plan.names.is_taken(requested)
+        and same_content(file_path, requested)
+    ):
+        link_path = plan.names.claim(requested)[0] if plan.on_duplicate == "hardlink" else None
+        plan.duplicates.append(Duplicate(file_path, requested, st.st_size, link_path))
+        stats.duplicates_dropped += 1
+        return False
 
-    final_destination = destination
-    if destination.exists():
-        final_destination = resolve_collision(destination)
-        final_destination.parent.mkdir(parents=True, exist_ok=True)
+    destination, renamed = plan.names.claim(requested)
+    if renamed:
         stats.collisions_resolved += 1
+    plan.moves.append(
+        Move(
+            file_path,
+            destination,
+            st.st_size,
+            st.st_dev == plan.target_device,
+            requested if renamed else None,
+        )
+    )
+    return True
 
-    shutil.move(str(file_path), str(final_destination))
+
+def rename_no_replace(source: Path, destination: Path) -> None:
+    """Rename that fails with FileExistsError instead of replacing *destination*.
+
+    A hard link is created atomically or not at all, so two runs racing for
+    the same name cannot overwrite each other. Filesystems without hard links
+    (exFAT, FAT) fall back to a check followed by a rename.
+    """
+
+    try:
+        os.link(source, destination, follow_symlinks=False)
+    except OSError as exc:
+        if exc.errno not in (errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+        if os.path.lexists(destination):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(destination)) from exc
+        os.rename(source, destination)
+        return
+    os.unlink(source)
+
+
+def move_to_target(
+    move: Move,
+    batch: CopyBatch | None = None,
+    names: NameIndex | None = None,
+    recorder: DigestRecorder | None = None,
+) -> None:
+    """Move one kept file into the target tree.
+
+    Same-device moves are a single rename. Cross-device moves copy the data with
+    copy_file_range/sendfile; with a *batch* the source is unlinked only after
+    the batch has been fsync'ed, otherwise right away after an fsync.
+    The destination is created atomically (link / O_EXCL); if something took
+    the name after the plan was made, the next free name from *names* is used.
+    A *recorder* (or the batch's) makes the copy hashed and verified.
+    """
+
+    names = names or NameIndex()
+    own_batch = batch is None
+    if own_batch:
+        batch = CopyBatch(recorder)
+    algo = batch.recorder.algo if batch.recorder is not None else None
+    move.destination.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        try:
+            if move.same_device:
+                try:
+                    rename_no_replace(move.source, move.destination)
+                    return
+                except OSError as exc:
+                    # Bind mounts share st_dev but still refuse links across them
+                    if exc.errno != errno.EXDEV:
+                        raise
+            digest = copy_new_file(move.source, move.destination, algo)
+            break
+        except FileExistsError:
+            names.mark_taken(move.destination)
+            requested = move.requested or move.destination
+            move = replace(move, destination=resolve_collision(requested, names), requested=requested)
+
+    batch.add(move, digest)
+    if own_batch:
+        batch.flush()
+        if batch.failed:
+            raise OSError(errno.EIO, "Copy does not match the source digest", str(move.destination))
+
+
+def drop_duplicate(duplicate: Duplicate, names: NameIndex | None = None) -> bool:
+    """Remove a source whose content is already in the target, first linking
+    it under its own name when the hardlink policy asked for one.
+
+    Returns False when that link cannot be made (EPERM/EMLINK, e.g. exFAT):
+    the source is then moved to the link name if possible, otherwise left in
+    place, so the name the user asked to keep is never lost.
+    """
+
+    link_path = duplicate.link_path
+    while link_path is not None:
+        try:
+            os.link(duplicate.existing, link_path)
+            break
+        except FileExistsError:
+            names = names or NameIndex()
+            names.mark_taken(link_path)
+            link_path = resolve_collision(duplicate.existing, names)
+        except OSError as exc:
+            print(f"Could not hardlink '{link_path}' to '{duplicate.existing}': {exc}")
+            try:
+                rename_no_replace(duplicate.source, link_path)
+                print(f"Moved '{duplicate.source}' to '{link_path}' instead")
+            except OSError as move_exc:
+                print(f"Left '{duplicate.source}' in place: {move_exc}")
+            return False
+    safe_unlink(duplicate.source)
+    return True
+
+
+def copy_new_file(source: Path, destination: Path, algo: str | None = None) -> str | None:
+    """Copy *source* to a new file; raises FileExistsError if *destination* exists.
+
+    With *algo* the data is hashed on the way and its digest returned.
+    """
+
+    try:
+        if algo is not None:
+            return copy_file_hashed(str(source), str(destination), exclusive=True, algo=algo)
+        copy_file(str(source), str(destination), exclusive=True)
+        return None
+    except FileExistsError:
+        raise
+    except BaseException:
+        try:
+            destination.unlink()
+        except OSError:
+            pass
+        raise
 
 
 def safe_unlink(path: Path) -> None:
@@ -166,35 +559,44 @@ def is_image_file(file_path: Path) -> bool:
     return file_path.suffix.lower() in IMAGE_EXTENSIONS
 
 
-def handle_file(
+def plan_file(
     file_path: Path,
     source_root: Path,
     target_root: Path,
+    plan: PrunePlan,
     stats: Stats,
+    st: os.stat_result | None = None,
 ) -> bool:
-    """Process a single file. Returns True when a video >= 200 MB was kept."""
+    """Decide what happens to a single file. Returns True when a video >= 200 MB is kept.
 
-    if is_video_file(file_path):
-        try:
-            size = file_path.stat().st_size
-        except OSError as exc:
-            raise SystemExit(f"Unable to read size for '{file_path}': {exc}") from exc
+    *st* may be passed in when the caller already has it from the directory
+    scan, saving another stat call.
+    """
 
-        if size >= MIN_VIDEO_SIZE_BYTES:
-            move_to_target(file_path, source_root, target_root, stats)
-            stats.videos_kept += 1
+    if is_video_file(file_path) or is_image_file(file_path):
+        if st is None:
+            try:
+                st = file_path.stat()
+            except OSError as exc:
+                raise SystemExit(f"Unable to read size for '{file_path}': {exc}") from exc
+
+    if is_video_file(file_path):
+        if st.st_size >= MIN_VIDEO_SIZE_BYTES:
+            # Duplicates are counted in duplicates_dropped, not as moved
+            if plan_move(file_path, st, source_root, target_root, plan, stats):
+                stats.videos_kept += 1
             return True
 
-        safe_unlink(file_path)
+        plan.deletes.append(file_path)
         stats.videos_deleted += 1
         return False
 
     if is_image_file(file_path):
-        move_to_target(file_path, source_root, target_root, stats)
-        stats.images_kept += 1
+        if plan_move(file_path, st, source_root, target_root, plan, stats):
+            stats.images_kept += 1
         return False
 
-    safe_unlink(file_path)
+    plan.deletes.append(file_path)
     stats.other_deleted += 1
     return False
 
@@ -207,45 +609,184 @@ def is_directory_empty(directory: Path) -> bool:
     return False
 
 
-def process_directory(
+def list_directory(directory: Path) -> list[os.DirEntry]:
+    # os.scandir reports the entry type (d_type) from the directory listing
+    # itself and DirEntry caches it, so telling files, directories and symlinks
+    # apart needs no stat calls; only kept files are stat'ed, once, for size.
+    try:
+        with os.scandir(directory) as it:
+            return sorted(it, key=lambda e: e.name.lower())
+    except PermissionError as exc:
+        raise SystemExit(f"Cannot access directory '{directory}': {exc}") from exc
+
+
+def plan_directory(
     directory: Path,
     source_root: Path,
     target_root: Path,
+    plan: PrunePlan,
     stats: Stats,
 ) -> bool:
-    """Traverse *directory* and prune its contents.
+    """Plan the pruning of *directory* and its contents.
+
+    The tree is walked with an explicit stack rather than recursion, so deep
+    trees cannot hit the recursion limit. Entries are visited in the same order
+    as a recursive walk, and a directory is finished (post-order) only after
+    all of its children, handing its kept-video flag up to its parent.
 
     Returns True if this subtree contained at least one kept (>=200 MB) video file.
     """
 
-    kept_video_found = False
-
-    try:
-        entries = sorted(directory.iterdir(), key=lambda p: p.name.lower())
-    except PermissionError as exc:
-        raise SystemExit(f"Cannot access directory '{directory}': {exc}") from exc
+    # Each frame: [directory, its remaining entries, kept video found below it]
+    stack = [[directory, iter(list_directory(directory)), False]]
+    while True:
+        frame = stack[-1]
+        entry = next(frame[1], None)
+
+        if entry is None:
+            stack.pop()
+            finished, _, has_video = frame
+            if not stack:
+                return has_video
+            if has_video:
+                stack[-1][2] = True
+            plan.dir_removals.append(DirRemoval(finished, has_video))
+            continue
 
-    for entry in entries:
+        entry_path = Path(entry.path)
         if entry.is_symlink():
-            safe_unlink(entry)
+            plan.deletes.append(entry_path)
             stats.other_deleted += 1
             continue
 
-        if entry.is_file():
-            if handle_file(entry, source_root, target_root, stats):
-                kept_video_found = True
+        if entry.is_file(follow_symlinks=False):
+            st = None
+            if is_video_file(entry_path) or is_image_file(entry_path):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError as exc:
+                    raise SystemExit(f"Unable to read size for '{entry_path}': {exc}") from exc
+            if plan_file(entry_path, source_root, target_root, plan, stats, st):
+                frame[2] = True
             continue
 
-        if entry.is_dir():
-            child_has_video = process_directory(entry, source_root, target_root, stats)
-            if child_has_video:
-                kept_video_found = True
-                if is_directory_empty(entry):
-                    remove_directory(entry, stats)
-            else:
-                remove_directory(entry, stats)
+        if entry.is_dir(follow_symlinks=False):
+            stack.append([entry_path, iter(list_directory(entry_path)), False])
 
-    return kept_video_found
+
+def build_plan(
+    source_root: Path, target_root: Path, stats: Stats, on_duplicate: str = "drop"
+) -> tuple[PrunePlan, bool]:
+    """Scan *source_root*. Returns the plan and whether a kept video was found anywhere.
+
+    Only metadata is read, except when a destination already exists with the
+    same size: then the two files are compared (see *on_duplicate*).
+    """
+
+    # The target may not exist yet in --estimate mode; its nearest ancestor is on the same device
+    target_device = os.stat(existing_ancestor(target_root)).st_dev
+    plan = PrunePlan(target_device=target_device, on_duplicate=on_duplicate)
+    kept_video_in_root = plan_directory(source_root, source_root, target_root, plan, stats)
+    return plan, kept_video_in_root
+
+
+def print_plan(plan: PrunePlan) -> None:
+    for move in plan.renames:
+        print(f"RENAME {move.source} -> {move.destination}")
+    for move in plan.copies:
+        print(f"COPY   {move.source} -> {move.destination} ({format_bytes(move.size)})")
+    for duplicate in plan.duplicates:
+        if duplicate.link_path is not None:
+            print(f"LINK   {duplicate.link_path} -> {duplicate.existing} (identical to {duplicate.source})")
+        else:
+            print(f"DROP   {duplicate.source} (identical to {duplicate.existing})")
+    for path in plan.deletes:
+        print(f"DELETE {path}")
+    for removal in plan.dir_removals:
+        print(f"RMDIR  {removal.path}")
+
+    renames, copies = plan.renames, plan.copies
+    print()
+    print(f"Renames (same device): {len(renames)} files, {format_bytes(sum(m.size for m in renames))}")
+    print(f"Copies (cross device): {len(copies)} files, {format_bytes(plan.bytes_to_copy)}")
+    if plan.duplicates:
+        saved = sum(d.size for d in plan.duplicates)
+        print(f"Identical files not copied: {len(plan.duplicates)} files, {format_bytes(saved)}")
+    print(f"Deletes: {len(plan.deletes)} files")
+    print(f"Directories to remove: {len(plan.dir_removals)}")
+    print(f"Total bytes to copy: {plan.bytes_to_copy} ({format_bytes(plan.bytes_to_copy)})")
+
+
+def run_copies(
+    copies: list[Move],
+    workers: int,
+    stats: Stats,
+    names: NameIndex | None = None,
+    recorder: DigestRecorder | None = None,
+) -> list[Path]:
+    """Copy cross-device moves in parallel. Returns the sources that failed."""
+
+    queue = deque(copies)
+    failed: list[Path] = []
+    lock = threading.Lock()
+
+    def drain() -> None:
+        batch = CopyBatch(recorder)
+        try:
+            while True:
+                try:
+                    move = queue.popleft()
+                except IndexError:
+                    return
+                try:
+                    move_to_target(move, batch, names)
+                except OSError as exc:
+                    print(f"Failed to copy '{move.source}': {exc}")
+                    with lock:
+                        failed.append(move.source)
+                        stats.copy_failures += 1
+        finally:
+            batch.flush()
+            with lock:
+                failed.extend(move.source for move in batch.failed)
+                stats.copy_failures += len(batch.failed)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(copies)))) as pool:
+        futures = [pool.submit(drain) for _ in range(max(1, min(workers, len(copies))))]
+        for future in futures:
+            future.result()
+    return failed
+
+
+def execute_plan(
+    plan: PrunePlan,
+    stats: Stats,
+    copy_workers: int = DEFAULT_COPY_WORKERS,
+    recorder: DigestRecorder | None = None,
+) -> None:
+    for path in plan.deletes:
+        safe_unlink(path)
+
+    left_in_place = []
+    for duplicate in plan.duplicates:
+        if not drop_duplicate(duplicate, plan.names):
+            stats.duplicates_dropped -= 1
+            stats.link_failures += 1
+            if os.path.lexists(duplicate.source):
+                left_in_place.append(duplicate.source)
+
+    for move in plan.renames:
+        move_to_target(move, names=plan.names, recorder=recorder)
+
+    failed = run_copies(plan.copies, copy_workers, stats, plan.names, recorder) if plan.copies else []
+
+    # Never remove a directory that still holds a source whose copy or link failed
+    keep_dirs = {parent for source in failed + left_in_place for parent in source.parents}
+    for removal in plan.dir_removals:
+        if removal.path in keep_dirs:
+            continue
+        if not removal.has_kept_video or is_directory_empty(removal.path):
+            remove_directory(removal.path, stats)
 
 
 def main(argv: Iterable[str]) -> None:
@@ -253,10 +794,37 @@ def main(argv: Iterable[str]) -> None:
     source_root = args.source.resolve()
     target_root = args.target.resolve()
 
-    ensure_valid_directories(source_root, target_root)
+    # --estimate and --dry-run must not change anything, so the target is only created for a real run
+    ensure_valid_directories(source_root, target_root, create=not (args.estimate or args.dry_run))
 
     stats = Stats()
-    kept_video_in_root = process_directory(source_root, source_root, target_root, stats)
+    if args.estimate:
+        from estimate_cost import estimate, prune_workload
+
+        # Metadata only: identical destinations are not read, so they count as copies
+        plan, _ = build_plan(source_root, target_root, stats, on_duplicate="keep")
+        estimate(prune_workload(plan, source_root, target_root))
+        return
+
+    plan, kept_video_in_root = build_plan(source_root, target_root, stats, args.on_duplicate)
+
+    if args.dry_run:
+        print_plan(plan)
+        print("\n[Dry Run] Nothing was changed.")
+        return
+
+    recorder = None
+    if args.verify:
+        recorder = DigestRecorder(
+            str(args.digests or target_root / DIGESTS_NAME),
+            args.algo,
+            open_cache(args.cache, enabled=not args.no_cache),
+        )
+    try:
+        execute_plan(plan, stats, args.copy_workers, recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
 
     print("Pruning completed.")
     print(f"Kept videos (moved): {stats.videos_kept}")
@@ -266,6 +834,14 @@ def main(argv: Iterable[str]) -> None:
     print(f"Directories removed: {stats.dirs_removed}")
     if stats.collisions_resolved:
         print(f"Name collisions resolved: {stats.collisions_resolved}")
+    if stats.duplicates_dropped:
+        print(f"Identical files not copied: {stats.duplicates_dropped}")
+    if stats.link_failures:
+        print(f"Failed hardlinks (sources moved or left in place): {stats.link_failures}")
+    if stats.copy_failures:
+        print(f"Failed cross-device copies (sources left in place): {stats.copy_failures}")
+    if recorder is not None:
+        print(f"Verified copies: {recorder.verified}, digests in {recorder.manifest_path}")
     if not kept_video_in_root:
         print("No video files over 200MB were found in the source directory.")
 
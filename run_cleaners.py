@@ -2,78 +2,162 @@
 
 """
 基本用法 (需要手动确认)
-运行脚本并指定目标目录。脚本会依次执行三个清理任务，每个任务在删除前都会询问你。
+运行脚本并指定目标目录。脚本只遍历一次目录，对每个文件同时应用全部清理规则，
+列出合并后的清理计划，确认一次后执行。
 bash
 python3 run_cleaners.py /Users/yourname/Downloads/target_folder
 
 自动确认 (无须人工干预)
-如果你确定要删除且不想每次都输入 y 确认，可以加上 --no-confirm 参数。
+如果你确定要删除且不想输入 y 确认，可以加上 --no-confirm 参数。
 bash
 python3 run_cleaners.py /Users/yourname/Downloads/target_folder --no-confirm
 
-脚本执行流程
-删除小视频: 扫描并删除小于 100MB 的视频文件。
-删除特定文件: 扫描并删除 .txt, .url, .html, .apk 等文件。
-删除空目录: 最后扫描并清理剩下的空文件夹。
+只查看计划，不删除
+bash
+python3 run_cleaners.py /Users/yourname/Downloads/target_folder --dry-run
+
+清理规则 (与单独运行各脚本相同)
+删除小视频: 小于 100MB (--size) 的视频文件，同 delete_small_videos.py。
+删除特定文件: .txt, .url, .html, .apk 等文件，同 find_and_delete_files.py。
+删除空目录: 上面两条规则执行后会变空的目录（包括只含空目录的目录），同 delete_empty_folder.py。
 
 """
 
 import os
 import argparse
-import subprocess
 import sys
 
+from fswalk import crawl_dirs, add_crawl_argument, normalize_extensions, has_extension
+from delete_small_videos import VIDEO_EXTENSIONS, DEFAULT_SIZE_MB
+from find_and_delete_files import JUNK_EXTENSIONS, delete_files
+from delete_empty_folder import delete_dirs
+from delete_executor import add_delete_arguments, executor_from_args
+
+class CleanupPlan:
+    """一次遍历得到的合并清理计划"""
+
+    def __init__(self):
+        self.small_videos = []  # [(path, size)]
+        self.junk_files = []    # [path]
+        self.empty_dirs = []    # [path]，子目录排在上级目录之前，可以直接按顺序 rmdir
+
+    def is_empty(self):
+        return not (self.small_videos or self.junk_files or self.empty_dirs)
+
+def build_plan(root_dir, min_video_bytes, crawl_threads):
+    """遍历一次 root_dir，对每个条目应用全部规则"""
+    plan = CleanupPlan()
+    video_exts = normalize_extensions(VIDEO_EXTENSIONS)
+    junk_exts = normalize_extensions(JUNK_EXTENSIONS)
+
+    def is_video(entry):
+        return has_extension(entry.name, video_exts) and entry.is_file()
+
+    # (dirpath, number of entries that stay, real subdirectories) in pre-order
+    visited = []
+    for dirpath, dirs, others in crawl_dirs(root_dir, crawl_threads, prefetch=is_video):
+        kept = 0
+        for entry in others:
+            try:
+                if is_video(entry):
+                    size = entry.stat().st_size
+                    if size < min_video_bytes:
+                        plan.small_videos.append((entry.path, size))
+                        continue
+                elif has_extension(entry.name, junk_exts) and entry.is_file():
+                    plan.junk_files.append(entry.path)
+                    continue
+            except OSError as e:
+                print(f"Error accessing file {entry.path}: {e}")
+            kept += 1
+
+        subdirs = []
+        for entry in dirs:
+            if entry.is_symlink():
+                # A symlink to a directory is not followed and keeps its parent non-empty
+                kept += 1
+            else:
+                subdirs.append(entry.path)
+        visited.append((dirpath, kept, subdirs))
+
+    # Reversed pre-order visits children before their parents, so a directory
+    # collapses when nothing in it stays and all its subdirectories collapsed.
+    # Unreadable subdirectories never appear in `visited` and so never collapse.
+    collapsed = set()
+    for dirpath, kept, subdirs in reversed(visited):
+        if dirpath == root_dir or kept:
+            continue
+        if all(sub in collapsed for sub in subdirs):
+            collapsed.add(dirpath)
+            plan.empty_dirs.append(dirpath)
+    return plan
+
+def print_plan(plan, size_threshold_mb):
+    if plan.small_videos:
+        print(f"\n视频文件小于 {size_threshold_mb} MB ({len(plan.small_videos)} 个):")
+        for path, size in sorted(plan.small_videos):
+            print(f"  {path} ({size / (1024 * 1024):.2f} MB)")
+    if plan.junk_files:
+        print(f"\n特定类型文件 ({len(plan.junk_files)} 个):")
+        for path in sorted(plan.junk_files):
+            print(f"  - {path}")
+    if plan.empty_dirs:
+        print(f"\n清理后为空的目录 ({len(plan.empty_dirs)} 个):")
+        for path in sorted(plan.empty_dirs):
+            print(f"  - {path}")
+
+def execute_plan(plan, executor=None):
+    """先删除文件，再从最深处开始删除目录，返回失败的条目"""
+    _, file_errors = delete_files([path for path, _ in plan.small_videos] + plan.junk_files, executor)
+    _, dir_errors = delete_dirs(plan.empty_dirs)
+    return file_errors + dir_errors
+
 def main():
-    parser = argparse.ArgumentParser(description="Run multiple cleanup scripts sequentially on a target directory.")
+    parser = argparse.ArgumentParser(description="Clean up a target directory with a single traversal.")
     parser.add_argument("directory", help="The directory to clean up.")
-    parser.add_argument("--no-confirm", action="store_true", help="Skip confirmation prompts for all scripts.")
-    
+    parser.add_argument("--size", "-s", type=float, default=DEFAULT_SIZE_MB,
+                        help=f"Video size threshold in MB (default: {DEFAULT_SIZE_MB}). Smaller videos are deleted.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the cleanup plan without deleting anything.")
+    parser.add_argument("--no-confirm", action="store_true", help="Skip the confirmation prompt.")
+    add_crawl_argument(parser)
+    add_delete_arguments(parser)
+
     args = parser.parse_args()
     target_dir = os.path.abspath(args.directory)
 
-    if not os.path.exists(target_dir):
+    if not os.path.isdir(target_dir):
         print(f"Error: Directory '{target_dir}' does not exist.")
         sys.exit(1)
 
-    # scripts to run in order
-    scripts = [
-        "delete_small_videos.py",
-        "find_and_delete_files.py",
-        "delete_empty_folder.py"
-    ]
-
-    # Get the directory where this script is located
-    current_script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    for script_name in scripts:
-        script_path = os.path.join(current_script_dir, script_name)
-        
-        if not os.path.exists(script_path):
-            print(f"Warning: Script '{script_name}' not found at {script_path}. Skipping.")
-            continue
+    print(f"Scanning '{target_dir}'...")
+    try:
+        plan = build_plan(target_dir, args.size * 1024 * 1024, args.crawl_threads)
+    except KeyboardInterrupt:
+        print("\nScan interrupted by user.")
+        sys.exit(130)
+
+    if plan.is_empty():
+        print("Nothing to clean up.")
+        return
+
+    print_plan(plan, args.size)
+    total = len(plan.small_videos) + len(plan.junk_files) + len(plan.empty_dirs)
+
+    if args.dry_run:
+        print(f"\n[Dry Run] {total} entries would be deleted. Nothing was changed.")
+        return
+
+    if not args.no_confirm:
+        confirm = input(f"\n确认删除以上 {total} 个文件和目录？(y/N): ").strip().lower()
+        if confirm != 'y':
+            print("操作已取消。")
+            return
 
-        print(f"\n{'='*20} Running {script_name} {'='*20}\n")
-        
-        cmd = [sys.executable, script_path, target_dir]
-        
-        if args.no_confirm:
-            cmd.append("--no-confirm")
-
-        try:
-            # Run the script and wait for it to finish. 
-            # stdin/stdout/stderr are inherited so user can interact if needed.
-            subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"\nError running {script_name}: {e}")
-            # Decide whether to stop or continue. Usually one failing might affect others, 
-            # but for cleanup, we might want to continue.
-            # However, if the user Ctrl-Cs, we should probably stop.
-            pass
-        except KeyboardInterrupt:
-            print("\nSequence interrupted by user.")
-            sys.exit(130)
-
-    print(f"\n{'='*20} All cleanup tasks finished {'='*20}")
+    print("\n开始删除...")
+    errors = execute_plan(plan, executor_from_args(args, "run_cleaners"))
+    print(f"\n{'='*20} Cleanup finished: {total - len(errors)} deleted, {len(errors)} failed {'='*20}")
+    for path, err in errors:
+        print(f"  - {path}: {err}")
 
 if __name__ == "__main__":
     main()
@@ -3,12 +3,21 @@ import os
 import argparse
 import sys
 
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delete_executor import DeleteExecutor, add_delete_arguments, executor_from_args
+
 class FilenameCleaner:
-    def __init__(self, report_file, dry_run=True, strict_size=True):
+    def __init__(self, report_file, dry_run=True, strict_size=True, executor=None):
         self.report_file = report_file
         self.dry_run = dry_run
         self.strict_size = strict_size # 如果为True，文件大小不同时不删除
         self.deleted_count = 0
+        # 实际删除交给共享的删除执行器：按设备并行、限速并写入日志
+        self.executor = executor or DeleteExecutor(tool="clean_by_name")
+        # 只有模拟运行或 --verbose 时逐个打印路径
+        self.verbose = dry_run or self.executor.verbose
 
     def load_report(self):
         if not os.path.exists(self.report_file):
@@ -27,6 +36,7 @@ class FilenameCleaner:
             print(">>> 安全模式已开启：如果同名文件大小不一致，将跳过处理。")
         print("-" * 60)
 
+        to_delete = []
         for filename, file_list in data.items():
             # 1. 检查文件大小一致性 (安全措施)
             sizes = [f['size'] for f in file_list]
@@ -46,22 +56,25 @@ class FilenameCleaner:
             keep_item = file_list[0]
             delete_items = file_list[1:]
 
-            print(f"处理: {filename}")
-            print(f"  [保留] {keep_item['path']} ({keep_item['size']/1024/1024:.1f} MB)")
+            if self.verbose:
+                print(f"处理: {filename}")
+                print(f"  [保留] {keep_item['path']} ({keep_item['size']/1024/1024:.1f} MB)")
 
             for item in delete_items:
                 f_path = item['path']
                 if self.dry_run:
                     print(f"  [待删] {f_path}")
                 else:
-                    try:
-                        os.remove(f_path)
-                        print(f"  [已删] {f_path}")
-                        self.deleted_count += 1
-                    except OSError as e:
-                        print(f"  [失败] {f_path} : {e}")
+                    to_delete.append(f_path)
             
-            print("-" * 60)
+            if self.verbose:
+                print("-" * 60)
+
+        if to_delete:
+            result = self.executor.run(to_delete)
+            self.deleted_count = result.deleted_count
+            for f_path, err in result.errors:
+                print(f"  [失败] {f_path} : {err}")
 
         if self.dry_run:
             print("\n>>> 模拟结束。使用 --execute 参数执行删除。")
@@ -74,13 +87,21 @@ if __name__ == "__main__":
     parser.add_argument('--execute', action='store_true', help='确认执行删除')
     # 增加一个强制参数，允许删除大小不一样的同名文件
     parser.add_argument('--force-diff-size', action='store_true', help='危险：即使文件大小不同，也强制按文件名删除')
+    add_delete_arguments(parser)
+    parser.add_argument('--estimate', action='store_true', help='只预估删除耗时（实测各设备速度），不删除任何文件')
     
     args = parser.parse_args()
 
+    if args.estimate:
+        from estimate_cost import estimate, report_workload, clean_by_name_pairs
+        estimate(report_workload(clean_by_name_pairs(args.file)))
+        sys.exit(0)
+
     # 如果用户加了 --force-diff-size，则 strict_size 为 False
     cleaner = FilenameCleaner(
         args.file, 
         dry_run=not args.execute,
-        strict_size=not args.force_diff_size
+        strict_size=not args.force_diff_size,
+        executor=executor_from_args(args, "clean_by_name")
     )
     cleaner.clean()
\ No newline at end of file
@@ -3,12 +3,26 @@ import os
 import argparse
 import sys
 
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe_link import link_duplicate, add_link_argument
+from delete_executor import DeleteExecutor, add_delete_arguments, executor_from_args
+from video_fingerprint import FINGERPRINT_KIND, DEFAULT_MAX_DISTANCE, split_by_distance
+
 class DuplicateCleaner:
-    def __init__(self, report_file, dry_run=True):
+    def __init__(self, report_file, dry_run=True, link_mode=None, executor=None):
         self.report_file = report_file
         self.dry_run = dry_run
+        # 不为 None 时用 reflink/硬链接代替删除 (auto / reflink / hardlink)
+        self.link_mode = link_mode
+        # 实际删除交给共享的删除执行器：按设备并行、限速并写入日志
+        self.executor = executor or DeleteExecutor(tool="clean_dupes")
+        # 只有模拟运行、链接模式或 --verbose 时逐个打印路径
+        self.verbose = dry_run or bool(link_mode) or self.executor.verbose
         self.deleted_size = 0
         self.deleted_count = 0
+        self.linked_count = 0
 
     def load_report(self):
         if not os.path.exists(self.report_file):
@@ -27,6 +41,7 @@ class DuplicateCleaner:
         print(f"{'[模拟运行]' if self.dry_run else '[正式执行]'} 开始清理...")
         print("-" * 60)
 
+        to_delete = []
         for item in data:
             files = item['files']
             size = item['size']
@@ -34,25 +49,35 @@ class DuplicateCleaner:
             # --- 保留策略 ---
             # 目前策略：按字母顺序排序，保留第一个，删除其余所有。
             # 你可以在这里修改逻辑，例如优先保留 '/mnt/u10t' 下的文件。
+            # scan_dupes.py --similar 的报告内容并不相同，由 "keep" 指定保留的版本（最大的文件）
             files.sort() 
             
-            file_to_keep = files[0]
-            files_to_delete = files[1:]
+            file_to_keep = item.get('keep', files[0])
+            files_to_delete = [f for f in files if f != file_to_keep]
+            sizes = item.get('sizes', {})
 
-            print(f"保留: {file_to_keep}")
+            if self.verbose:
+                print(f"保留: {file_to_keep}")
+            if item.get('algo') == FINGERPRINT_KIND:
+                files_to_delete = self._within_distance(item, file_to_keep, files_to_delete)
             
             for file_path in files_to_delete:
-                if self.dry_run:
+                file_size = sizes.get(file_path, size)
+                if self.link_mode:
+                    self._link(file_to_keep, file_path, file_size)
+                elif self.dry_run:
                     print(f"  [待删除] {file_path}")
                 else:
-                    try:
-                        os.remove(file_path)
-                        print(f"  [已删除] {file_path}")
-                        self.deleted_count += 1
-                        self.deleted_size += size
-                    except OSError as e:
-                        print(f"  [删除失败] {file_path} : {e}")
-            print("-" * 60)
+                    to_delete.append(file_path)
+            if self.verbose:
+                print("-" * 60)
+
+        if to_delete:
+            result = self.executor.run(to_delete)
+            self.deleted_count = result.deleted_count
+            self.deleted_size = result.freed_bytes
+            for file_path, err in result.errors:
+                print(f"  [删除失败] {file_path} : {err}")
 
         # 总结
         if self.dry_run:
@@ -60,17 +85,55 @@ class DuplicateCleaner:
             print(">>> 请使用 --execute 参数再次运行以执行实际删除。")
         else:
             print("\n>>> 清理完成。")
-            print(f">>> 共删除文件: {self.deleted_count} 个")
+            if self.link_mode:
+                print(f">>> 共替换为链接: {self.linked_count} 个")
+            else:
+                print(f">>> 共删除文件: {self.deleted_count} 个")
             print(f">>> 释放空间: {self.deleted_size / (1024*1024*1024):.2f} GB")
 
+    @staticmethod
+    def _within_distance(item, file_to_keep, files):
+        """--similar 的组只处理与保留文件的指纹距离不超过阈值的视频，其余的不删除"""
+        allowed, rejected = split_by_distance(item, files)
+        max_distance = item.get('max_distance', DEFAULT_MAX_DISTANCE)
+        for file_path, distance in rejected:
+            print(f"  [跳过] {file_path} 与保留文件 {file_to_keep} 的指纹距离 {distance} 超过 {max_distance}，不删除")
+        return allowed
+
+    def _link(self, file_to_keep, file_path, size):
+        """把重复文件替换为保留文件的链接，路径保持不变"""
+        if self.dry_run:
+            print(f"  [待链接] {file_path}")
+            return
+        try:
+            method, reason = link_duplicate(file_to_keep, file_path, self.link_mode)
+        except OSError as e:
+            print(f"  [链接失败] {file_path} : {e}")
+            return
+        if method is None:
+            print(f"  [跳过] {file_path} : {reason}")
+            return
+        print(f"  [已{'reflink' if method == 'reflink' else '硬链接'}] {file_path}")
+        self.linked_count += 1
+        self.deleted_size += size
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="基于JSON报告删除重复视频文件")
     parser.add_argument('--file', type=str, default='duplicate_videos.json', help='输入的JSON报告文件路径')
     # 必须显式添加 --execute 才会真的删除，否则默认空跑
     parser.add_argument('--execute', action='store_true', help='确认执行删除操作（不可撤销）')
+    add_link_argument(parser)
+    add_delete_arguments(parser)
+    parser.add_argument('--estimate', action='store_true', help='只预估删除耗时（实测各设备速度），不删除任何文件')
     
     args = parser.parse_args()
 
+    if args.estimate:
+        from estimate_cost import estimate, report_workload, clean_dupes_pairs
+        estimate(report_workload(clean_dupes_pairs(args.file), link_mode=bool(args.link)))
+        sys.exit(0)
+
     # 如果没有传入 --execute，dry_run 为 True
-    cleaner = DuplicateCleaner(args.file, dry_run=not args.execute)
+    cleaner = DuplicateCleaner(args.file, dry_run=not args.execute, link_mode=args.link,
+                               executor=executor_from_args(args, "clean_dupes"))
     cleaner.clean()
\ No newline at end of file
@@ -1,11 +1,20 @@
 import os
+import sys
 import json
 import argparse
 from collections import defaultdict
 
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fswalk import iter_files, DEFAULT_CRAWL_THREADS, add_crawl_argument
+from catalog import open_catalog_for, add_catalog_arguments
+
 class FilenameScanner:
-    def __init__(self, search_paths, extensions=None):
+    def __init__(self, search_paths, extensions=None, crawl_threads=DEFAULT_CRAWL_THREADS):
         self.search_paths = search_paths
+        # 同时列目录的线程数 (fswalk.crawl_dirs)
+        self.crawl_threads = crawl_threads
         # 常见视频格式
         self.extensions = extensions or {
             '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.rmvb', '.ts', '.m4v', '.iso'
@@ -13,10 +22,6 @@ class FilenameScanner:
         # 字典结构: { "文件名": [ {path: "...", size: 123}, ... ] }
         self.files_map = defaultdict(list)
 
-    def _is_video_file(self, filename):
-        _, ext = os.path.splitext(filename)
-        return ext.lower() in self.extensions
-
     def scan(self):
         print(">>> [阶段1] 正在遍历目录构建文件名索引...")
         count = 0
@@ -26,22 +31,30 @@ class FilenameScanner:
                 print(f"警告: 路径不存在 {path}")
                 continue
                 
-            for root, _, files in os.walk(path):
-                for name in files:
-                    if self._is_video_file(name):
-                        filepath = os.path.join(root, name)
-                        try:
-                            file_size = os.path.getsize(filepath)
-                            self.files_map[name].append({
-                                "path": filepath,
-                                "size": file_size
-                            })
-                            count += 1
-                        except OSError:
-                            pass
+            for entry in iter_files(path, self.extensions, threads=self.crawl_threads, stat=True):
+                try:
+                    # entry.stat() 会被缓存，每个文件只 stat 一次
+                    self.files_map[entry.name].append({
+                        "path": entry.path,
+                        "size": entry.stat().st_size
+                    })
+                    count += 1
+                except OSError:
+                    pass
                             
         print(f"    扫描完成。共索引了 {count} 个视频文件。")
 
+    def scan_catalog(self, catalog):
+        """从目录数据库 (catalog.Catalog) 直接查询同名文件，不遍历磁盘"""
+        print(">>> [阶段1] 正在从目录数据库查询同名文件...")
+        entries = catalog.same_name(self.search_paths, self.extensions)
+        for entry in entries:
+            self.files_map[entry.name].append({
+                "path": entry.path,
+                "size": entry.size
+            })
+        print(f"    查询完成。共 {len(entries)} 个同名视频文件。")
+
     def get_duplicates(self):
         """过滤出出现次数大于1的文件"""
         dupes = {}
@@ -67,6 +80,20 @@ if __name__ == "__main__":
     TARGET_DIRS = ['/mnt/u10tdisk/movies', '/mnt/u12tdisk/movies']
     OUTPUT_JSON = 'duplicate_names.json'
 
-    scanner = FilenameScanner(TARGET_DIRS)
-    scanner.scan()
-    scanner.save_report(OUTPUT_JSON)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="按文件名扫描重复视频文件")
+    parser.add_argument('paths', nargs='*', default=TARGET_DIRS, help='要扫描的目录 (默认: %(default)s)')
+    parser.add_argument('--output', default=OUTPUT_JSON, help='JSON报告路径')
+    add_catalog_arguments(parser)
+    add_crawl_argument(parser)
+    args = parser.parse_args()
+
+    scanner = FilenameScanner(args.paths, crawl_threads=args.crawl_threads)
+    if args.from_catalog:
+        catalog = open_catalog_for(args.paths, args.catalog)
+        if catalog is None:
+            sys.exit(1)
+        with catalog:
+            scanner.scan_catalog(catalog)
+    else:
+        scanner.scan()
+    scanner.save_report(args.output)
\ No newline at end of file
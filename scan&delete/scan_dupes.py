@@ -1,37 +1,140 @@
 import os
-import hashlib
+import sys
 import json
 import argparse
 from collections import defaultdict
 
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hash_cache import open_cache, add_cache_arguments
+from staged_hash import staged_digests, sample_hash, sample_kind, hash_sequential
+from hash_scheduler import add_scheduler_arguments, scheduler_from_args
+from hashers import DEFAULT_ALGORITHM, BUFFER_SIZE, hash_file, add_algorithm_argument
+from checkpoint import Checkpoint, add_checkpoint_arguments
+from fswalk import iter_files, add_crawl_argument, DEFAULT_CRAWL_THREADS
+from catalog import open_catalog_for, add_catalog_arguments
+from bktree import hamming
+from video_fingerprint import (FINGERPRINT_KIND, DEFAULT_MAX_DISTANCE, ffmpeg_available, video_fingerprint,
+                               group_similar, parse_fingerprint)
+
 class DuplicateScanner:
-    def __init__(self, search_paths, extensions=None):
+    def __init__(self, search_paths, extensions=None, cache=None, scheduler=None, algo=DEFAULT_ALGORITHM,
+                 checkpoint=None, crawl_threads=DEFAULT_CRAWL_THREADS, catalog=None):
         self.search_paths = search_paths
+        # 目录数据库 (catalog.Catalog)，不为 None 时直接查询同大小的文件，不遍历磁盘
+        self.catalog = catalog
+        # 同时列目录的线程数 (fswalk.crawl_dirs)
+        self.crawl_threads = crawl_threads
+        # 摘要算法 (hashers.available_algorithms())，会写入报告
+        self.algo = algo
+        # 摘要缓存 (hash_cache.HashCache)，为 None 时每次都读取文件
+        self.cache = cache
+        # 按设备并行读取 (hash_scheduler.HashScheduler)，为 None 时逐个计算
+        self.scheduler = scheduler
         # 常见视频格式，如果为空则扫描所有文件
         self.extensions = extensions or {
             '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.rmvb', '.ts', '.m4v'
         }
         self.size_map = defaultdict(list)
         self.dupes = []
+        # 检查点 (checkpoint.Checkpoint)，为 None 时不保存中间状态
+        self.checkpoint = checkpoint
+        self.resumed = False
+        self.walk_done = False
+        # 已完成的采样/完整摘要，随检查点保存
+        self.done_samples = {}
+        self.done_full = {}
+        # 遍历时取得的 stat 结果 {path: stat_result}（从检查点恢复时为空）
+        self.file_stats = {}
 
-    def _is_video_file(self, filename):
-        """检查文件后缀"""
-        _, ext = os.path.splitext(filename)
-        return ext.lower() in self.extensions
-
-    def _get_file_hash(self, filepath, block_size=65536):
-        """计算文件的MD5哈希，分块读取以节省内存"""
-        hasher = hashlib.md5()
-        try:
-            with open(filepath, 'rb') as f:
-                for buf in iter(lambda: f.read(block_size), b''):
-                    hasher.update(buf)
-            return hasher.hexdigest()
-        except OSError:
-            # 处理权限问题或文件读取错误
-            return None
+    def _checkpoint_state(self):
+        return {
+            "search_paths": self.search_paths,
+            "algo": self.algo,
+            "extensions": sorted(self.extensions),
+            "size_map": self.size_map,
+            "samples": dict(self.done_samples),
+            "digests": dict(self.done_full),
+        }
 
-    def scan(self):
+    def save_checkpoint(self):
+        # 目录遍历完成之前的大小映射不完整，不能作为检查点
+        if self.checkpoint is not None and self.walk_done:
+            self.checkpoint.save(self._checkpoint_state)
+            print(f">>> 检查点已保存至: {self.checkpoint.path}")
+
+    def resume(self):
+        """从检查点恢复文件大小映射和已完成的摘要，成功返回 True"""
+        if self.checkpoint is None:
+            return False
+        state = self.checkpoint.load()
+        if not state:
+            print(">>> 没有找到检查点，重新开始扫描。")
+            return False
+        if (state.get("search_paths") != self.search_paths or state.get("algo") != self.algo
+                or state.get("extensions") != sorted(self.extensions)):
+            print(">>> 检查点的扫描目录、算法或扩展名与本次不同，重新开始扫描。")
+            return False
+
+        self.size_map = defaultdict(list, {int(size): files for size, files in state["size_map"].items()})
+        self.done_samples = state.get("samples", {})
+        self.done_full = state.get("digests", {})
+        self.resumed = True
+        self.walk_done = True
+        print(f">>> 已从检查点恢复: 采样摘要 {len(self.done_samples)} 个，完整摘要 {len(self.done_full)} 个。")
+        return True
+
+    def _remember(self, done, filepath, digest):
+        """记录已完成的摘要，并按间隔保存检查点（读取失败的文件下次重新尝试）"""
+        if digest:
+            done[filepath] = digest
+        if self.checkpoint is not None:
+            self.checkpoint.maybe_save(self._checkpoint_state)
+        return digest
+
+    def _get_file_hash(self, filepath, block_size=BUFFER_SIZE):
+        """计算文件的完整摘要，先查检查点和缓存，未命中时再读取文件"""
+        if filepath in self.done_full:
+            return self.done_full[filepath]
+        if self.cache is not None:
+            digest = self.cache.digest(filepath, self.algo, lambda p: self._read_file_hash(p, block_size),
+                                       self.file_stats.get(filepath))
+        else:
+            digest = self._read_file_hash(filepath, block_size)
+        return self._remember(self.done_full, filepath, digest)
+
+    def _get_sample_hash(self, filepath):
+        """只读取文件首尾的采样哈希，用于在完整哈希前快速排除"""
+        if filepath in self.done_samples:
+            return self.done_samples[filepath]
+        compute = lambda p: sample_hash(p, algo=self.algo)
+        if self.cache is not None:
+            digest = self.cache.digest(filepath, sample_kind(self.algo), compute, self.file_stats.get(filepath))
+        else:
+            digest = compute(filepath)
+        return self._remember(self.done_samples, filepath, digest)
+
+    def _read_file_hash(self, filepath, block_size=BUFFER_SIZE):
+        """计算文件的摘要，复用缓冲区分块读取以节省内存；权限问题或读取错误时返回 None"""
+        return hash_file(filepath, self.algo, block_size)
+
+    def _build_size_map_from_catalog(self, include_unique=False):
+        if include_unique:
+            print(">>> [阶段1] 正在从目录数据库查询视频文件...")
+            entries = self.catalog.files(self.search_paths, self.extensions, min_size=1)
+        else:
+            print(">>> [阶段1] 正在从目录数据库查询同大小的文件...")
+            # 大小唯一的文件不可能重复，查询时已经排除
+            entries = self.catalog.same_size(self.search_paths, self.extensions, min_size=1)
+        for entry in entries:
+            self.size_map[entry.size].append(entry.path)
+        print(f"    查询完成。共 {len(entries)} 个视频文件。")
+        self.walk_done = True
+
+    def _build_size_map(self, include_unique=False):
+        if self.catalog is not None:
+            return self._build_size_map_from_catalog(include_unique)
         print(">>> [阶段1] 正在遍历目录构建文件大小映射...")
         
         # 1. 遍历目录，按大小分组
@@ -41,54 +144,102 @@ class DuplicateScanner:
                 print(f"警告: 路径不存在 {path}")
                 continue
                 
-            for root, _, files in os.walk(path):
-                for name in files:
-                    if self._is_video_file(name):
-                        filepath = os.path.join(root, name)
-                        try:
-                            # 获取文件大小
-                            size = os.path.getsize(filepath)
-                            # 只有大于0字节的文件才有意义
-                            if size > 0:
-                                self.size_map[size].append(filepath)
-                                file_count += 1
-                        except OSError:
-                            pass
+            for entry in iter_files(path, self.extensions, threads=self.crawl_threads, stat=True):
+                try:
+                    # 获取文件大小（stat 结果保留下来，查缓存和按设备分组时不再 stat）
+                    st = entry.stat()
+                except OSError:
+                    continue
+                # 只有大于0字节的文件才有意义
+                if st.st_size > 0:
+                    self.size_map[st.st_size].append(entry.path)
+                    self.file_stats[entry.path] = st
+                    file_count += 1
         
         print(f"    扫描完成。找到 {file_count} 个视频文件。")
-        print(">>> [阶段2] 正在计算哈希以确认重复内容...")
+        self.walk_done = True
 
-        # 2. 筛选大小相同的文件，并计算哈希
-        # 只有当一个大小对应多个文件时，才需要计算哈希
-        candidates_groups = [files for size, files in self.size_map.items() if len(files) > 1]
-        
-        total_groups = len(candidates_groups)
-        processed_groups = 0
-        
-        for files_list in candidates_groups:
-            processed_groups += 1
-            if processed_groups % 10 == 0:
-                print(f"    进度: 处理第 {processed_groups}/{total_groups} 组潜在重复...")
+    def scan(self):
+        if self.resumed:
+            print(">>> [阶段1] 使用检查点中的文件大小映射，跳过目录遍历。")
+        else:
+            self._build_size_map()
+            self.save_checkpoint()
+        print(">>> [阶段2] 正在计算首尾采样哈希并确认重复内容...")
+
+        # 2. 只有当一个大小对应多个文件时，才需要计算哈希
+        #    先比较首尾采样哈希，采样也相同时才读取完整文件
+        hash_many = None
+        if self.scheduler is not None:
+            hash_many = lambda paths, fn, on_done=None: self.scheduler.hash_many(paths, fn, on_done, self.file_stats)
+        digests = staged_digests(self.size_map, self._get_file_hash, self._get_sample_hash, hash_many)
 
-            # 按哈希值再分组
+        candidates = sum(len(files) for files in self.size_map.values() if len(files) > 1)
+        fully_hashed = sum(1 for h in digests.values() if h)
+        print(f"    同大小候选 {candidates} 个，采样后需要完整哈希 {fully_hashed} 个。")
+
+        # 3. 收集真正的重复项
+        for size, files_list in self.size_map.items():
             hash_map = defaultdict(list)
             for filepath in files_list:
-                file_hash = self._get_file_hash(filepath)
+                file_hash = digests.get(filepath)
                 if file_hash:
                     hash_map[file_hash].append(filepath)
-            
-            # 3. 收集真正的重复项
+
             for f_hash, paths in hash_map.items():
                 if len(paths) > 1:
                     self.dupes.append({
+                        "algo": self.algo,
                         "hash": f_hash,
-                        "size": os.path.getsize(paths[0]),
+                        "size": size,
                         "count": len(paths),
                         "files": paths
                     })
 
         print(f">>> 扫描结束。发现 {len(self.dupes)} 组重复视频。")
 
+    def _get_fingerprint(self, filepath):
+        if self.cache is not None:
+            return self.cache.digest(filepath, FINGERPRINT_KIND, video_fingerprint, self.file_stats.get(filepath))
+        return video_fingerprint(filepath)
+
+    def scan_similar(self, max_distance=DEFAULT_MAX_DISTANCE):
+        """按视频感知指纹查找同一视频的不同编码版本（720p / 1080p 等），需要 ffmpeg
+
+        每组保留最大的文件（通常分辨率或码率最高），报告中记录在 "keep" 字段。
+        """
+        self._build_size_map(include_unique=True)
+        sizes = {path: size for size, files in self.size_map.items() for path in files}
+
+        print(">>> [阶段2] 正在提取关键帧计算视频指纹...")
+        if self.scheduler is not None:
+            fingerprints = self.scheduler.hash_many(sizes, self._get_fingerprint, stats=self.file_stats)
+        else:
+            fingerprints = hash_sequential(sizes, self._get_fingerprint)
+        failed = sum(1 for fp in fingerprints.values() if not fp)
+        if failed:
+            print(f"    {failed} 个视频无法解码或画面信息太少，已跳过。")
+
+        # 每组第一个是保留的最大文件，组内其他视频都与它相近
+        for group in group_similar(fingerprints, max_distance, keep_order=lambda p: (-sizes[p], p)):
+            keep = group[0]
+            _, keep_value = parse_fingerprint(fingerprints[keep])
+            distances = {p: hamming(keep_value, parse_fingerprint(fingerprints[p])[1]) for p in group}
+            self.dupes.append({
+                "algo": FINGERPRINT_KIND,
+                "hash": fingerprints[keep],
+                "size": sizes[keep],
+                "count": len(group),
+                "files": group,
+                "keep": keep,
+                "sizes": {p: sizes[p] for p in group},
+                "distances": distances,
+                "distance": max(distances.values()),
+                "max_distance": max_distance,
+            })
+
+        print(f">>> 扫描结束。发现 {len(self.dupes)} 组相似视频。")
+
     def save_report(self, output_file):
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(self.dupes, f, indent=4, ensure_ascii=False)
@@ -99,6 +250,61 @@ if __name__ == "__main__":
     TARGET_DIRS = ['/mnt/u10tdisk/movies', '/mnt/u12tdisk/movies']
     OUTPUT_JSON = 'duplicate_videos.json'
 
-    scanner = DuplicateScanner(TARGET_DIRS)
-    scanner.scan()
-    scanner.save_report(OUTPUT_JSON)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="按内容扫描重复视频文件")
+    parser.add_argument('paths', nargs='*', default=TARGET_DIRS, help='要扫描的目录 (默认: %(default)s)')
+    parser.add_argument('--output', default=OUTPUT_JSON, help='JSON报告路径')
+    add_algorithm_argument(parser)
+    add_cache_arguments(parser)
+    add_scheduler_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_crawl_argument(parser)
+    add_catalog_arguments(parser)
+    parser.add_argument('--similar', action='store_true',
+                        help='按关键帧感知指纹查找不同编码的同一视频（需要 ffmpeg），每组保留最大的文件')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'--similar 时指纹的最大汉明距离，共 512 位 (默认: {DEFAULT_MAX_DISTANCE})')
+    args = parser.parse_args()
+
+    if args.similar and not ffmpeg_available():
+        print("错误: --similar 需要安装 ffmpeg 和 ffprobe。")
+        sys.exit(1)
+    if args.similar and args.resume:
+        print("错误: --similar 不使用检查点，已算好的指纹保存在摘要缓存中，直接重新运行即可。")
+        sys.exit(1)
+
+    catalog = None
+    if args.from_catalog:
+        catalog = open_catalog_for(args.paths, args.catalog)
+        if catalog is None:
+            sys.exit(1)
+
+    checkpoint = None
+    if not args.similar:
+        checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint", args.checkpoint_interval)
+    cache = open_cache(args.cache, enabled=not args.no_cache)
+    scanner = DuplicateScanner(args.paths, cache=cache, scheduler=scheduler_from_args(args), algo=args.algo,
+                               checkpoint=checkpoint, crawl_threads=args.crawl_threads, catalog=catalog)
+    if args.resume:
+        scanner.resume()
+    try:
+        if args.similar:
+            scanner.scan_similar(args.max_distance)
+        else:
+            scanner.scan()
+    except KeyboardInterrupt:
+        print("\n>>> 扫描被中断。")
+        if checkpoint is not None:
+            scanner.save_checkpoint()
+            print(">>> 使用 --resume 参数再次运行可以从检查点继续。")
+        else:
+            print(">>> 已算好的指纹保存在摘要缓存中，再次运行时不会重新计算。")
+        sys.exit(130)
+    finally:
+        if cache is not None:
+            print(f">>> {cache.summary()}")
+            cache.close()
+        if catalog is not None:
+            catalog.close()
+    scanner.save_report(args.output)
+    if checkpoint is not None:
+        checkpoint.remove()
@@ -4,77 +4,117 @@ import hashlib
 from collections import defaultdict
 import argparse
 
-def file_hash(file_path):
-    """计算文件的MD5哈希值"""
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-    except (IOError, OSError):
+from hash_cache import open_cache, add_cache_arguments
+from hashers import hash_file
+from fswalk import walk_dirs
+
+def file_hash(file_path, cache=None, st=None):
+    """计算文件的MD5哈希值（cache 不为 None 时优先使用摘要缓存，st 为已取得的 stat 结果）"""
+    if cache is not None:
+        return cache.digest(file_path, "md5", file_hash, st)
+    h = hash_file(file_path, "md5")
+    if h is None:
         print(f"Warning: Cannot read {file_path}")
-        return None
-    return hash_md5.hexdigest()
+    return h
 
-def dir_fingerprint(dir_path):
-    """计算目录的指纹：递归计算所有文件内容的哈希，并排序子目录结构"""
+def dir_fingerprint(file_entries, dir_entries):
+    """由直接子项计算目录指纹 (Merkle 树)
+
+    file_entries: [(文件名, 内容哈希)]，dir_entries: [(子目录名, 子目录指纹)]
+    子目录指纹已经包含了它下面的全部内容，所以每个文件只需要读取一次。
+    """
     fingerprint = hashlib.md5()
-    files = []
-    
-    try:
-        for root, dirs, filenames in os.walk(dir_path):
-            # 排序目录和文件以确保一致性
-            dirs.sort()
-            filenames.sort()
-            
-            # 添加当前路径的相对路径
-            rel_root = os.path.relpath(root, dir_path)
-            if rel_root != '.':
-                fingerprint.update(rel_root.encode('utf-8'))
-                fingerprint.update(b'/')
-            
-            # 添加文件名和内容哈希
-            for filename in filenames:
-                file_path = os.path.join(root, filename)
-                rel_file = os.path.relpath(file_path, dir_path)
-                files.append(rel_file)
-                h = file_hash(file_path)
-                if h:
-                    files.append(h)
-    except (IOError, OSError):
-        print(f"Warning: Cannot access {dir_path}")
-        return None
-    
-    # 排序文件列表并更新哈希
-    files.sort()
-    for item in files:
-        fingerprint.update(item.encode('utf-8'))
-    
+    for kind, entries in ((b'F', file_entries), (b'D', dir_entries)):
+        for name, digest in sorted(entries):
+            fingerprint.update(kind + os.fsencode(name) + b'\0' + digest.encode('ascii') + b'\n')
     return fingerprint.hexdigest()
 
-def scan_duplicates(root_dir, min_dups=2):
-    """扫描目录中的重复文件和重复目录"""
-    file_dups = defaultdict(list)  # hash -> list of paths
-    dir_dups = defaultdict(list)   # fingerprint -> list of dir paths
-    
-    # 扫描文件
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            h = file_hash(file_path)
+def merkle_scan(root_dir, cache=None):
+    """自底向上遍历一次，返回 ({文件路径: 哈希}, {目录路径: 指纹})
+
+    有文件无法读取的目录（以及它的所有上级目录）指纹为 None。
+    """
+    file_hashes = {}
+    dir_fps = {}
+
+    def onerror(err):
+        print(f"Warning: Cannot access {err.filename}")
+        dir_fps[err.filename] = None
+
+    for root, dirs, files in walk_dirs(root_dir, topdown=False, on_error=onerror):
+        complete = True
+        file_entries = []
+        for entry in files:
+            try:
+                st = entry.stat()
+            except OSError:
+                st = None
+            h = file_hash(entry.path, cache, st)
+            file_hashes[entry.path] = h
             if h:
-                file_dups[h].append(file_path)
-    
-    # 扫描目录（只检查有子内容的目录）
-    for root, dirs, files in os.walk(root_dir):
-        if dirs or files:  # 只检查非空目录
-            fp = dir_fingerprint(root)
+                file_entries.append((entry.name, h))
+            else:
+                complete = False
+
+        dir_entries = []
+        for entry in dirs:
+            if entry.is_symlink():
+                # 不进入目录软链接，用链接目标代替内容
+                dir_entries.append((entry.name, hashlib.md5(os.fsencode(os.readlink(entry.path))).hexdigest()))
+                continue
+            fp = dir_fps.get(entry.path)
             if fp:
-                dir_dups[fp].append(root)
+                dir_entries.append((entry.name, fp))
+            else:
+                complete = False
+
+        dir_fps[root] = dir_fingerprint(file_entries, dir_entries) if complete else None
+
+    return file_hashes, dir_fps
+
+def collapse_nested(groups, parent_fp, dir_groups):
+    """去掉被上级重复目录完全包含的重复组
+
+    如果一个组的路径恰好分布在某个重复目录组的每个目录中、每个目录一个，
+    那么这个组只是上级重复的一部分，不需要单独报告。
+    同一个目录里有两个相同的文件时（例如 A/x.mp4 与 A/x_copy.mp4）仍然单独报告。
+    """
+    collapsed = {}
+    for key, paths in groups.items():
+        parent_dirs = [os.path.dirname(p) for p in paths]
+        fps = {parent_fp.get(d) for d in parent_dirs}
+        if len(fps) == 1 and None not in fps:
+            fp = fps.pop()
+            if (fp in dir_groups and len(paths) == len(dir_groups[fp])
+                    and set(parent_dirs) == set(dir_groups[fp])):
+                continue
+        collapsed[key] = paths
+    return collapsed
+
+def scan_duplicates(root_dir, min_dups=2, cache=None, collapse=True):
+    """扫描目录中的重复文件和重复目录（每个文件只读取一次）"""
+    file_dups = defaultdict(list)  # hash -> list of paths
+    dir_dups = defaultdict(list)   # fingerprint -> list of dir paths
+
+    file_hashes, dir_fps = merkle_scan(root_dir, cache)
+    for file_path, h in file_hashes.items():
+        if h:
+            file_dups[h].append(file_path)
+
+    # 只检查非空目录（空目录的名字仍然计入上级目录的指纹）
+    nonempty = {os.path.dirname(p) for p in file_hashes} | {os.path.dirname(d) for d in dir_fps}
+    for dir_path, fp in dir_fps.items():
+        if fp and dir_path in nonempty:
+            dir_dups[fp].append(dir_path)
     
     # 过滤重复项（至少min_dups个）
-    file_groups = {k: v for k, v in file_dups.items() if len(v) >= min_dups}
-    dir_groups = {k: v for k, v in dir_dups.items() if len(v) >= min_dups}
+    file_groups = {k: sorted(v) for k, v in file_dups.items() if len(v) >= min_dups}
+    dir_groups = {k: sorted(v) for k, v in dir_dups.items() if len(v) >= min_dups}
+
+    # 合并嵌套的重复：两个相同的季文件夹只显示为一组
+    if collapse:
+        file_groups = collapse_nested(file_groups, dir_fps, dir_groups)
+        dir_groups = collapse_nested(dir_groups, dir_fps, dir_groups)
     
     return file_groups, dir_groups
 
@@ -88,6 +128,8 @@ def main():
     parser = argparse.ArgumentParser(description="扫描目录中的重复文件和子目录")
     parser.add_argument("directory", help="要扫描的目录路径")
     parser.add_argument("--min-dups", type=int, default=2, help="最小重复数量 (默认: 2)")
+    parser.add_argument("--no-collapse", action="store_true", help="不合并嵌套的重复项（逐个列出重复目录内的文件和子目录）")
+    add_cache_arguments(parser)
     args = parser.parse_args()
     
     root_dir = os.path.abspath(args.directory)
@@ -96,7 +138,13 @@ def main():
         return
     
     print(f"扫描目录: {root_dir}")
-    file_groups, dir_groups = scan_duplicates(root_dir, args.min_dups)  # 修正：使用 args.min_dups
+    cache = open_cache(args.cache, enabled=not args.no_cache)
+    try:
+        file_groups, dir_groups = scan_duplicates(root_dir, args.min_dups, cache, not args.no_collapse)  # 修正：使用 args.min_dups
+    finally:
+        if cache is not None:
+            print(cache.summary())
+            cache.close()
     
     print("\n=== 重复文件 ===")
     for hash_key, paths in file_groups.items():
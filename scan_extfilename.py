@@ -1,22 +1,35 @@
 import os
 import sys
+import argparse
+
+from fswalk import crawl_dirs
+from catalog import open_catalog_for, add_catalog_arguments
 
 # 获取命令行参数中的目录路径，如果没有提供则使用当前目录
-if len(sys.argv) > 1:
-    target_dir = sys.argv[1]
-else:
-    target_dir = '.'  # 默认扫描当前目录
+parser = argparse.ArgumentParser(description="扫描目录下所有文件的后缀名，写入 result.txt")
+parser.add_argument("directory", nargs="?", default=".", help="要扫描的目录 (默认: 当前目录)")
+add_catalog_arguments(parser)
+args = parser.parse_args()
+target_dir = args.directory
 
 # 用于存储唯一的后缀名
 extensions = set()
 
-# 递归遍历目录及其子目录
-for root, dirs, files in os.walk(target_dir):
-    for file in files:
-        # 获取文件扩展名（包括点，如 .txt）
-        ext = os.path.splitext(file)[1].lower()
-        if ext:  # 忽略无扩展名的文件
-            extensions.add(ext)
+if args.from_catalog:
+    catalog = open_catalog_for([target_dir], args.catalog)
+    if catalog is None:
+        sys.exit(1)
+    with catalog:
+        extensions.update(catalog.extensions([target_dir]))
+else:
+    # 递归遍历目录及其子目录
+    # 只需要文件名，os.scandir 不会对每个文件调用 stat；多个目录同时列，适合网络挂载
+    for root, dirs, files in crawl_dirs(target_dir):
+        for entry in files:
+            # 获取文件扩展名（包括点，如 .txt）
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext:  # 忽略无扩展名的文件
+                extensions.add(ext)
 
 # 按字母顺序排序后写入 result.txt
 with open('result.txt', 'w', encoding='utf-8') as f:
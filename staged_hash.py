@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+分阶段确认重复文件：大小 -> 首尾采样哈希 -> 完整哈希
+
+1. 大小唯一的文件不可能有重复，直接跳过；
+2. 同大小的文件只读取开头和结尾各 SAMPLE_BYTES 字节计算采样哈希；
+3. 只有采样哈希也相同的文件才计算完整哈希。
+
+大部分同大小的电影文件在第一个 MiB 内就不同，所以第 3 步通常只需要读取
+真正重复的文件。
+"""
+import os
+from collections import defaultdict
+
+from hashers import DEFAULT_ALGORITHM, new_hasher, update_from_file, hash_file
+
+# 首尾各读取 4 MiB
+SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+def sample_kind(kind, sample_bytes=SAMPLE_BYTES):
+    """采样哈希在摘要缓存中的类型名，例如 md5-sample:4194304"""
+    return f"{kind}-sample:{sample_bytes}"
+
+
+def sample_hash(file_path, sample_bytes=SAMPLE_BYTES, algo=DEFAULT_ALGORITHM):
+    """只读取文件开头和结尾各 sample_bytes 字节计算摘要"""
+    hasher = new_hasher(algo)
+    try:
+        with open(file_path, "rb", buffering=0) as f:
+            size = f.seek(0, 2)
+            f.seek(0)
+            update_from_file(hasher, f, sample_bytes)
+            if size > sample_bytes:
+                # 文件较小时尾部与头部重叠的部分不重复读取
+                f.seek(max(size - sample_bytes, sample_bytes))
+                update_from_file(hasher, f, sample_bytes)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def same_content(path_a, path_b, cache=None, algo=DEFAULT_ALGORITHM, sample_bytes=SAMPLE_BYTES):
+    """按同样的阶段比较两个文件：大小 -> 首尾采样哈希 -> 完整哈希，任何一步不同就返回 False
+
+    cache 为 hash_cache.HashCache 时采样摘要和完整摘要都会写入缓存。读取失败时返回 False。
+    """
+    try:
+        st_a, st_b = os.stat(path_a), os.stat(path_b)
+    except OSError:
+        return False
+    if st_a.st_size != st_b.st_size:
+        return False
+    if (st_a.st_dev, st_a.st_ino) == (st_b.st_dev, st_b.st_ino):
+        return True
+
+    stages = [(sample_kind(algo, sample_bytes), lambda p: sample_hash(p, sample_bytes, algo))]
+    # 不超过两个采样长度的文件已经被采样完整读取
+    if st_a.st_size > 2 * sample_bytes:
+        stages.append((algo, lambda p: hash_file(p, algo)))
+    for kind, compute in stages:
+        if cache is not None:
+            digest_a = cache.digest(path_a, kind, compute, st_a)
+            digest_b = cache.digest(path_b, kind, compute, st_b)
+        else:
+            digest_a, digest_b = compute(path_a), compute(path_b)
+        if not digest_a or digest_a != digest_b:
+            return False
+    return True
+
+
+def hash_sequential(paths, hash_fn, on_done=None):
+    """逐个计算摘要，接口与 HashScheduler.hash_many 相同"""
+    results = {}
+    for path in paths:
+        digest = results[path] = hash_fn(path)
+        if on_done is not None:
+            on_done(path, digest)
+    return results
+
+
+def staged_digests(size_map, full_hash, sample_hash_fn=sample_hash, hash_many=None, on_result=None):
+    """按阶段计算摘要
+
+    size_map: {size: [path, ...]}
+    full_hash / sample_hash_fn: path -> 摘要，读取失败返回 None
+    hash_many: (paths, hash_fn, on_done=None) -> {path: 摘要}，默认逐个计算
+    on_result: 每个文件的最终结果确定后调用 on_result(path, 摘要)
+
+    返回 {path: 完整摘要}，可以证明内容唯一的文件对应 None。
+    """
+    hash_many = hash_many or hash_sequential
+    results = {}
+
+    def settle(path, digest):
+        results[path] = digest
+        if on_result is not None:
+            on_result(path, digest)
+
+    # 阶段1: 大小唯一
+    candidates = []
+    for size, paths in size_map.items():
+        if len(paths) > 1:
+            candidates.extend(paths)
+        else:
+            for path in paths:
+                settle(path, None)
+
+    # 阶段2: 首尾采样
+    samples = hash_many(candidates, sample_hash_fn)
+    full_candidates = []
+    for size, paths in size_map.items():
+        if len(paths) < 2:
+            continue
+        by_sample = defaultdict(list)
+        for path in paths:
+            if samples.get(path):
+                by_sample[samples[path]].append(path)
+            else:
+                settle(path, None)
+        for group in by_sample.values():
+            if len(group) > 1:
+                full_candidates.extend(group)
+            else:
+                settle(group[0], None)
+
+    # 阶段3: 完整哈希
+    results.update(hash_many(full_candidates, full_hash, on_done=on_result))
+    return results
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+视频感知指纹：找出同一部片子的不同编码版本 (720p / 1080p / 不同码率)
+
+用 ffmpeg 在固定的相对位置（片长的 1/9、2/9 … 8/9）各取一个关键帧，
+缩小为 9x8 的灰度图，计算 64 位 dHash（每行相邻像素比较明暗）。
+8 帧拼成 512 位的指纹，两个视频指纹的汉明距离就是各帧距离之和，
+重新编码、改变分辨率后距离仍然很小。
+
+指纹以 "时长:十六进制" 的形式存入摘要缓存 (hash_cache.py)，kind 为 FINGERPRINT_KIND，
+未修改的视频不会再次调用 ffmpeg。
+
+512 位的指纹维度太高，BK 树无法有效剪枝，分组改用 LSH 分桶：每帧的 64 位哈希切成 4 段
+16 位，按 (帧序号, 段序号, 段的值) 分桶，只比较至少落在同一个桶里的视频。
+同一部片子的两个编码每帧只差几位，几乎必然有某一段完全相同；
+不相关的视频很少落入同一个桶，5 万个视频也不需要两两比较。
+
+需要安装 ffmpeg（包括 ffprobe）。
+"""
+import shutil
+import subprocess
+from collections import defaultdict
+
+from bktree import hamming, group_pairs
+
+FRAME_COUNT = 8
+FRAME_WIDTH = 9
+FRAME_HEIGHT = 8
+FINGERPRINT_KIND = f"vfp-dhash:{FRAME_COUNT}"
+
+# 指纹总位数 512，平均每帧允许 8 位不同
+DEFAULT_MAX_DISTANCE = 64
+BAND_BITS = 16
+# 宽银幕片的上下黑边等低信息段会让大量视频落入同一个桶，超过这个数量的桶不再展开
+MAX_BUCKET_SIZE = 500
+
+# 时长相差超过 1% 且超过 2 秒的视频不认为是同一部片子
+DURATION_TOLERANCE = 0.01
+DURATION_SLACK = 2.0
+
+FFMPEG_TIMEOUT = 120
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def probe_duration(path):
+    """用 ffprobe 读取时长（秒），失败时返回 None"""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, timeout=FFMPEG_TIMEOUT, check=True,
+        ).stdout
+        return float(out.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def extract_frame(path, seconds):
+    """取 seconds 之后的第一个关键帧，返回 9x8 灰度像素 (bytes)，失败时返回 None"""
+    try:
+        out = subprocess.run(
+            ["ffmpeg", "-v", "error", "-nostdin", "-skip_frame", "nokey", "-ss", f"{seconds:.3f}",
+             "-i", path, "-frames:v", "1", "-an", "-sn",
+             "-vf", f"scale={FRAME_WIDTH}:{FRAME_HEIGHT}:flags=area,format=gray",
+             "-f", "rawvideo", "-"],
+            capture_output=True, timeout=FFMPEG_TIMEOUT, check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if len(out) < FRAME_WIDTH * FRAME_HEIGHT:
+        return None
+    return out[:FRAME_WIDTH * FRAME_HEIGHT]
+
+
+def dhash(pixels, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """差值哈希：每行 width 个像素比较相邻两个，得到 (width - 1) * height 位"""
+    value = 0
+    for y in range(height):
+        row = pixels[y * width:(y + 1) * width]
+        for x in range(width - 1):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value
+
+
+def video_fingerprint(path):
+    """计算视频指纹，返回 "时长:十六进制"；无法解码或画面几乎没有信息时返回 None"""
+    duration = probe_duration(path)
+    if not duration or duration <= 0:
+        return None
+    fingerprint = 0
+    blank = 0
+    for i in range(FRAME_COUNT):
+        pixels = extract_frame(path, duration * (i + 1) / (FRAME_COUNT + 1))
+        if pixels is None:
+            return None
+        frame_hash = dhash(pixels)
+        # 纯黑 / 纯色画面的 dHash 为 0，不能用来区分视频
+        if frame_hash == 0:
+            blank += 1
+        fingerprint = (fingerprint << 64) | frame_hash
+    if blank > FRAME_COUNT // 2:
+        return None
+    return f"{duration:.2f}:{fingerprint:0{FRAME_COUNT * 16}x}"
+
+
+def parse_fingerprint(digest):
+    """"时长:十六进制" -> (时长, 整数指纹)"""
+    duration, hex_value = digest.split(":", 1)
+    return float(duration), int(hex_value, 16)
+
+
+def durations_match(a, b):
+    return abs(a - b) <= max(DURATION_SLACK, DURATION_TOLERANCE * max(a, b))
+
+
+def _bands(value):
+    """指纹的 LSH 桶键: (段序号, 段的值)，段序号同时确定了是第几帧；跳过全 0 的段（纯色的行）"""
+    mask = (1 << BAND_BITS) - 1
+    for i in range(FRAME_COUNT * 64 // BAND_BITS):
+        band = (value >> (i * BAND_BITS)) & mask
+        if band:
+            yield i, band
+
+
+def group_similar(fingerprints, max_distance=DEFAULT_MAX_DISTANCE, keep_order=None):
+    """{path: "时长:十六进制"} -> [[keep, path, ...]]，每组第一个是保留的视频
+
+    LSH 分桶找出的相近视频对只用来划定候选范围；相近关系不能传递（a~b、b~c 不代表 a~c），
+    所以每个候选范围内按 keep_order(path) 排序（默认按路径）依次选出保留的视频，
+    只把与它时长一致、汉明距离不超过 max_distance 的视频放进同一组，剩下的视频再继续分组。
+    """
+    parsed = {path: parse_fingerprint(fp) for path, fp in fingerprints.items() if fp}
+    buckets = defaultdict(list)
+    for path, (_, value) in parsed.items():
+        for key in _bands(value):
+            buckets[key].append(path)
+
+    checked = set()
+    similar = []
+    for paths in buckets.values():
+        if len(paths) < 2 or len(paths) > MAX_BUCKET_SIZE:
+            continue
+        for i, a in enumerate(paths):
+            for b in paths[i + 1:]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                (duration_a, value_a), (duration_b, value_b) = parsed[a], parsed[b]
+                if durations_match(duration_a, duration_b) and hamming(value_a, value_b) <= max_distance:
+                    similar.append(pair)
+
+    groups = []
+    for candidates in group_pairs(similar):
+        remaining = sorted(candidates, key=keep_order)
+        while len(remaining) > 1:
+            keep = remaining[0]
+            keep_duration, keep_value = parsed[keep]
+            group, rest = [keep], []
+            for path in remaining[1:]:
+                duration, value = parsed[path]
+                if durations_match(keep_duration, duration) and hamming(keep_value, value) <= max_distance:
+                    group.append(path)
+                else:
+                    rest.append(path)
+            if len(group) > 1:
+                groups.append(group)
+            remaining = rest
+    return groups
+
+
+def split_by_distance(item, files):
+    """scan_dupes.py --similar 报告中的一组 -> (可以处理的文件, [(超过阈值的文件, 距离)])
+
+    只有与保留文件的指纹距离不超过该组 max_distance 的视频可以删除或链接。
+    旧报告没有逐个文件的距离，只能按整组的最大距离判断。
+    """
+    max_distance = item.get("max_distance", DEFAULT_MAX_DISTANCE)
+    distances = item.get("distances") or {f: item.get("distance") for f in files}
+    allowed, rejected = [], []
+    for path in files:
+        distance = distances.get(path)
+        if distance is None or distance > max_distance:
+            rejected.append((path, distance))
+        else:
+            allowed.append(path)
+    return allowed, rejected
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+视频摘要索引的读写
+
+md5_files.py 默认生成逐行 JSON (NDJSON) 格式的 video_md5_index.ndjson：
+扫描过程中每算完一个文件就追加一行，读取时用生成器逐行解析，
+不需要把整个索引放进内存。旧的 video_md5_index.json (JSON 数组) 仍然可以读取，
+也可以用本脚本互相转换：
+
+    python3 video_index.py export /path/to/dir   # ndjson -> json
+    python3 video_index.py import /path/to/dir   # json -> ndjson
+"""
+import os
+import json
+import time
+import argparse
+import threading
+
+JSON_INDEX_NAME = "video_md5_index.json"
+NDJSON_INDEX_NAME = "video_md5_index.ndjson"
+
+
+class IndexWriter:
+    """逐行追加写入索引，可以在多个线程中调用 write
+
+    每隔 flush_interval 秒把已写入的记录刷到磁盘，扫描中断时最多损失这段时间的结果。
+    """
+
+    def __init__(self, index_file, append=False, flush_interval=60):
+        self.index_file = index_file
+        self.count = 0
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        if append:
+            truncate_partial_line(index_file)
+        self.f = open(index_file, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.f.write(line)
+            self.count += 1
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def truncate_partial_line(index_file):
+    """去掉中断时写了一半的最后一行，避免追加的记录接在它后面"""
+    try:
+        with open(index_file, 'rb+') as f:
+            size = f.seek(0, 2)
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    pos = pos - step + newline + 1
+                    break
+                pos -= step
+            if pos != size:
+                f.truncate(pos)
+    except FileNotFoundError:
+        pass
+
+
+def is_ndjson(index_file):
+    """JSON 数组以 '[' 开头，其他情况按逐行 JSON 处理"""
+    if index_file.endswith(".ndjson"):
+        return True
+    with open(index_file, 'r', encoding='utf-8') as f:
+        while True:
+            ch = f.read(1)
+            if not ch:
+                return True
+            if not ch.isspace():
+                return ch != '['
+
+
+def iter_index(index_file):
+    """逐条读取索引记录，兼容 NDJSON 和旧的 JSON 数组"""
+    if not is_ndjson(index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    with open(index_file, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # 扫描被中断时最后一行可能不完整
+                print(f"Warning: 跳过 {index_file} 第 {line_no} 行（格式错误）")
+
+
+def find_index(root_dir):
+    """在目录下查找索引文件；两种格式都存在时使用较新的一个并给出警告"""
+    found = []
+    for name in (NDJSON_INDEX_NAME, JSON_INDEX_NAME):
+        index_file = os.path.join(root_dir, name)
+        try:
+            found.append((os.stat(index_file).st_mtime_ns, index_file))
+        except FileNotFoundError:
+            continue
+    if not found:
+        return None
+    # mtime 相同时优先 NDJSON
+    newest = max(found, key=lambda f: f[0])[1]
+    if len(found) > 1:
+        others = [path for _, path in found if path != newest]
+        print(f"Warning: 同时存在 {', '.join(os.path.basename(p) for _, p in found)}，"
+              f"使用较新的 {os.path.basename(newest)}；请删除过期的 {', '.join(others)}")
+    return newest
+
+
+def remove_other_index(index_file):
+    """写入一种格式的索引后删除同一目录下另一种格式的旧索引，避免之后读到过期的记录"""
+    root_dir = os.path.dirname(os.path.abspath(index_file))
+    for name in (NDJSON_INDEX_NAME, JSON_INDEX_NAME):
+        other = os.path.join(root_dir, name)
+        if name != os.path.basename(index_file) and os.path.exists(other):
+            os.remove(other)
+            print(f"已删除旧格式的索引: {other}")
+
+
+def export_json(src, dst):
+    """NDJSON -> JSON 数组（按路径排序，与旧版 md5_files.py 的输出一致）"""
+    entries = sorted(iter_index(src), key=lambda x: x["path"])
+    with open(dst, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return len(entries)
+
+
+def import_json(src, dst):
+    """JSON 数组 -> NDJSON"""
+    with IndexWriter(dst) as writer:
+        for entry in iter_index(src):
+            writer.write(entry)
+        return writer.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在 NDJSON 和 JSON 格式的视频索引之间转换")
+    parser.add_argument("action", choices=["export", "import"], help="export: ndjson -> json；import: json -> ndjson")
+    parser.add_argument("directory", help="索引文件所在目录")
+    args = parser.parse_args()
+
+    root_dir = os.path.abspath(args.directory)
+    ndjson_file = os.path.join(root_dir, NDJSON_INDEX_NAME)
+    json_file = os.path.join(root_dir, JSON_INDEX_NAME)
+
+    if args.action == "export":
+        src, dst, convert = ndjson_file, json_file, export_json
+    else:
+        src, dst, convert = json_file, ndjson_file, import_json
+
+    if not os.path.exists(src):
+        print(f"Error: 索引文件 {src} 不存在。")
+        return
+
+    count = convert(src, dst)
+    print(f"已转换 {count} 条记录: {src} -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
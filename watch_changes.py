@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+监视磁盘上的文件变化，记录到目录数据库 (catalog.py)
+
+长期运行：用 inotify（通过 ctypes 调用 libc，不需要额外安装）监视各根目录下的每个目录，
+把发生创建、移动、删除、写入的目录记录到目录数据库的 dirty 表。之后
+
+    python3 catalog.py update --dirty
+
+只重新列出这些目录，而不是 stat 整棵目录树，--from-catalog 的扫描脚本随即看到最新状态。
+
+无法使用 inotify 时（非 Linux、watch 数量超过 fs.inotify.max_user_watches 等），
+对无法监视的目录每隔 --poll-interval 秒检查一次目录 mtime，变化时同样记录下来。
+事件队列溢出时把对应的根目录标记为整个子树需要按 mtime 重新检查。
+
+    python3 watch_changes.py /mnt/u10tdisk /mnt/u12tdisk
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+
+from catalog import Catalog, DEFAULT_ROOTS, DEFAULT_CATALOG_PATH
+from fswalk import walk_dirs, scan_dir
+
+# linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+DEFAULT_POLL_INTERVAL = 300
+# 收到事件后最多等待多少秒再写入数据库，把一次复制产生的大量事件合并成一次写入
+FLUSH_INTERVAL = 2
+
+
+class Inotify:
+    """libc inotify 的最小封装，不可用时构造函数抛出 OSError"""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError(errno.ENOSYS, "inotify 仅在 Linux 上可用")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        """等待最多 timeout 秒，返回 [(wd, mask, cookie, name)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ChangeWatcher:
+    def __init__(self, roots, catalog, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.catalog = catalog
+        self.poll_interval = poll_interval
+        self.wd_paths = {}      # wd -> 目录路径
+        self.polled = {}        # 无法监视的目录 -> 上次看到的 mtime_ns
+        self.pending = set()    # 尚未写入数据库的变化目录
+        self.pending_recursive = set()
+        try:
+            self.inotify = Inotify()
+        except OSError as e:
+            print(f"警告: 无法使用 inotify ({e})，改为每 {poll_interval} 秒检查目录 mtime")
+            self.inotify = None
+
+    def _poll_dir(self, path):
+        try:
+            self.polled[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            self.polled.pop(path, None)
+
+    def watch_tree(self, top):
+        """监视 top 及其下所有目录，返回新增的 watch 数量"""
+        added = 0
+        for dirpath, _, _ in walk_dirs(top):
+            if self.inotify is None:
+                self._poll_dir(dirpath)
+                continue
+            try:
+                wd = self.inotify.add_watch(dirpath)
+            except OSError as e:
+                if e.errno == errno.ENOSPC and not self.polled:
+                    print("警告: inotify watch 数量已达上限 (fs.inotify.max_user_watches)，"
+                          "其余目录改为定期检查 mtime")
+                self._poll_dir(dirpath)
+                continue
+            # 移动过的目录再次添加时返回同一个 wd，这里更新为新路径
+            if wd not in self.wd_paths:
+                added += 1
+            self.wd_paths[wd] = dirpath
+            self.polled.pop(dirpath, None)
+        return added
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            print("警告: inotify 事件队列溢出，根目录将按 mtime 重新检查")
+            self.pending_recursive.update(self.roots)
+            return
+        dir_path = self.wd_paths.get(wd)
+        if dir_path is None:
+            return
+        if mask & IN_IGNORED:
+            del self.wd_paths[wd]
+            return
+        if mask & IN_DELETE_SELF:
+            # 上级目录会收到对应的 DELETE 事件，随后还会收到 IN_IGNORED
+            return
+        if mask & IN_MOVE_SELF:
+            # 移到监视范围内时会通过 MOVED_TO 重新登记路径；移出去的不再监视
+            if not os.path.isdir(dir_path):
+                self._unwatch_tree(dir_path)
+            return
+
+        # 重新列出这个目录时，新出现的子目录（包括从别处移进来的整棵目录树）会被完整收录
+        self.pending.add(dir_path)
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            self.watch_tree(os.path.join(dir_path, name))
+
+    def _unwatch_tree(self, top):
+        """停止监视 top 及其下所有目录；子目录不会收到 IN_MOVE_SELF，只能按路径前缀查找"""
+        prefix = top.rstrip(os.sep) + os.sep
+        for wd, path in list(self.wd_paths.items()):
+            if path == top or path.startswith(prefix):
+                self.inotify.rm_watch(wd)
+                del self.wd_paths[wd]
+        for path in list(self.polled):
+            if path == top or path.startswith(prefix):
+                del self.polled[path]
+
+    def _check_polled(self):
+        for path, mtime_ns in list(self.polled.items()):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                del self.polled[path]
+                self.pending.add(os.path.dirname(path))
+                continue
+            except OSError:
+                continue
+            if current != mtime_ns:
+                self.polled[path] = current
+                self.pending.add(path)
+                # 新出现的子目录也要监视或定期检查
+                listing = scan_dir(path)
+                for entry in listing[0] if listing else []:
+                    if entry.path not in self.polled and not entry.is_symlink():
+                        self.watch_tree(entry.path)
+
+    def flush(self):
+        if self.pending_recursive:
+            self.catalog.mark_dirty(sorted(self.pending_recursive), recursive=True)
+        if self.pending:
+            self.catalog.mark_dirty(sorted(self.pending - self.pending_recursive))
+        if self.pending or self.pending_recursive:
+            print(f"{time.strftime('%H:%M:%S')} 记录 {len(self.pending | self.pending_recursive)} 个变化目录")
+        self.pending.clear()
+        self.pending_recursive.clear()
+
+    def run(self):
+        for root in self.roots:
+            if not os.path.isdir(root):
+                print(f"警告: 路径不存在 {root}")
+                continue
+            print(f"监视 {root} ...")
+            self.watch_tree(root)
+        print(f"inotify 监视 {len(self.wd_paths)} 个目录，定期检查 {len(self.polled)} 个目录。Ctrl-C 退出。")
+
+        last_poll = last_flush = time.monotonic()
+        while True:
+            if self.inotify is not None:
+                for wd, mask, _, name in self.inotify.read_events(FLUSH_INTERVAL):
+                    self._handle(wd, mask, name)
+            else:
+                time.sleep(FLUSH_INTERVAL)
+            now = time.monotonic()
+            if self.polled and now - last_poll >= self.poll_interval:
+                self._check_polled()
+                last_poll = now
+            if now - last_flush >= FLUSH_INTERVAL:
+                self.flush()
+                last_flush = now
+
+    def close(self):
+        self.flush()
+        if self.inotify is not None:
+            self.inotify.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监视文件变化并记录到目录数据库，供 catalog.py update --dirty 使用")
+    parser.add_argument("roots", nargs="*", default=DEFAULT_ROOTS, help="要监视的根目录 (默认: %(default)s)")
+    parser.add_argument("--catalog", default=None, help=f"目录数据库路径 (默认: {DEFAULT_CATALOG_PATH})")
+    parser.add_argument("--poll-interval", type=int, default=DEFAULT_POLL_INTERVAL,
+                        help=f"无法使用 inotify 的目录检查 mtime 的间隔秒数 (默认: {DEFAULT_POLL_INTERVAL})")
+    args = parser.parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        watcher = ChangeWatcher(args.roots, catalog, args.poll_interval)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            print("\n停止监视。")
+        finally:
+            watcher.close()
+
+
+if __name__ == "__main__":
+    main()